@@ -0,0 +1,237 @@
+import argparse
+import csv
+import glob
+import hashlib
+import os
+import signal
+import sys
+import time
+from collections import namedtuple
+
+import db_manager
+from core.jobs import CancelToken
+
+# =========================================================================
+# --- EKSTRAKSI MINUTIAE MASSAL TANPA GUI ---
+# =========================================================================
+#
+# Contoh:
+#   python batch_extract.py scan/malam_ini --judul "Kasus A" --nomor-lp LP/12/2025
+#   python batch_extract.py "scan/**/*.png" --judul "Kasus A" --workers 4
+#   python batch_extract.py manifest.csv
+#
+# Manifest CSV: kolom wajib `path`; opsional `judul_kasus`, `nomor_lp`,
+# `tanggal_kejadian`. Path relatif dihitung dari lokasi file CSV.
+#
+# Setiap file yang selesai dicatat di tabel batch_progress. Menjalankan ulang
+# perintah yang sama (atau --run-name yang sama) melanjutkan dari file yang
+# belum selesai. Ctrl+C sekali = berhenti rapi setelah job yang sedang jalan.
+
+IMAGE_EXTENSIONS = (".bmp", ".jpg", ".jpeg", ".png", ".tif", ".tiff")
+
+BatchItem = namedtuple("BatchItem", "path judul_kasus nomor_lp tanggal_kejadian")
+
+
+def _is_image(path):
+    return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+
+def _read_manifest(csv_path, defaults):
+    base = os.path.dirname(os.path.abspath(csv_path))
+    items = []
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            path = (row.get("path") or "").strip()
+            if not path:
+                continue
+            if not os.path.isabs(path):
+                path = os.path.join(base, path)
+            items.append(BatchItem(
+                os.path.abspath(path),
+                (row.get("judul_kasus") or "").strip() or defaults.judul_kasus,
+                (row.get("nomor_lp") or "").strip() or defaults.nomor_lp,
+                (row.get("tanggal_kejadian") or "").strip() or defaults.tanggal_kejadian,
+            ))
+    return items
+
+
+def collect_items(sources, defaults, recursive=False):
+    """Kumpulkan file dari direktori, pola glob dan/atau manifest CSV (urutan dijaga, tanpa duplikat)."""
+    items = []
+    for source in sources:
+        if source.lower().endswith(".csv") and os.path.isfile(source):
+            items.extend(_read_manifest(source, defaults))
+            continue
+        if os.path.isdir(source):
+            pattern = os.path.join(source, "**", "*") if recursive else os.path.join(source, "*")
+            paths = glob.glob(pattern, recursive=recursive)
+        else:
+            paths = glob.glob(source, recursive=True)
+        for path in sorted(p for p in paths if os.path.isfile(p) and _is_image(p)):
+            items.append(defaults._replace(path=os.path.abspath(path)))
+
+    seen, unique = set(), []
+    for item in items:
+        if item.path not in seen:
+            seen.add(item.path)
+            unique.append(item)
+    return unique
+
+
+def default_run_name(items):
+    """Nama run dari daftar file: perintah yang sama → run yang sama (bisa dilanjutkan)."""
+    h = hashlib.sha1("\n".join(sorted(i.path for i in items)).encode("utf-8"))
+    return f"auto-{h.hexdigest()[:12]}"
+
+
+def _commit_chunk(run_name, chunk, results, user_id, min_quality):
+    """Tulis hasil satu kelompok: history sukses sekaligus, lalu status gagal/ditolak."""
+    threshold = db_manager.QUALITY_MIN_SCORE if min_quality is None else min_quality
+    entries, statuses = [], []
+    counts = {"done": 0, "rejected": 0, "failed": 0, "cancelled": 0}
+    for item, r in zip(chunk, results):
+        if r.ok:
+            entries.append({
+                "input_path": item.path,
+                "judul_kasus": item.judul_kasus,
+                "nomor_lp": item.nomor_lp,
+                "tanggal_kejadian": item.tanggal_kejadian,
+                "path_mentah": r.path_mentah,
+                "path_ekstraksi": r.path_ekstraksi,
+                "minutiae_count": r.minutiae_count,
+                "quality_score": r.quality_score,
+                "template": r.template,
+                "singular": (r.core_point, r.delta_point),
+            })
+            counts["done"] += 1
+            print(f"  OK      {os.path.basename(item.path)} ({r.minutiae_count} minutiae)")
+        elif r.error == "Dibatalkan":
+            counts["cancelled"] += 1  # tetap pending, diproses saat dilanjutkan
+        elif (
+            db_manager.QUALITY_GATE_ENABLED
+            and r.quality_score is not None
+            and r.quality_score < threshold
+        ):
+            statuses.append((item.path, "rejected", r.error))
+            counts["rejected"] += 1
+            print(f"  DITOLAK {os.path.basename(item.path)}: {r.error}")
+        else:
+            statuses.append((item.path, "failed", r.error))
+            counts["failed"] += 1
+            print(f"  GAGAL   {os.path.basename(item.path)}: {r.error}")
+
+    db_manager.save_history_bulk(entries, user_id, batch_run=run_name)
+    db_manager.record_batch_status(run_name, statuses)
+    return counts
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Ekstraksi minutiae massal tanpa GUI (direktori, pola glob, atau manifest CSV)."
+    )
+    parser.add_argument("sources", nargs="+", help="Direktori, pola glob, atau file manifest .csv")
+    parser.add_argument("--judul", default=None, help="Judul kasus default (default: nama file)")
+    parser.add_argument("--nomor-lp", default=None, help="Nomor LP default")
+    parser.add_argument("--tanggal", default=None, help="Tanggal kejadian default (YYYY-MM-DD)")
+    parser.add_argument("--user", default="admin", help="Username pemilik riwayat (default: admin)")
+    parser.add_argument("--recursive", action="store_true", help="Telusuri subdirektori")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Jumlah proses worker (default: otomatis; 0 = satu proses, inferensi batch)")
+    parser.add_argument("--threads", type=int, default=2, help="Thread TensorFlow per worker")
+    parser.add_argument("--batch-size", type=int, default=8, help="Ukuran batch inferensi untuk --workers 0")
+    parser.add_argument("--commit-every", type=int, default=32,
+                        help="Jumlah file per transaksi database")
+    parser.add_argument("--min-quality", type=float, default=None,
+                        help=f"Ambang skor kualitas (default: {db_manager.QUALITY_MIN_SCORE})")
+    parser.add_argument("--run-name", default=None,
+                        help="Nama run untuk melanjutkan (default: diturunkan dari daftar file)")
+    parser.add_argument("--retry-rejected", action="store_true",
+                        help="Proses ulang file yang sebelumnya ditolak gerbang kualitas")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.batch_size < 1:
+        parser.error("--batch-size harus >= 1")
+    db_manager.init_db()
+
+    user_id = db_manager.get_user_id_by_username(args.user)
+    if user_id is None:
+        print(f"ERROR: user '{args.user}' tidak ditemukan.")
+        return 2
+
+    defaults = BatchItem(None, args.judul, args.nomor_lp, args.tanggal)
+    items = collect_items(args.sources, defaults, recursive=args.recursive)
+    # Tanpa --judul / kolom judul_kasus, nama file dipakai sebagai judul kasus
+    items = [
+        i if i.judul_kasus else i._replace(judul_kasus=os.path.splitext(os.path.basename(i.path))[0])
+        for i in items
+    ]
+    if not items:
+        print("Tidak ada gambar yang ditemukan.")
+        return 1
+
+    run_name = args.run_name or default_run_name(items)
+    progress = db_manager.get_batch_progress(run_name)
+    skip = {"done"} if args.retry_rejected else {"done", "rejected"}
+    pending = [i for i in items if progress.get(i.path) not in skip]
+    print(f"Run '{run_name}': {len(items)} file, {len(items) - len(pending)} sudah selesai, {len(pending)} diproses.")
+    if not pending:
+        return 0
+
+    # Ctrl+C pertama: selesaikan job berjalan lalu berhenti; kedua: paksa berhenti
+    token = CancelToken()
+
+    def _on_sigint(signum, frame):
+        if token.cancelled:
+            raise KeyboardInterrupt
+        print("\nMenghentikan setelah job yang sedang berjalan... (Ctrl+C lagi untuk paksa)")
+        token.cancel()
+
+    previous_handler = signal.signal(signal.SIGINT, _on_sigint)
+
+    engine = None
+    if args.workers != 0:
+        from extraction_engine import ExtractionEngine
+        engine = ExtractionEngine(max_workers=args.workers, intra_op_threads=args.threads)
+        print(f"Memakai {engine.max_workers} proses worker.")
+
+    totals = {"done": 0, "rejected": 0, "failed": 0, "cancelled": 0}
+    started = time.time()
+    try:
+        step = max(1, args.commit_every)
+        for start in range(0, len(pending), step):
+            if token.cancelled:
+                break
+            chunk = pending[start:start + step]
+            paths = [i.path for i in chunk]
+            juduls = [i.judul_kasus for i in chunk]
+            print(f"[{start + 1}-{start + len(chunk)}/{len(pending)}]")
+            if engine is not None:
+                results = engine.map(paths, juduls, cancel_token=token, min_quality=args.min_quality)
+            else:
+                results = db_manager.run_minutiae_extraction_batch(
+                    paths, juduls, batch_size=args.batch_size,
+                    min_quality=args.min_quality, cancel_token=token,
+                )
+            for k, v in _commit_chunk(run_name, chunk, results, user_id, args.min_quality).items():
+                totals[k] += v
+    finally:
+        if engine is not None:
+            engine.shutdown(wait=True)
+        signal.signal(signal.SIGINT, previous_handler)
+
+    remaining = len(pending) - totals["done"] - totals["rejected"] - totals["failed"]
+    print(
+        f"Selesai dalam {time.time() - started:.1f} dtk: {totals['done']} berhasil, "
+        f"{totals['rejected']} ditolak (kualitas), {totals['failed']} gagal, {remaining} belum diproses."
+    )
+    if remaining:
+        print(f"Lanjutkan dengan perintah yang sama (run '{run_name}').")
+    return 0 if totals["failed"] == 0 and remaining == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+import db_manager
+from core import preprocess
+from core.extractor_pool import model_fingerprint, model_paths
+from core.tflite_backend import QUANT_MODES, apply_tflite_backend
+
+# =========================================================================
+# --- CEK AKURASI BACKEND TFLITE TERKUANTISASI ---
+# =========================================================================
+#
+#   python cek_kuantisasi.py sampel/ --mode int8
+#
+# Menjalankan model Keras (float32) dan model TFLite pada gambar sampel yang
+# sama, lalu mencocokkan minutiae keduanya (jarak <= --radius px dan selisih
+# arah <= --angle derajat). Keluar dengan kode 1 jika rata-rata F1 di bawah
+# --min-f1, jadi bisa dipakai sebelum mengganti INFERENCE_BACKEND.
+
+IMAGE_EXTENSIONS = (".bmp", ".jpg", ".jpeg", ".png", ".tif", ".tiff")
+
+
+def collect_images(sources):
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths.extend(glob.glob(os.path.join(source, "*")))
+        else:
+            paths.extend(glob.glob(source, recursive=True))
+    return sorted({p for p in paths if os.path.splitext(p)[1].lower() in IMAGE_EXTENSIONS})
+
+
+def load_inputs(paths):
+    """Input model dengan preprocessing yang sama seperti jalur ekstraksi biasa."""
+    inputs = []
+    for path in paths:
+        raw = preprocess.prepare_raw(preprocess.decode_gray(path), db_manager.MODEL_INPUT_MAX_SIDE)
+        enhanced_bgr, _ = preprocess.enhance_for_model(raw, **db_manager.ENHANCE_PARAMS)
+        inputs.append(enhanced_bgr)
+    return inputs
+
+
+def run_all(extractor, inputs):
+    """Return: (list array minutiae [x, y, angle], ms per gambar)."""
+    results = []
+    t0 = time.perf_counter()
+    for img in inputs:
+        df = extractor.extract_minutiae(img)["minutiae"]
+        results.append(df[["x", "y", "angle"]].to_numpy(dtype=np.float64))
+    elapsed = (time.perf_counter() - t0) * 1000.0 / max(1, len(inputs))
+    return results, elapsed
+
+
+def match_minutiae(ref, test, radius, max_angle):
+    """
+    Pencocokan greedy (pasangan terdekat dulu) antara minutiae referensi dan
+    uji. Return: (jumlah cocok, rata-rata error posisi px).
+    """
+    if len(ref) == 0 or len(test) == 0:
+        return 0, 0.0
+    dist = np.hypot(ref[:, None, 0] - test[None, :, 0], ref[:, None, 1] - test[None, :, 1])
+    dtheta = np.abs(np.angle(np.exp(1j * (ref[:, None, 2] - test[None, :, 2]))))
+    dist[(dist > radius) | (dtheta > max_angle)] = np.inf
+
+    used_ref, used_test, errors = set(), set(), []
+    for flat in np.argsort(dist, axis=None):
+        i, j = np.unravel_index(flat, dist.shape)
+        if not np.isfinite(dist[i, j]):
+            break
+        if i in used_ref or j in used_test:
+            continue
+        used_ref.add(i)
+        used_test.add(j)
+        errors.append(dist[i, j])
+    return len(errors), float(np.mean(errors)) if errors else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bandingkan minutiae model Keras vs TFLite terkuantisasi.")
+    parser.add_argument("sources", nargs="+", help="Folder atau pola glob gambar sampel")
+    parser.add_argument("--mode", choices=QUANT_MODES, default="int8", help="Mode kuantisasi (default: int8)")
+    parser.add_argument("--radius", type=float, default=8.0, help="Jarak maksimum pasangan minutiae (px)")
+    parser.add_argument("--angle", type=float, default=20.0, help="Selisih arah maksimum (derajat)")
+    parser.add_argument("--min-f1", type=float, default=0.9, help="Ambang rata-rata F1 (default: 0.9)")
+    args = parser.parse_args(argv)
+
+    paths = collect_images(args.sources)
+    if not paths:
+        print("Tidak ada gambar sampel yang ditemukan.")
+        return 2
+
+    from fingerflow.extractor import Extractor
+
+    inputs = load_inputs(paths)
+    # Satu Extractor saja: CoreNet memanggil clear_session saat dibuat, jadi
+    # model Keras yang sama diganti TFLite setelah referensi float selesai.
+    extractor = Extractor(**model_paths(db_manager.MODEL_DIR))
+    print(f"Referensi float32 (Keras) pada {len(paths)} gambar...")
+    reference, ms_keras = run_all(extractor, inputs)
+
+    used = apply_tflite_backend(
+        extractor, model_fingerprint(db_manager.MODEL_DIR), db_manager.MODEL_CACHE_DIR, mode=args.mode
+    )
+    print(f"Backend TFLite {args.mode}: {used}")
+    quantized, ms_tflite = run_all(extractor, inputs)
+
+    max_angle = np.deg2rad(args.angle)
+    f1s = []
+    print(f"{'file':<32} {'ref':>5} {'tfl':>5} {'prec':>6} {'rec':>6} {'F1':>6} {'err px':>7}")
+    for path, ref, test in zip(paths, reference, quantized):
+        matched, err = match_minutiae(ref, test, args.radius, max_angle)
+        precision = matched / len(test) if len(test) else float(len(ref) == 0)
+        recall = matched / len(ref) if len(ref) else float(len(test) == 0)
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        f1s.append(f1)
+        print(f"{os.path.basename(path)[:32]:<32} {len(ref):>5} {len(test):>5} "
+              f"{precision:>6.3f} {recall:>6.3f} {f1:>6.3f} {err:>7.2f}")
+
+    mean_f1 = float(np.mean(f1s))
+    print(f"\nRata-rata F1 {mean_f1:.3f} (ambang {args.min_f1}); "
+          f"waktu {ms_keras:.0f} ms → {ms_tflite:.0f} ms per gambar.")
+    if mean_f1 < args.min_f1:
+        print(f"GAGAL: backend tflite-{args.mode} terlalu menyimpang, tetap pakai INFERENCE_BACKEND = \"keras\".")
+        return 1
+    print(f"OK: aman memakai INFERENCE_BACKEND = \"tflite-{args.mode}\".")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
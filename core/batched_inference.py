@@ -0,0 +1,174 @@
+import numpy as np
+
+# =========================================================================
+# --- INFERENSI FINGERFLOW SECARA BATCH ---
+# =========================================================================
+#
+# `Extractor.extract_minutiae` (fingerflow 3.0.1) memproses satu gambar per
+# panggilan dan memanggil FineNet/ClassifyNet satu kali per minutiae. Modul
+# ini menjalankan langkah yang sama, tetapi:
+#   - CoarseNet dipanggil sekali per kelompok gambar berukuran sama
+#     (tensor N x H x W x 1),
+#   - semua patch minutiae dari seluruh gambar digabung menjadi satu tensor
+#     N x 224 x 224 x 3 untuk FineNet, lalu satu lagi untuk ClassifyNet,
+#   - CoreNet dipanggil sekali dengan tensor N x 416 x 416 x 3.
+# Hasil per gambar sama formatnya dengan Extractor.extract_minutiae:
+#   {"core": DataFrame, "minutiae": DataFrame}
+
+
+def _models(extractor):
+    """Ambil model Keras internal dari Extractor fingerflow (nama ter-mangle)."""
+    minutiae_net = extractor._Extractor__extraction_module
+    classify_net = extractor._Extractor__classification_module
+    core_net = extractor._Extractor__core_detection_module
+    return (
+        minutiae_net._MinutiaeNet__coarse_net,
+        minutiae_net._MinutiaeNet__fine_net,
+        classify_net._ClassifyNet__classify_net,
+        core_net._CoreNet__core_net,
+    )
+
+
+def _coarse_candidates(seg_out, mnt_s_out, mnt_w_out, mnt_h_out, mnt_o_out):
+    """Post-processing CoarseNet untuk satu gambar (sama seperti MinutiaeNet)."""
+    import cv2
+    from fingerflow.extractor.MinutiaeNet.CoarseNet import coarse_net_utils, minutiae_net_utils
+
+    round_seg = np.round(np.squeeze(seg_out))
+    seg_out = 1 - round_seg
+    seg_out = cv2.morphologyEx(seg_out, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (10, 10)))
+    seg_out = cv2.morphologyEx(seg_out, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (7, 7)))
+    seg_out = cv2.dilate(seg_out, cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5)))
+
+    # Threshold adaptif (turun bertahap bila minutiae terlalu sedikit)
+    final_thresh = 0.45
+    early_thresh = final_thresh + 0.05
+    while final_thresh >= 0:
+        mnt = coarse_net_utils.label2mnt(
+            np.squeeze(mnt_s_out) * np.round(np.squeeze(seg_out)),
+            mnt_w_out, mnt_h_out, mnt_o_out,
+            thresh=early_thresh,
+        )
+        mnt_nms_1 = minutiae_net_utils.py_cpu_nms(mnt, 0.5)
+        mnt_nms_2 = minutiae_net_utils.nms(mnt)
+        if mnt_nms_1.shape[0] > 4 and mnt_nms_2.shape[0] > 4:
+            break
+        final_thresh -= 0.05
+        early_thresh -= 0.05
+
+    mnt_nms = minutiae_net_utils.fuse_nms(mnt_nms_1, mnt_nms_2)
+    mnt_nms = mnt_nms[mnt_nms[:, 3] > early_thresh, :]
+    return mnt_nms, final_thresh
+
+
+def _patch_tensor(points, original_image):
+    """Patch 224x224x3 untuk setiap (x, y); patch kosong -> None."""
+    from fingerflow.extractor import utils as ff_utils
+
+    patches = []
+    for x, y in points:
+        patch = ff_utils.get_minutiae_patch(x, y, original_image)
+        patches.append(ff_utils.resize_minutiae_patch(patch)[0] if patch.size > 0 else None)
+    return patches
+
+
+def _predict_stacked(model, patches):
+    """Prediksi satu kali untuk semua patch yang valid; baris None tetap None."""
+    valid = [i for i, p in enumerate(patches) if p is not None]
+    out = [None] * len(patches)
+    if not valid:
+        return out
+    probs = model.predict(np.stack([patches[i] for i in valid], axis=0))
+    for row, i in enumerate(valid):
+        out[i] = probs[row]
+    return out
+
+
+def extract_minutiae_batch(extractor, images_bgr):
+    """
+    Ekstraksi minutiae untuk banyak gambar BGR uint8 sekaligus.
+
+    Mengembalikan list dict {"core", "minutiae"} dengan urutan sama seperti
+    input. Jika struktur internal fingerflow berbeda dari versi yang dikunci
+    di requirements.txt, otomatis kembali ke extract_minutiae per gambar.
+    """
+    images_bgr = list(images_bgr)
+    if not images_bgr:
+        return []
+
+    try:
+        coarse_net, fine_net, classify_net, core_net = _models(extractor)
+    except AttributeError:
+        return [extractor.extract_minutiae(img) for img in images_bgr]
+
+    import cv2
+    from fingerflow.extractor import utils as ff_utils
+    from fingerflow.extractor.ClassifyNet import utils as classify_utils
+    from fingerflow.extractor.CoreNet import utils as core_utils
+    from fingerflow.extractor.MinutiaeNet.CoarseNet import coarse_net_model, minutiae_net_utils
+
+    prepared = [ff_utils.preprocess_image_data(img) for img in images_bgr]
+
+    # --- 1. CoarseNet: satu predict per kelompok ukuran (tensor berbentuk tetap) ---
+    groups = {}
+    for idx, prep in enumerate(prepared):
+        groups.setdefault(prep["image"].shape, []).append(idx)
+
+    candidates = [None] * len(prepared)
+    for shape, idxs in groups.items():
+        batch = np.stack([prepared[i]["image"] for i in idxs], axis=0)[..., np.newaxis]
+        outputs = coarse_net.predict(batch)
+        seg_out, mnt_o_out, mnt_w_out, mnt_h_out, mnt_s_out = outputs[5:10]
+        for row, i in enumerate(idxs):
+            candidates[i] = _coarse_candidates(
+                seg_out[row:row + 1], mnt_s_out[row:row + 1], mnt_w_out[row:row + 1],
+                mnt_h_out[row:row + 1], mnt_o_out[row:row + 1],
+            )
+
+    # --- 2. FineNet: semua patch dari semua gambar dalam satu tensor ---
+    fine_patches, owners = [], []
+    for i, (mnt_nms, _) in enumerate(candidates):
+        fine_patches.extend(_patch_tensor(mnt_nms[:, :2], prepared[i]["original_image"]))
+        owners.extend((i, k) for k in range(mnt_nms.shape[0]))
+    fine_probs = _predict_stacked(fine_net, fine_patches)
+
+    refined = [cand[0].copy() for cand in candidates]
+    for (i, k), prob in zip(owners, fine_probs):
+        if prob is not None:
+            refined[i][k, 3] = (4 * refined[i][k, 3] + prob[0]) / 5
+
+    for i, prep in enumerate(prepared):
+        mnt_nms = refined[i]
+        if mnt_nms.shape[0] > 0:
+            mnt_nms = mnt_nms[mnt_nms[:, 3] > candidates[i][1], :]
+        texture_img = minutiae_net_utils.fast_enhance_texture(prep["image"], sigma=2.5, show=False)
+        dir_map, _ = minutiae_net_utils.get_maps_stft(texture_img, patch_size=64, block_size=16, preprocess=True)
+        coarse_net_model.fuse_minu_orientation(dir_map, mnt_nms, mode=3)
+        refined[i] = mnt_nms
+
+    # --- 3. ClassifyNet: satu tensor untuk semua minutiae ---
+    class_patches, owners = [], []
+    for i, mnt in enumerate(refined):
+        class_patches.extend(_patch_tensor(mnt[:, :2], prepared[i]["original_image"]))
+        owners.extend((i, k) for k in range(mnt.shape[0]))
+    class_probs = _predict_stacked(classify_net, class_patches)
+
+    classified = [[] for _ in refined]
+    for (i, k), prob in zip(owners, class_probs):
+        tmp = refined[i][k].copy()
+        if prob is not None:
+            tmp[4] = float(np.argmax(prob))
+        classified[i].append(tmp)
+
+    # --- 4. CoreNet: input 416x416x3, satu predict untuk semua gambar ---
+    core_batch = np.concatenate(
+        [core_utils.preprocess_image_data(img[:, :, ::-1]) for img in images_bgr], axis=0
+    )
+    core_outputs = core_net.predict(core_batch)
+
+    results = []
+    for i, img in enumerate(images_bgr):
+        core_df = core_utils.get_detection_data(img[:, :, ::-1], [out[i:i + 1] for out in core_outputs])
+        minutiae_df = classify_utils.format_classified_data(np.array(classified[i]))
+        results.append({"core": core_df, "minutiae": minutiae_df})
+    return results
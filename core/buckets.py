@@ -0,0 +1,120 @@
+import time
+
+import numpy as np
+
+# =========================================================================
+# --- BUCKET UKURAN INPUT (MENGHINDARI RETRACING TENSORFLOW) ---
+# =========================================================================
+#
+# Setelah enhance + potong ROI, hampir setiap gambar punya ukuran berbeda,
+# sehingga CoarseNet (satu-satunya jaringan FingerFlow yang inputnya
+# berukuran bebas; FineNet/ClassifyNet 224x224, CoreNet 416x416) melihat
+# bentuk tensor baru di hampir setiap panggilan: graph di-trace ulang dan
+# allocator terus mengalokasi buffer baru.
+#
+# Input model dipad (kanan & bawah) ke kelipatan `multiple` piksel, jadi
+# hanya ada sedikit bentuk kanonik yang bisa di-trace sekali saat warm-up.
+# Koordinat gambar asli tidak bergeser; output cukup dipotong kembali ke
+# ukuran asli (minutiae di area pad dibuang, kotak core di-clip).
+
+
+def bucket_side(n, multiple=64, min_side=0):
+    """Sisi bucket: kelipatan `multiple` terkecil yang >= n (dan >= min_side)."""
+    n = max(int(n), int(min_side), 1)
+    return -(-n // multiple) * multiple
+
+
+def bucket_shape(h, w, multiple=64, min_side=0):
+    return bucket_side(h, multiple, min_side), bucket_side(w, multiple, min_side)
+
+
+def bucket_shapes(max_side, multiple=64, min_side=0):
+    """Semua bucket (h, w) dengan sisi dari bucket min_side sampai bucket max_side."""
+    sides = range(bucket_side(min_side or multiple, multiple), bucket_side(max_side, multiple) + 1, multiple)
+    return [(h, w) for h in sides for w in sides]
+
+
+def long_side_shapes(long_side, multiple=64, min_side=0):
+    """
+    Bucket (h, w) untuk gambar yang sisi panjangnya diresize ke `long_side`:
+    salah satu sisi = bucket long_side, sisi lain bucket min_side..long_side.
+    """
+    top = bucket_side(long_side, multiple, min_side)
+    sides = range(bucket_side(min_side or multiple, multiple), top + 1, multiple)
+    return [(top, s) for s in sides] + [(s, top) for s in sides if s != top]
+
+
+def pad_to_bucket(image, multiple=64, min_side=0):
+    """
+    Pad gambar (H x W atau H x W x C, uint8) ke ukuran bucket-nya dengan
+    nilai median gambar (area rata, tidak memunculkan ridge palsu).
+    Return: (gambar dipad, (h, w) ukuran asli). Tanpa salinan jika sudah pas.
+    """
+    h, w = image.shape[:2]
+    bh, bw = bucket_shape(h, w, multiple, min_side)
+    if (bh, bw) == (h, w):
+        return image, (h, w)
+    fill = np.median(image[::4, ::4]).astype(image.dtype)
+    padded = np.full((bh, bw) + image.shape[2:], fill, dtype=image.dtype)
+    padded[:h, :w] = image
+    return padded, (h, w)
+
+
+def crop_extraction_output(output_data, h, w):
+    """
+    Potong hasil Extractor ({"minutiae", "core"}) dari frame bucket ke frame
+    asli h x w: minutiae di area pad dibuang, kotak core di-clip.
+    Mengubah output_data di tempat dan juga mengembalikannya.
+    """
+    minutiae = output_data.get("minutiae")
+    if minutiae is not None and len(minutiae):
+        x = minutiae["x"].to_numpy(dtype=np.float64)
+        y = minutiae["y"].to_numpy(dtype=np.float64)
+        keep = (x < w) & (y < h)
+        if not keep.all():
+            output_data["minutiae"] = minutiae[keep].reset_index(drop=True)
+    core = output_data.get("core")
+    if core is not None and len(core):
+        for col, limit in (("x1", w), ("x2", w), ("y1", h), ("y2", h)):
+            if col in core:
+                core[col] = core[col].clip(upper=limit - 1)
+    return output_data
+
+
+def trace_buckets(extractor, shapes, progress_callback=None, verbose=True):
+    """
+    Warm-up: jalankan CoarseNet sekali untuk setiap bucket (h, w), atau
+    (n, h, w) untuk predict berisi n gambar sekaligus, supaya graph-nya sudah
+    di-trace sebelum gambar pertama datang. Jika struktur internal fingerflow
+    berbeda, dipakai extract_minutiae penuh per bucket.
+    Return: jumlah bucket yang berhasil di-trace.
+    """
+    from fingerflow.extractor import utils as ff_utils
+    from core.extractor_pool import _dummy_fingerprint
+
+    try:
+        coarse_net = extractor._Extractor__extraction_module._MinutiaeNet__coarse_net
+    except AttributeError:
+        coarse_net = None
+
+    t0 = time.perf_counter()
+    traced = 0
+    for i, shape in enumerate(shapes):
+        n, (h, w) = (shape[0], shape[1:]) if len(shape) == 3 else (1, shape)
+        if progress_callback is not None:
+            progress_callback(f"memanaskan model ({i + 1}/{len(shapes)})...")
+        try:
+            dummy = _dummy_fingerprint((h, w))
+            if coarse_net is None:
+                extractor.extract_minutiae(dummy)
+            else:
+                # Tensor sama persis (dtype & bentuk) dengan jalur inferensi
+                image = ff_utils.preprocess_image_data(dummy)["image"]
+                batch = np.repeat(image[np.newaxis, ..., np.newaxis], n, axis=0)
+                coarse_net.predict(batch)
+            traced += 1
+        except Exception as e:
+            print(f"[buckets] WARNING: warm-up bucket {n}x{h}x{w} gagal: {e}")
+    if verbose:
+        print(f"[buckets] {traced} bucket di-trace dalam {time.perf_counter() - t0:.2f} dtk")
+    return traced
@@ -0,0 +1,273 @@
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# =========================================================================
+# --- MANAJER EXTRACTOR FINGERFLOW (MODEL DIMUAT SEKALI) ---
+# =========================================================================
+
+# Nama file model di folder 'models' -> nama argumen Extractor
+MODEL_FILES = {
+    "coarse_net_path": "CoarseNet.h5",
+    "fine_net_path": "FineNet.h5",
+    "classify_net_path": "ClassifyNet_6_classes.h5",
+    "core_net_path": "CoreNet.weights",
+}
+
+
+def model_paths(model_dir):
+    """Mengembalikan dict argumen Extractor -> path lengkap file model."""
+    return {arg: os.path.join(model_dir, fname) for arg, fname in MODEL_FILES.items()}
+
+
+def model_fingerprint(model_dir):
+    """
+    Sidik versi model: hash dari nama, ukuran dan waktu modifikasi keempat
+    file model. Berubah setiap kali salah satu file model diganti.
+    """
+    h = hashlib.sha1()
+    for fname in sorted(MODEL_FILES.values()):
+        path = os.path.join(model_dir, fname)
+        try:
+            st = os.stat(path)
+            h.update(f"{fname}:{st.st_size}:{st.st_mtime_ns};".encode())
+        except OSError:
+            h.update(f"{fname}:missing;".encode())
+    return h.hexdigest()
+
+
+def _dummy_fingerprint(size=(512, 512)):
+    """Gambar sintetis berpola garis (mirip ridge) untuk warm-up model."""
+    h, w = size
+    yy, xx = np.mgrid[0:h, 0:w].astype("float32")
+    ridges = 127.5 + 127.5 * np.sin((xx * 0.6 + yy * 0.8) * (2 * np.pi / 9.0))
+    gray = ridges.astype("uint8")
+    return np.stack((gray,) * 3, axis=-1)
+
+
+class ExtractorManager:
+    """
+    Menyimpan satu instance `fingerflow.extractor.Extractor` yang tetap hidup.
+
+    - Model dimuat sekali saat pertama dibutuhkan (atau lewat warm_up_async),
+      lalu dipanaskan dengan satu inferensi dummy.
+    - Semua inferensi diserialisasi dengan lock, jadi aman dipanggil dari
+      thread GUI maupun jalur batch.
+    - Jika tidak dipakai selama `idle_timeout` detik, model dilepas dari memori
+      (idle_timeout <= 0 berarti tidak pernah dilepas).
+    - backend="tflite-float16" / "tflite-int8": jaringan diganti versi TFLite
+      terkuantisasi (core/tflite_backend.py) yang di-cache di `cache_dir`.
+    - weight_cache=True: bobot dimuat dari arsip NumPy ber-mmap di
+      `cache_dir`/weights (core/model_cache.py), bukan dari file HDF5 asli.
+    - warm_up_shapes: daftar bucket (h, w) atau (n, h, w) input (core/buckets.py) yang
+      di-trace oleh warm_up_async, supaya tidak ada retracing saat dipakai.
+    """
+
+    def __init__(self, model_dir, idle_timeout=900, warm_up=True, backend="keras", cache_dir=None,
+                 weight_cache=True, warm_up_shapes=None):
+        self.model_dir = model_dir
+        self.idle_timeout = idle_timeout
+        self.warm_up = warm_up
+        self.backend = backend
+        self.weight_cache = weight_cache
+        self.warm_up_shapes = list(warm_up_shapes or [])
+        self._traced_shapes = set()
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(model_dir)), "models_cache")
+
+        self._lock = threading.RLock()
+        self._extractor = None
+        self._in_use = 0
+        self._last_used = 0.0
+        self._idle_timer = None
+
+    # ---------------------------------------------------------------------
+    @property
+    def is_loaded(self):
+        return self._extractor is not None
+
+    def load(self, progress_callback=None):
+        """Memuat model (jika belum) dan mengembalikan instance Extractor."""
+        with self._lock:
+            if self._extractor is not None:
+                return self._extractor
+
+            paths = model_paths(self.model_dir)
+            if not all(os.path.exists(p) for p in paths.values()):
+                raise FileNotFoundError(
+                    f"Satu atau lebih file model Fingerflow (.h5/weights) tidak ditemukan di: {self.model_dir}"
+                )
+
+            if progress_callback is not None:
+                progress_callback("memuat model ekstraksi minutiae...")
+
+            t0 = time.perf_counter()
+            if self.weight_cache:
+                from core.model_cache import load_extractor
+                extractor, source = load_extractor(paths, os.path.join(self.cache_dir, "weights"))
+            else:
+                from fingerflow.extractor import Extractor
+                extractor, source = Extractor(**paths), "source"
+            print(f"[extractor] Model dimuat ({source}) dalam {time.perf_counter() - t0:.2f} dtk")
+
+            if self.backend.startswith("tflite"):
+                self._apply_tflite(extractor, progress_callback)
+
+            if self.warm_up:
+                if progress_callback is not None:
+                    progress_callback("memanaskan model...")
+                try:
+                    t0 = time.perf_counter()
+                    extractor.extract_minutiae(_dummy_fingerprint())
+                    print(f"[extractor] Warm-up selesai dalam {time.perf_counter() - t0:.2f} dtk")
+                except Exception as e:
+                    # Warm-up hanya optimasi, kegagalannya tidak fatal
+                    print(f"[extractor] WARNING: warm-up gagal: {e}")
+
+            self._extractor = extractor
+            self._last_used = time.monotonic()
+            self._schedule_idle_check()
+            return extractor
+
+    def _apply_tflite(self, extractor, progress_callback=None):
+        from core.tflite_backend import apply_tflite_backend
+
+        mode = self.backend.split("-", 1)[1] if "-" in self.backend else "float16"
+        try:
+            used = apply_tflite_backend(
+                extractor,
+                model_fingerprint(self.model_dir),
+                self.cache_dir,
+                mode=mode,
+                progress_callback=progress_callback,
+            )
+            print(f"[extractor] Backend {self.backend}: {used}")
+        except Exception as e:
+            # Backend TFLite opsional: tetap jalan dengan model Keras
+            print(f"[extractor] WARNING: backend {self.backend} gagal, memakai Keras: {e}")
+
+    def unload(self):
+        """Melepas model dari memori (dipanggil otomatis saat idle)."""
+        with self._lock:
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            if self._extractor is None:
+                return
+            self._extractor = None
+            self._traced_shapes.clear()
+
+            # Di dalam lock supaya tidak bentrok dengan load() berikutnya
+            try:
+                import sys
+                if "tensorflow" in sys.modules:
+                    sys.modules["tensorflow"].keras.backend.clear_session()
+            except Exception as e:
+                print(f"[extractor] WARNING: clear_session gagal: {e}")
+            import gc
+            gc.collect()
+        print("[extractor] Model dilepas dari memori.")
+
+    @contextmanager
+    def acquire(self, progress_callback=None, cancel_token=None):
+        """
+        Context manager untuk memakai Extractor secara eksklusif:
+
+            with manager.acquire() as extractor:
+                output = extractor.extract_minutiae(img)
+
+        cancel_token diterima demi kesamaan antarmuka dengan InferenceProcess;
+        predict yang sedang berjalan di proses ini tidak bisa dihentikan, jadi
+        pembatalan baru berlaku setelah inferensi selesai.
+        """
+        with self._lock:
+            extractor = self.load(progress_callback=progress_callback)
+            self._in_use += 1
+            try:
+                yield extractor
+            finally:
+                self._in_use -= 1
+                self._last_used = time.monotonic()
+                self._schedule_idle_check()
+
+    def extract_minutiae(self, image_bgr, progress_callback=None):
+        """Shortcut: satu inferensi FingerFlow dengan model yang sudah hangat."""
+        with self.acquire(progress_callback=progress_callback) as extractor:
+            return extractor.extract_minutiae(image_bgr)
+
+    def trace_shapes(self, shapes=None):
+        """
+        Trace CoarseNet untuk setiap bucket input yang belum di-trace. Lock
+        dilepas di antara bucket, jadi ekstraksi sungguhan tidak menunggu
+        seluruh warm-up selesai.
+        """
+        from core.buckets import trace_buckets
+
+        for shape in (self.warm_up_shapes if shapes is None else shapes):
+            shape = tuple(shape)
+            with self.acquire() as extractor:
+                if shape in self._traced_shapes:
+                    continue
+                trace_buckets(extractor, [shape], verbose=False)
+                self._traced_shapes.add(shape)
+
+    def warm_up_async(self):
+        """Memuat + memanaskan model (dan bucket input) di thread latar (tidak memblok GUI)."""
+        def _run():
+            try:
+                self.load()
+                if self.warm_up_shapes:
+                    t0 = time.perf_counter()
+                    self.trace_shapes()
+                    print(f"[extractor] {len(self.warm_up_shapes)} bucket input di-trace dalam "
+                          f"{time.perf_counter() - t0:.2f} dtk")
+            except Exception as e:
+                print(f"[extractor] WARNING: gagal memuat model di latar: {e}")
+
+        t = threading.Thread(target=_run, daemon=True)
+        t.start()
+        return t
+
+    # ---------------------------------------------------------------------
+    def _schedule_idle_check(self):
+        if self.idle_timeout is None or self.idle_timeout <= 0:
+            return
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        self._idle_timer = threading.Timer(self.idle_timeout, self._on_idle_timer)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def _on_idle_timer(self):
+        with self._lock:
+            self._idle_timer = None
+            if self._extractor is None or self._in_use > 0:
+                return
+            idle = time.monotonic() - self._last_used
+            if idle < self.idle_timeout:
+                self._schedule_idle_check()
+                return
+            self.unload()
+
+
+# Instance bersama per folder model (satu proses = satu set model)
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_extractor_manager(model_dir, idle_timeout=900, backend="keras", cache_dir=None, weight_cache=True,
+                          warm_up_shapes=None):
+    """Mengembalikan ExtractorManager bersama untuk `model_dir` + backend."""
+    key = (os.path.abspath(model_dir), backend)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = ExtractorManager(
+                model_dir, idle_timeout=idle_timeout, backend=backend, cache_dir=cache_dir,
+                weight_cache=weight_cache, warm_up_shapes=warm_up_shapes,
+            )
+            _managers[key] = manager
+        return manager
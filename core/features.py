@@ -0,0 +1,84 @@
+import numpy as np
+
+from core.template import MINUTIAE_CLASS_NAMES
+
+# =========================================================================
+# --- FITUR PARTISI GALERI: DISTRIBUSI KELAS & TITIK SINGULAR ---
+# =========================================================================
+#
+# Disimpan per riwayat (kolom tabel history) supaya pencarian/laporan bisa
+# menyaring galeri dengan query SQL berindeks dan menyelaraskan sidik jari
+# pada titik core sebelum perbandingan minutiae yang mahal.
+#
+#   class_<nama>    proporsi minutiae per kelas ClassifyNet (jumlahnya 1,
+#                   minutiae bertipe -1 tidak dihitung)
+#   dominant_class  indeks kelas terbanyak (MINUTIAE_CLASS_NAMES), NULL jika
+#                   tidak ada minutiae berkelas
+#   core_x/y/score  pusat kotak CoreNet dengan skor tertinggi (koordinat
+#                   gambar ekstraksi, sama dengan template)
+#   delta_x/y       hanya terisi jika model CoreNet melaporkan kelas 'delta';
+#                   model FingerFlow bawaan hanya mendeteksi core
+
+CLASS_COLUMNS = tuple(f"class_{name}" for name in MINUTIAE_CLASS_NAMES)
+
+SINGULAR_COLUMNS = ("dominant_class", "core_x", "core_y", "core_score", "delta_x", "delta_y")
+
+HISTORY_FEATURE_COLUMNS = CLASS_COLUMNS + SINGULAR_COLUMNS
+
+
+def class_distribution(minutiae):
+    """Array MINUTIA_DTYPE -> proporsi per kelas (float64, panjang 6; nol semua jika kosong)."""
+    types = np.asarray(minutiae["type"], dtype=np.int64)
+    types = types[(types >= 0) & (types < len(MINUTIAE_CLASS_NAMES))]
+    counts = np.bincount(types, minlength=len(MINUTIAE_CLASS_NAMES)).astype(np.float64)
+    total = counts.sum()
+    return counts / total if total else counts
+
+
+def dominant_class(distribution):
+    """Indeks kelas terbanyak, atau None jika distribusi kosong."""
+    distribution = np.asarray(distribution)
+    if not distribution.any():
+        return None
+    return int(np.argmax(distribution))
+
+
+def singular_points(core_df):
+    """
+    DataFrame CoreNet (x1, y1, x2, y2, score[, class_name]) -> (core, delta),
+    masing-masing (x, y, score) pusat kotak berskor tertinggi atau None.
+    """
+    if core_df is None or len(core_df) == 0 or not {"x1", "y1", "x2", "y2"}.issubset(core_df.columns):
+        return None, None
+    x = (core_df["x1"].to_numpy(dtype=np.float64) + core_df["x2"].to_numpy(dtype=np.float64)) / 2.0
+    y = (core_df["y1"].to_numpy(dtype=np.float64) + core_df["y2"].to_numpy(dtype=np.float64)) / 2.0
+    if "score" in core_df:
+        score = core_df["score"].to_numpy(dtype=np.float64)
+    else:
+        score = np.ones(len(x))
+    if "class_name" in core_df:
+        is_delta = core_df["class_name"].astype(str).str.lower().to_numpy() == "delta"
+    else:
+        is_delta = np.zeros(len(x), dtype=bool)
+
+    def best(mask):
+        idx = np.flatnonzero(mask & np.isfinite(x) & np.isfinite(y))
+        if not len(idx):
+            return None
+        i = idx[np.argmax(np.nan_to_num(score[idx], nan=-1.0))]
+        return float(x[i]), float(y[i]), float(score[i])
+
+    return best(~is_delta), best(is_delta)
+
+
+def history_features(minutiae, core=None, delta=None):
+    """
+    Nilai HISTORY_FEATURE_COLUMNS (urutan sama) untuk satu riwayat.
+    core/delta: (x, y, score) dari singular_points, atau None.
+    """
+    distribution = class_distribution(minutiae)
+    core_x, core_y, core_score = core if core is not None else (None, None, None)
+    delta_x, delta_y = delta[:2] if delta is not None else (None, None)
+    return tuple(float(p) for p in distribution) + (
+        dominant_class(distribution), core_x, core_y, core_score, delta_x, delta_y
+    )
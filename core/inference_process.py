@@ -0,0 +1,329 @@
+import multiprocessing
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+from core import shm_transport
+from core.jobs import JobCancelled
+
+# =========================================================================
+# --- INFERENSI FINGERFLOW DI PROSES ANAK YANG DIAWASI ---
+# =========================================================================
+#
+# TensorFlow tidak lagi berjalan di proses GUI. InferenceProcess menjalankan
+# ExtractorManager di satu proses anak ('spawn') dan berkomunikasi lewat
+# Pipe; preprocessing, render & database tetap di proses induk.
+#
+# Protokol (satu permintaan sekaligus, diserialisasi dengan lock):
+#   induk -> anak : (op, *args)      op: "load", "trace", "extract", "batch", "stop"
+#   anak  -> induk: ("progress", msg)* lalu ("ok", hasil) atau ("error", exc)
+# Array besar di argumen & hasil dikirim lewat shared memory
+# (core/shm_transport.py), bukan di-pickle ke Pipe.
+#
+# Jika proses anak mati (crash native, OOM) atau tidak menjawab dalam
+# request_timeout detik (deadlock), permintaan tsb gagal dengan
+# InferenceWorkerError, proses lama dimatikan di thread latar dan proses baru
+# langsung dijalankan (memuat model sendiri). Thread pemanggil tidak pernah
+# menunggu proses lama berhenti, jadi GUI tetap responsif.
+#
+# Hal yang sama terjadi jika cancel_token permintaan di-set (job dibatalkan
+# pengguna saat inferensi): proses anak diganti dan JobCancelled di-raise,
+# jadi permintaan berikutnya tidak antre di belakang predict yang macet.
+
+
+class InferenceWorkerError(RuntimeError):
+    """Proses inferensi crash / hang; permintaan gagal dan proses diganti."""
+
+
+# ---------------------------------------------------------------------------
+# Sisi proses anak
+# ---------------------------------------------------------------------------
+
+def _child_main(conn, manager_kwargs, preload):
+    # Ctrl+C ditangani proses induk
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from core.extractor_pool import ExtractorManager
+
+    manager = ExtractorManager(**manager_kwargs)
+
+    def progress(msg):
+        conn.send(("progress", msg))
+
+    # Bucket input di-trace satu per satu hanya selama tidak ada permintaan
+    # yang menunggu, jadi ekstraksi pertama tidak menunggu seluruh warm-up
+    pending_shapes = []
+    reply_segments = shm_transport.SegmentSet()
+    if preload:
+        try:
+            manager.load()
+            pending_shapes = list(manager.warm_up_shapes)
+        except Exception as e:
+            # Permintaan pertama akan mencoba lagi dan melaporkan error-nya
+            print(f"[inference] WARNING: gagal memuat model di proses inferensi: {e}")
+
+    while True:
+        try:
+            if pending_shapes and not conn.poll(0):
+                try:
+                    manager.trace_shapes([pending_shapes.pop(0)])
+                except Exception as e:
+                    print(f"[inference] WARNING: warm-up bucket gagal: {e}")
+                    pending_shapes = []
+                continue
+            msg = conn.recv()
+        except (EOFError, OSError):
+            break  # proses induk sudah tidak ada
+        # Permintaan baru = induk sudah selesai menyalin hasil sebelumnya
+        reply_segments.close()
+        if msg[0] == "stop":
+            break
+        attached = []
+        try:
+            # View ke segmen input hanya hidup selama _handle berjalan
+            reply = ("ok", _handle(manager, shm_transport.unpack(msg, attached), progress))
+        except Exception as e:
+            reply = ("error", e)
+        finally:
+            shm_transport.release(attached)
+        try:
+            if reply[0] == "ok":
+                reply = ("ok", shm_transport.pack(reply[1], reply_segments))
+            conn.send(reply)
+        except Exception as e:
+            # Hasil / exception yang tidak bisa dikirim
+            reply_segments.close(unlink=True)
+            conn.send(("error", RuntimeError(f"{type(e).__name__}: {e}")))
+    reply_segments.close()
+    conn.close()
+
+
+def _handle(manager, request, progress):
+    op, args = request[0], request[1:]
+    if op == "load":
+        manager.load(progress_callback=progress)
+        return None
+    if op == "trace":
+        manager.trace_shapes(args[0])
+        return None
+    if op == "extract":
+        with manager.acquire(progress_callback=progress) as extractor:
+            return extractor.extract_minutiae(args[0])
+    if op == "batch":
+        from core.batched_inference import extract_minutiae_batch
+
+        with manager.acquire(progress_callback=progress) as extractor:
+            return extract_minutiae_batch(extractor, args[0])
+    raise ValueError(f"Operasi inferensi tidak dikenal: {op}")
+
+
+# ---------------------------------------------------------------------------
+# Sisi proses induk
+# ---------------------------------------------------------------------------
+
+class RemoteExtractor:
+    """Pengganti fingerflow Extractor di proses induk (lihat InferenceProcess.acquire)."""
+
+    def __init__(self, process, progress_callback=None, cancel_token=None):
+        self._process = process
+        self._progress_callback = progress_callback
+        self._cancel_token = cancel_token
+
+    def extract_minutiae(self, image_bgr):
+        return self._process.request(
+            "extract", image_bgr, progress_callback=self._progress_callback, cancel_token=self._cancel_token
+        )
+
+    def extract_minutiae_batch(self, images_bgr):
+        """Sama dengan core.batched_inference.extract_minutiae_batch, dijalankan di proses anak."""
+        return self._process.request(
+            "batch", list(images_bgr), progress_callback=self._progress_callback, cancel_token=self._cancel_token
+        )
+
+
+class InferenceProcess:
+    """
+    Pengawas satu proses inferensi. Antarmukanya sama dengan ExtractorManager
+    (acquire, load, warm_up_async, trace_shapes, unload), jadi jalur
+    ekstraksi di db_manager tidak perlu tahu model berjalan di proses lain.
+    """
+
+    def __init__(self, manager_kwargs, request_timeout=300.0, poll_interval=0.2):
+        self.manager_kwargs = dict(manager_kwargs)
+        self.request_timeout = request_timeout
+        self.poll_interval = poll_interval
+        self.restarts = 0
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.RLock()
+        self._proc = None
+        self._conn = None
+
+    # ---------------------------------------------------------------------
+    @property
+    def is_loaded(self):
+        return self._proc is not None and self._proc.is_alive()
+
+    def start(self):
+        """Jalankan proses anak (jika belum hidup). Model dimuat di sana di latar."""
+        with self._lock:
+            if self.is_loaded:
+                return
+            if self._proc is not None:
+                # Mati saat tidak ada permintaan (mis. OOM killer)
+                print(f"[inference] WARNING: proses inferensi berhenti (exit code {self._proc.exitcode}); "
+                      "dijalankan ulang.")
+                self.restarts += 1
+            self._discard_process()
+            parent_conn, child_conn = self._ctx.Pipe(duplex=True)
+            proc = self._ctx.Process(
+                target=_child_main,
+                args=(child_conn, self.manager_kwargs, True),
+                name="fingerflow-inference",
+                daemon=True,
+            )
+            proc.start()
+            child_conn.close()  # hanya proses anak yang memegang ujung ini
+            self._proc, self._conn = proc, parent_conn
+            print(f"[inference] Proses inferensi dijalankan (PID {proc.pid})")
+
+    def restart(self, reason):
+        """Ganti proses anak. Proses lama dihentikan di thread latar."""
+        with self._lock:
+            print(f"[inference] WARNING: {reason}; proses inferensi dijalankan ulang.")
+            self.restarts += 1
+            self._discard_process()
+            self.start()
+
+    def _discard_process(self):
+        proc, conn = self._proc, self._conn
+        self._proc, self._conn = None, None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+        if proc is not None:
+            threading.Thread(target=_reap, args=(proc,), name="inference-reaper", daemon=True).start()
+
+    def request(self, op, *args, progress_callback=None, timeout=None, cancel_token=None):
+        """
+        Kirim satu permintaan ke proses anak dan tunggu hasilnya.
+        cancel_token (core.jobs.CancelToken, opsional): jika di-set selama
+        menunggu, proses anak diganti dan JobCancelled di-raise.
+        """
+        timeout = self.request_timeout if timeout is None else timeout
+        with self._lock:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            self.start()
+            # Segmen input milik induk: di-unlink setelah balasan diterima,
+            # juga saat proses anak crash/hang
+            segments = shm_transport.SegmentSet()
+            try:
+                message = shm_transport.pack((op,) + args, segments)
+                return self._exchange(message, timeout, progress_callback, cancel_token)
+            finally:
+                segments.close(unlink=True)
+
+    def _exchange(self, message, timeout, progress_callback, cancel_token=None):
+        proc, conn = self._proc, self._conn
+        try:
+            conn.send(message)
+        except (OSError, EOFError) as e:
+            self.restart(f"gagal mengirim ke proses inferensi ({e})")
+            raise InferenceWorkerError("Proses inferensi berhenti; silakan ulangi.")
+
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            if conn.poll(self.poll_interval):
+                try:
+                    kind, payload = conn.recv()
+                except (EOFError, OSError):
+                    kind, payload = None, None
+                if kind == "progress":
+                    if progress_callback is not None:
+                        try:
+                            progress_callback(payload)
+                        except Exception:
+                            pass
+                    continue
+                if kind == "ok":
+                    # Array hasil disalin dari segmen anak lalu segmennya di-unlink
+                    return shm_transport.unpack(payload, copy=True)
+                if kind == "error":
+                    raise payload
+                # EOF: proses anak mati di tengah permintaan
+                proc.join(0.5)
+                self.restart(f"proses inferensi berhenti (exit code {proc.exitcode})")
+                raise InferenceWorkerError(
+                    f"Proses inferensi berhenti tiba-tiba (exit code {proc.exitcode}); silakan ulangi."
+                )
+            if not proc.is_alive():
+                self.restart(f"proses inferensi berhenti (exit code {proc.exitcode})")
+                raise InferenceWorkerError(
+                    f"Proses inferensi berhenti tiba-tiba (exit code {proc.exitcode}); silakan ulangi."
+                )
+            if cancel_token is not None and cancel_token.cancelled:
+                # Hasil permintaan ini tidak dibutuhkan lagi; jangan tunggu predict-nya selesai
+                self.restart("job dibatalkan saat inferensi")
+                raise JobCancelled("Job dibatalkan")
+            if deadline is not None and time.monotonic() > deadline:
+                self.restart(f"proses inferensi tidak merespons selama {timeout:.0f} dtk")
+                raise InferenceWorkerError("Proses inferensi tidak merespons; silakan ulangi.")
+
+    # --- antarmuka ExtractorManager ---------------------------------------
+    def load(self, progress_callback=None):
+        self.request("load", progress_callback=progress_callback)
+
+    @contextmanager
+    def acquire(self, progress_callback=None, cancel_token=None):
+        yield RemoteExtractor(self, progress_callback, cancel_token)
+
+    def extract_minutiae(self, image_bgr, progress_callback=None):
+        return self.request("extract", image_bgr, progress_callback=progress_callback)
+
+    def trace_shapes(self, shapes=None):
+        self.request("trace", shapes)
+
+    def warm_up_async(self):
+        """Jalankan proses anak; ia memuat & memanaskan model sendiri."""
+        t = threading.Thread(target=self.start, name="inference-start", daemon=True)
+        t.start()
+        return t
+
+    def unload(self):
+        """Hentikan proses anak (memori model ikut dilepas)."""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.send(("stop",))
+                except (OSError, EOFError):
+                    pass
+            self._discard_process()
+
+
+def _reap(proc, grace=5.0):
+    """Hentikan proses lama: tunggu sebentar, SIGTERM, lalu SIGKILL."""
+    proc.join(0.5)
+    if proc.is_alive():
+        proc.terminate()
+        proc.join(grace)
+    if proc.is_alive():
+        proc.kill()
+        proc.join(grace)
+
+
+# Instance bersama per konfigurasi model (satu proses inferensi per aplikasi)
+_processes = {}
+_processes_lock = threading.Lock()
+
+
+def get_inference_process(manager_kwargs, request_timeout=300.0):
+    key = (manager_kwargs["model_dir"], manager_kwargs.get("backend", "keras"))
+    with _processes_lock:
+        process = _processes.get(key)
+        if process is None:
+            process = InferenceProcess(manager_kwargs, request_timeout=request_timeout)
+            _processes[key] = process
+        return process
@@ -0,0 +1,205 @@
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+from core.template import MINUTIA_DTYPE, Template
+
+# =========================================================================
+# --- TEMPLATE STANDAR ISO/IEC 19794-2:2005 & ANSI INCITS 378-2004 ---
+# =========================================================================
+#
+# Encoder/decoder record "FMR" (finger minutiae record) dari/ke
+# core.template.Template. Satu record = header + satu finger view per
+# template; setiap minutiae 6 byte big-endian:
+#   2 bit tipe (01 ending, 10 bifurcation, 00 lainnya) + 14 bit X
+#   2 bit cadangan + 14 bit Y
+#   1 byte sudut (ISO: satuan 360/256 derajat, ANSI: satuan 2 derajat)
+#   1 byte kualitas 0..100
+# Semua minutiae dikonversi sekaligus lewat array terstruktur NumPy (tanpa
+# loop Python per minutiae). Extended data block tidak ditulis (panjang 0)
+# dan dilewati saat decode.
+#
+# Konvensi sudut: FingerFlow memakai radian pada sumbu gambar (y ke bawah);
+# ISO/ANSI berlawanan arah jarum jam dengan y ke atas, jadi tandanya dibalik.
+
+FORMAT_ISO = "iso"
+FORMAT_ANSI = "ansi"
+FORMATS = (FORMAT_ISO, FORMAT_ANSI)
+
+# Resolusi default (piksel/cm) bila tidak diketahui: 197 ≈ 500 ppi, resolusi
+# kerja model (MODEL_TARGET_PPI)
+DEFAULT_RESOLUTION = 197
+_CM_PER_INCH = 2.54
+
+MAX_MINUTIAE = 255  # jumlah minutiae per finger view disimpan dalam 1 byte
+_COORD_MASK = 0x3FFF
+
+_MAGIC = b"FMR\x00"
+_VERSION = b" 20\x00"
+
+# Setelah panjang record: ISO = peralatan(2) w h xres yres views reserved
+_ISO_HEADER = struct.Struct(">4s4sIHHHHHBB")
+# ANSI (panjang 2 byte): + CBEFF product id (4) sebelum peralatan
+_ANSI_HEADER = struct.Struct(">4s4sHIHHHHHBB")
+_ANSI_HEADER_EXT = struct.Struct(">4s4sHIIHHHHHBB")  # panjang 0x0000 + 4 byte
+_VIEW_HEADER = struct.Struct(">BBBB")
+_EXT_LENGTH = struct.Struct(">H")
+
+_RECORD_MINUTIA = np.dtype([("x", ">u2"), ("y", ">u2"), ("angle", "u1"), ("quality", "u1")])
+
+# Tipe FingerFlow (template.MINUTIAE_CLASS_NAMES) <-> kode tipe standar
+_TYPE_ENDING, _TYPE_BIFURCATION, _TYPE_OTHER = 1, 2, 0
+_CLASS_ENDING, _CLASS_BIFURCATION, _CLASS_OTHER = 0, 1, 5
+
+FingerView = namedtuple("FingerView", "template finger_position impression_type quality")
+
+
+def _angle_unit(fmt):
+    return 2.0 * np.pi / (256.0 if fmt == FORMAT_ISO else 180.0)
+
+
+def _encode_minutiae(minutiae, fmt):
+    m = minutiae
+    if len(m) > MAX_MINUTIAE:
+        # Simpan minutiae dengan skor tertinggi
+        m = m[np.argsort(-m["score"], kind="stable")[:MAX_MINUTIAE]]
+    codes = np.full(len(m), _TYPE_OTHER, dtype=np.uint16)
+    codes[m["type"] == _CLASS_ENDING] = _TYPE_ENDING
+    codes[m["type"] == _CLASS_BIFURCATION] = _TYPE_BIFURCATION
+
+    steps = 256 if fmt == FORMAT_ISO else 180
+    theta = np.mod(-np.nan_to_num(m["angle"].astype(np.float64)), 2.0 * np.pi)
+
+    out = np.zeros(len(m), dtype=_RECORD_MINUTIA)
+    x = np.clip(np.rint(m["x"]), 0, _COORD_MASK).astype(np.uint16)
+    y = np.clip(np.rint(m["y"]), 0, _COORD_MASK).astype(np.uint16)
+    out["x"] = (codes << 14) | x
+    out["y"] = y
+    out["angle"] = np.mod(np.rint(theta / _angle_unit(fmt)), steps).astype(np.uint8)
+    out["quality"] = np.clip(np.rint(np.nan_to_num(m["score"]) * 100), 0, 100).astype(np.uint8)
+    return out
+
+
+def _decode_minutiae(raw, fmt):
+    codes = raw["x"] >> 14
+    out = np.zeros(len(raw), dtype=MINUTIA_DTYPE)
+    out["x"] = raw["x"] & _COORD_MASK
+    out["y"] = raw["y"] & _COORD_MASK
+    theta = raw["angle"].astype(np.float64) * _angle_unit(fmt)
+    out["angle"] = np.mod(-theta, 2.0 * np.pi)
+    out["score"] = raw["quality"] / np.float32(100.0)
+    out["type"] = np.where(
+        codes == _TYPE_ENDING, _CLASS_ENDING,
+        np.where(codes == _TYPE_BIFURCATION, _CLASS_BIFURCATION, _CLASS_OTHER),
+    )
+    return out
+
+
+def encode_record(tpl, fmt=FORMAT_ISO, finger_position=0, finger_quality=None,
+                  resolution=None, impression_type=0):
+    """
+    Template -> bytes satu record ISO 19794-2 / ANSI 378 (satu finger view).
+    finger_quality 0..1 (mis. history.quality_score); None = 0 (tidak diketahui).
+    resolution (piksel/cm): None = dari tpl.ppi, atau DEFAULT_RESOLUTION.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Format template tidak dikenal: {fmt}")
+    body = _encode_minutiae(tpl.minutiae, fmt)
+    quality = 0 if finger_quality is None else int(np.clip(round(finger_quality * 100), 0, 100))
+    view = (
+        _VIEW_HEADER.pack(finger_position, impression_type & 0x0F, quality, len(body))
+        + body.tobytes()
+        + _EXT_LENGTH.pack(0)
+    )
+    if resolution is None:
+        resolution = int(round(tpl.ppi / _CM_PER_INCH)) if tpl.ppi else DEFAULT_RESOLUTION
+    resolution = int(np.clip(resolution, 0, 0xFFFF))
+    width = int(np.clip(tpl.width or 0, 0, 0xFFFF))
+    height = int(np.clip(tpl.height or 0, 0, 0xFFFF))
+
+    if fmt == FORMAT_ISO:
+        length = _ISO_HEADER.size + len(view)
+        header = _ISO_HEADER.pack(_MAGIC, _VERSION, length, 0, width, height, resolution, resolution, 1, 0)
+    elif _ANSI_HEADER.size + len(view) <= 0xFFFF:
+        length = _ANSI_HEADER.size + len(view)
+        header = _ANSI_HEADER.pack(_MAGIC, _VERSION, length, 0, 0, width, height, resolution, resolution, 1, 0)
+    else:
+        length = _ANSI_HEADER_EXT.size + len(view)
+        header = _ANSI_HEADER_EXT.pack(_MAGIC, _VERSION, 0, length, 0, 0, width, height,
+                                       resolution, resolution, 1, 0)
+    return header + view
+
+
+def _parse_header(buf, offset, fmt):
+    """
+    Return: (panjang record, width, height, resolusi x (piksel/cm), jumlah
+    view, offset view pertama).
+    """
+    if bytes(buf[offset:offset + 8]) != _MAGIC + _VERSION:
+        raise ValueError("Bukan record FMR versi 2.0")
+    if fmt == FORMAT_ISO:
+        _, _, length, _, w, h, xres, _, views, _ = _ISO_HEADER.unpack_from(buf, offset)
+        return length, w, h, xres, views, offset + _ISO_HEADER.size
+    (short_length,) = struct.unpack_from(">H", buf, offset + 8)
+    if short_length:
+        _, _, length, _, _, w, h, xres, _, views, _ = _ANSI_HEADER.unpack_from(buf, offset)
+        return length, w, h, xres, views, offset + _ANSI_HEADER.size
+    _, _, _, length, _, _, w, h, xres, _, views, _ = _ANSI_HEADER_EXT.unpack_from(buf, offset)
+    return length, w, h, xres, views, offset + _ANSI_HEADER_EXT.size
+
+
+def decode_record(buf, fmt=FORMAT_ISO, offset=0):
+    """
+    bytes -> (list FingerView, offset record berikutnya). Minutiae setiap
+    view dibaca dengan satu np.frombuffer lalu dikonversi secara vektor.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Format template tidak dikenal: {fmt}")
+    length, width, height, resolution, n_views, pos = _parse_header(buf, offset, fmt)
+    ppi = resolution * _CM_PER_INCH if resolution else None
+    end = offset + length
+    if end > len(buf):
+        raise ValueError("Record template terpotong")
+
+    views = []
+    for _ in range(n_views):
+        finger_position, view_impression, quality, count = _VIEW_HEADER.unpack_from(buf, pos)
+        pos += _VIEW_HEADER.size
+        raw = np.frombuffer(buf, dtype=_RECORD_MINUTIA, count=count, offset=pos)
+        pos += count * _RECORD_MINUTIA.itemsize
+        (ext_length,) = _EXT_LENGTH.unpack_from(buf, pos)
+        pos += _EXT_LENGTH.size + ext_length
+        if pos > end:
+            raise ValueError("Finger view melewati panjang record")
+        views.append(FingerView(
+            Template(_decode_minutiae(raw, fmt), width, height, ppi),
+            finger_position,
+            view_impression & 0x0F,
+            quality / 100.0 if quality else None,
+        ))
+    return views, end
+
+
+def iter_records(stream, fmt=FORMAT_ISO):
+    """
+    Baca record FMR berurutan dari file biner (satu atau banyak record
+    disambung). Hanya satu record yang berada di memori sekaligus.
+    """
+    while True:
+        head = stream.read(14)  # cukup untuk membaca panjang record di kedua format
+        if not head:
+            return
+        if len(head) < 14:
+            raise ValueError("Record template terpotong")
+        if fmt == FORMAT_ISO:
+            (length,) = struct.unpack_from(">I", head, 8)
+        else:
+            (length,) = struct.unpack_from(">H", head, 8)
+            if length == 0:
+                (length,) = struct.unpack_from(">I", head, 10)
+        if length < _ISO_HEADER.size:
+            raise ValueError("Panjang record template tidak valid")
+        rest = stream.read(length - len(head))
+        views, _ = decode_record(head + rest, fmt)
+        yield views
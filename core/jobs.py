@@ -0,0 +1,209 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from core.template import MINUTIAE_CLASS_NAMES, Template, empty_minutiae
+
+# =========================================================================
+# --- JOB EKSTRAKSI: TAHAP, PROGRES, WAKTU & PEMBATALAN ---
+# =========================================================================
+#
+# ExtractionJob dibuat oleh pemanggil (GUI/batch) dan diteruskan ke
+# run_minutiae_extraction. Pipeline memanggil job.enter(Stage.X) di setiap
+# pergantian tahap; di situ token pembatalan diperiksa, waktu tahap dicatat
+# dan listener diberi tahu. Inferensi yang sedang berjalan tidak dipotong di
+# tengah; pembatalan berlaku di batas tahap berikutnya (atau antar tile).
+#
+# Hasilnya dikembalikan sebagai ExtractionResult (satu objek per gambar),
+# bukan lewat variabel global modul, jadi banyak job aman berjalan paralel.
+
+
+class Stage(Enum):
+    QUEUED = "queued"
+    LOADING = "loading"          # decode & simpan gambar mentah
+    QUALITY = "quality"          # gerbang kualitas
+    CACHE = "cache"              # cek cache hasil ekstraksi
+    PREPROCESS = "preprocess"    # enhance + ROI
+    INFERENCE = "inference"      # model FingerFlow
+    RENDER = "render"            # visualisasi overlay
+    SAVING = "saving"            # tulis cache / database
+    DONE = "done"
+    CANCELLED = "cancelled"
+    FAILED = "failed"
+
+
+FINAL_STAGES = (Stage.DONE, Stage.CANCELLED, Stage.FAILED)
+
+# Progres (0..1) saat sebuah tahap dimulai
+STAGE_PROGRESS = {
+    Stage.QUEUED: 0.0,
+    Stage.LOADING: 0.02,
+    Stage.QUALITY: 0.08,
+    Stage.CACHE: 0.1,
+    Stage.PREPROCESS: 0.12,
+    Stage.INFERENCE: 0.25,
+    Stage.RENDER: 0.85,
+    Stage.SAVING: 0.95,
+    Stage.DONE: 1.0,
+}
+
+
+class JobCancelled(Exception):
+    """Job dibatalkan oleh pengguna (token pembatalan di-set)."""
+
+
+class CancelToken:
+    """Penanda pembatalan yang aman dipakai lintas thread."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise JobCancelled("Job dibatalkan")
+
+
+class ExtractionJob:
+    """
+    Status satu job ekstraksi.
+
+    - stage, progress (0..1), message: status terkini.
+    - stage_times: {Stage: detik sejak epoch} saat tiap tahap dimulai.
+    - listener(job): dipanggil (di thread pipeline) setiap status berubah.
+    """
+
+    def __init__(self, input_filepath=None, case_judul=None, listener=None, token=None):
+        self.input_filepath = input_filepath
+        self.case_judul = case_judul
+        self.listener = listener
+        self.token = token or CancelToken()
+        self.stage = Stage.QUEUED
+        self.progress = 0.0
+        self.message = ""
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.stage_times = {Stage.QUEUED: self.created_at}
+        self._lock = threading.Lock()
+
+    # ---- pembatalan ----
+    def cancel(self):
+        self.token.cancel()
+
+    @property
+    def cancelled(self):
+        return self.token.cancelled
+
+    def raise_if_cancelled(self):
+        self.token.raise_if_cancelled()
+
+    # ---- status ----
+    def enter(self, stage, message=None):
+        """Mulai tahap baru. Raise JobCancelled jika job sudah dibatalkan."""
+        self.token.raise_if_cancelled()
+        with self._lock:
+            self.stage = stage
+            self.stage_times[stage] = time.time()
+            self.progress = max(self.progress, STAGE_PROGRESS.get(stage, self.progress))
+            if message is not None:
+                self.message = message
+        self._notify()
+
+    def set_progress(self, fraction, message=None):
+        """
+        Progres di dalam tahap saat ini: fraction 0..1 dipetakan ke rentang
+        antara awal tahap ini dan awal tahap berikutnya.
+        """
+        self.token.raise_if_cancelled()
+        stages = list(STAGE_PROGRESS)
+        lo = STAGE_PROGRESS.get(self.stage, self.progress)
+        idx = stages.index(self.stage) if self.stage in stages else -1
+        hi = STAGE_PROGRESS[stages[idx + 1]] if 0 <= idx < len(stages) - 1 else lo
+        with self._lock:
+            self.progress = max(self.progress, lo + (hi - lo) * min(max(fraction, 0.0), 1.0))
+            if message is not None:
+                self.message = message
+        self._notify()
+
+    def finish(self, stage=Stage.DONE, error=None):
+        with self._lock:
+            self.stage = stage
+            self.finished_at = self.stage_times[stage] = time.time()
+            self.error = error
+            if stage is Stage.DONE:
+                self.progress = 1.0
+        self._notify()
+
+    @property
+    def finished(self):
+        return self.stage in FINAL_STAGES
+
+    def durations(self):
+        """Lama tiap tahap (detik), dihitung dari stempel waktu tahap berurutan."""
+        ordered = sorted(self.stage_times.items(), key=lambda kv: kv[1])
+        out = {}
+        for (stage, start), (_, end) in zip(ordered, ordered[1:]):
+            out[stage.value] = end - start
+        return out
+
+    def _notify(self):
+        if self.listener is not None:
+            try:
+                self.listener(self)
+            except Exception:
+                pass
+
+
+@dataclass
+class ExtractionResult:
+    """
+    Hasil satu ekstraksi (GUI, batch maupun worker ExtractionEngine).
+
+    - path_mentah / path_ekstraksi: None jika gagal (lihat `error`).
+    - template: minutiae (array core.template.MINUTIA_DTYPE) + ukuran frame.
+    - core: DataFrame deteksi CoreNet (x1, y1, x2, y2, score...) atau None
+      (mis. hasil dari cache).
+    - core_point / delta_point: (x, y, score) titik singular terbaik
+      (core.features.singular_points), juga terisi untuk hasil dari cache.
+    - durations: lama tiap tahap pipeline (detik), dari ExtractionJob.
+    """
+
+    input_filepath: Optional[str] = None
+    path_mentah: Optional[str] = None
+    path_ekstraksi: Optional[str] = None
+    quality_score: Optional[float] = None
+    minutiae_count: Optional[int] = None
+    template: Optional[Template] = None
+    core: Any = None
+    core_point: Optional[Tuple[float, float, float]] = None
+    delta_point: Optional[Tuple[float, float, float]] = None
+    cached: bool = False
+    durations: Dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def ok(self):
+        return bool(self.path_mentah and self.path_ekstraksi)
+
+    @property
+    def minutiae(self):
+        """Array minutiae (kosong jika tidak ada template)."""
+        return self.template.minutiae if self.template is not None else empty_minutiae()
+
+    @property
+    def class_counts(self):
+        """Jumlah minutiae per kelas ClassifyNet (array panjang 6; tipe -1 diabaikan)."""
+        types = self.minutiae["type"].astype(np.int64)
+        n_classes = len(MINUTIAE_CLASS_NAMES)
+        return np.bincount(types[types >= 0], minlength=n_classes)[:n_classes]
@@ -0,0 +1,51 @@
+import importlib
+import threading
+
+# =========================================================================
+# --- IMPOR MODUL BERAT SECARA LAZY ---
+# =========================================================================
+#
+# cv2, pandas dan modul core/ yang memakainya baru diimpor saat atributnya
+# pertama kali diakses. Halaman login/riwayat/user yang hanya memakai
+# fungsi database di db_manager tidak ikut memuat stack ML.
+
+
+class LazyModule:
+    """
+    Proxy modul: `cv2 = LazyModule("cv2")` lalu `cv2.imread(...)` mengimpor
+    cv2 pada akses pertama. Aman dipakai dari banyak thread.
+    """
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            with self.__dict__["_lock"]:
+                module = self.__dict__["_module"]
+                if module is None:
+                    module = importlib.import_module(self.__dict__["_name"])
+                    self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "dimuat" if is_loaded(self) else "belum dimuat"
+        return f"<LazyModule {self.__dict__['_name']} ({state})>"
+
+
+def is_loaded(lazy_module):
+    return lazy_module.__dict__["_module"] is not None
+
+
+def preload(*lazy_modules):
+    """Impor sekarang (mis. di thread latar) supaya akses pertama tidak tersendat."""
+    return [m._load() for m in lazy_modules]
@@ -0,0 +1,319 @@
+from collections import namedtuple
+
+import numpy as np
+
+# =========================================================================
+# --- PENCOCOKAN 1:N TEMPLATE MINUTIAE (VEKTORISASI NUMPY) ---
+# =========================================================================
+#
+# Template query dibandingkan dengan seluruh galeri (core.template.
+# TemplateGallery, satu array kontigu) dalam dua tahap. Sebelumnya koordinat
+# query & galeri (dan titik core) dinormalkan ke REFERENCE_PPI memakai ppi
+# per template: upload biasa disimpan di frame 512 px, scan bertile di
+# ~500 ppi, sehingga jari yang sama bisa punya skala koordinat berbeda dan
+# voting rotasi + translasi saja tidak akan pernah menyelaraskannya.
+# Template tanpa ppi (data lama) dianggap sudah di REFERENCE_PPI.
+#
+# 1. Voting alignment (Hough): setiap pasangan minutiae query x galeri yang
+#    tipenya cocok dan selisih sudutnya <= max_rotation mengusulkan satu
+#    rotasi + translasi. Usulan dikuantisasi ke bin (rotasi, tx, ty) per
+#    template; bin dengan suara terbanyak = alignment template tsb. Jika titik
+#    core query dan template galeri sama-sama diketahui, usulan yang
+#    memindahkan core query lebih dari core_tolerance dari core galeri dibuang.
+#    Dikerjakan per potongan galeri (~CHUNK_MINUTIAE minutiae) dengan loop
+#    Python hanya atas minutiae query.
+# 2. Pairing: `candidates` template dengan suara terbanyak dicocokkan ulang
+#    dengan alignment-nya: minutiae query yang sudah ditransformasi dipasang
+#    satu-satu (tetangga terdekat mutual) dengan minutiae galeri dalam
+#    toleransi jarak, sudut dan tipe.
+#
+# Skor = matched^2 / (jumlah minutiae query * jumlah minutiae galeri), 0..1.
+# Koordinat & toleransi dalam piksel pada REFERENCE_PPI, sudut dalam radian
+# (konvensi koordinat gambar, sama dengan core/render.py).
+
+REFERENCE_PPI = 500.0              # resolusi latih model (MODEL_TARGET_PPI)
+
+DISTANCE_TOLERANCE = 15.0          # piksel
+ANGLE_TOLERANCE = np.deg2rad(20.0)
+MAX_ROTATION = np.deg2rad(45.0)
+ROTATION_BIN = np.deg2rad(10.0)
+TRANSLATION_BIN = 20.0             # piksel
+CORE_TOLERANCE = 48.0              # piksel
+CHUNK_MINUTIAE = 1 << 18
+REFINE_CHUNK = 64
+
+Candidate = namedtuple("Candidate", "history_id score matched votes rotation dx dy")
+
+
+def _wrap(angle):
+    """Sudut ke rentang [-pi, pi)."""
+    return (angle + np.pi) % (2.0 * np.pi) - np.pi
+
+
+def _scale_to_reference(ppi, reference_ppi):
+    """Faktor skala koordinat ke reference_ppi per ppi (1 jika ppi tidak diketahui)."""
+    ppi = np.asarray(ppi, dtype=np.float64)
+    known = np.isfinite(ppi) & (ppi > 0)
+    return np.where(known, reference_ppi / np.where(known, ppi, 1.0), 1.0)
+
+
+def _scale_minutiae(minutiae, scale):
+    """Salinan minutiae dengan x, y dikali `scale` (skalar atau per minutiae)."""
+    out = minutiae.copy()
+    out["x"] *= scale
+    out["y"] *= scale
+    return out
+
+
+def _normalize(query, query_ppi, query_core, gallery, gallery_cores, reference_ppi):
+    """Query, galeri & titik core dengan koordinat di reference_ppi (tanpa salinan jika sudah)."""
+    q_scale = float(_scale_to_reference(np.nan if query_ppi is None else query_ppi, reference_ppi))
+    if q_scale != 1.0:
+        query = _scale_minutiae(query, np.float32(q_scale))
+        if query_core is not None:
+            query_core = (query_core[0] * q_scale, query_core[1] * q_scale)
+
+    g_scale = _scale_to_reference(gallery.ppis, reference_ppi)
+    if np.any(g_scale != 1.0):
+        per_minutia = np.repeat(g_scale, np.diff(gallery.offsets)).astype(np.float32)
+        gallery = gallery._replace(
+            minutiae=_scale_minutiae(gallery.minutiae, per_minutia),
+            widths=np.ceil(gallery.widths * g_scale).astype(np.int32),
+            heights=np.ceil(gallery.heights * g_scale).astype(np.int32),
+            ppis=np.full(len(g_scale), float(reference_ppi)),
+        )
+        if gallery_cores is not None:
+            gallery_cores = gallery_cores * g_scale[:, np.newaxis]
+    return query, query_core, gallery, gallery_cores
+
+
+def _chunks(offsets, max_minutiae):
+    """Rentang template [a, b) yang total minutiae-nya ~max_minutiae."""
+    n = len(offsets) - 1
+    a = 0
+    while a < n:
+        b = int(np.searchsorted(offsets, offsets[a] + max_minutiae, side="right")) - 1
+        b = min(max(b, a + 1), n)
+        yield a, b
+        a = b
+
+
+def _vote(query, gallery, query_core, gallery_cores, max_rotation, rotation_bin, translation_bin,
+          core_tolerance, chunk_minutiae):
+    """
+    Tahap 1. Return: (votes, rotation, dx, dy) per template galeri; alignment
+    = rata-rata usulan di bin pemenang (rotasi rata-rata sirkular).
+    """
+    n_templates = len(gallery.history_ids)
+    votes = np.zeros(n_templates, dtype=np.int64)
+    rotation = np.zeros(n_templates, dtype=np.float64)
+    dx = np.zeros(n_templates, dtype=np.float64)
+    dy = np.zeros(n_templates, dtype=np.float64)
+    if n_templates == 0 or len(query) == 0 or len(gallery.minutiae) == 0:
+        return votes, rotation, dx, dy
+
+    qx = query["x"].astype(np.float64)
+    qy = query["y"].astype(np.float64)
+    qa = query["angle"].astype(np.float64)
+    qt = query["type"].astype(np.int16)
+
+    # Rentang translasi yang mungkin -> ukuran ruang kunci bin
+    extent = float(max(gallery.widths.max(initial=0), gallery.heights.max(initial=0),
+                       np.abs(gallery.minutiae["x"]).max(), np.abs(gallery.minutiae["y"]).max()))
+    extent += 1.5 * float(max(np.abs(qx).max(), np.abs(qy).max()))
+    t_off = int(np.ceil(extent / translation_bin)) + 1
+    t_bins = 2 * t_off + 1
+    r_bins = int(np.ceil(2.0 * max_rotation / rotation_bin)) + 1
+
+    use_core = query_core is not None and gallery_cores is not None
+    if use_core:
+        qcx, qcy = float(query_core[0]), float(query_core[1])
+
+    for a, b in _chunks(gallery.offsets, chunk_minutiae):
+        start, end = gallery.offsets[a], gallery.offsets[b]
+        g = gallery.minutiae[start:end]
+        gx = g["x"].astype(np.float32)
+        gy = g["y"].astype(np.float32)
+        ga = g["angle"].astype(np.float32)
+        ga_cos, ga_sin = np.cos(ga), np.sin(ga)
+        gt = g["type"].astype(np.int16)
+        owner = np.repeat(np.arange(b - a, dtype=np.int64), np.diff(gallery.offsets[a:b + 1]))
+        if use_core:
+            core_x = gallery_cores[a:b, 0][owner]
+            core_y = gallery_cores[a:b, 1][owner]
+            core_known = np.isfinite(core_x) & np.isfinite(core_y)
+
+        keys, pair_owner, pair_rot, pair_tx, pair_ty = [], [], [], [], []
+        min_cos = np.float32(np.cos(max_rotation))
+        for i in range(len(query)):
+            # |selisih sudut| <= max_rotation  <=>  cos(selisih) >= cos(max_rotation)
+            mask = ga_cos * np.float32(np.cos(qa[i])) + ga_sin * np.float32(np.sin(qa[i])) >= min_cos
+            if qt[i] >= 0:
+                mask &= (gt == qt[i]) | (gt < 0)
+            idx = np.flatnonzero(mask)
+            if not len(idx):
+                continue
+            theta = np.clip(_wrap(ga[idx] - qa[i]), -max_rotation, max_rotation)
+            cos, sin = np.cos(theta), np.sin(theta)
+            tx = gx[idx] - (cos * qx[i] - sin * qy[i])
+            ty = gy[idx] - (sin * qx[i] + cos * qy[i])
+            own = owner[idx]
+            if use_core:
+                # Core query setelah ditransformasi harus jatuh dekat core galeri
+                known = core_known[idx]
+                px = cos * qcx - sin * qcy + tx
+                py = sin * qcx + cos * qcy + ty
+                near = (px - core_x[idx]) ** 2 + (py - core_y[idx]) ** 2 <= core_tolerance ** 2
+                keep = ~known | near
+                if not keep.all():
+                    theta, tx, ty, own = theta[keep], tx[keep], ty[keep], own[keep]
+                    if not len(own):
+                        continue
+            r_bin = np.minimum(((theta + max_rotation) / rotation_bin).astype(np.int64), r_bins - 1)
+            tx_bin = np.floor(tx / translation_bin).astype(np.int64) + t_off
+            ty_bin = np.floor(ty / translation_bin).astype(np.int64) + t_off
+            keys.append(((own * r_bins + r_bin) * t_bins + tx_bin) * t_bins + ty_bin)
+            pair_owner.append(own)
+            pair_rot.append(theta)
+            pair_tx.append(tx)
+            pair_ty.append(ty)
+        if not keys:
+            continue
+
+        keys = np.concatenate(keys)
+        pair_owner = np.concatenate(pair_owner)
+        unique_keys, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        key_owner = unique_keys // (r_bins * t_bins * t_bins)
+
+        # Bin pemenang per template: suara terbanyak (seri -> kunci terkecil)
+        best_votes = np.zeros(b - a, dtype=np.int64)
+        np.maximum.at(best_votes, key_owner, counts)
+        winners = np.flatnonzero(counts == best_votes[key_owner])
+        owners, first = np.unique(key_owner[winners], return_index=True)
+        winning_key = np.full(b - a, -1, dtype=np.int64)
+        winning_key[owners] = winners[first]
+
+        in_winner = inverse == winning_key[pair_owner]
+        w_owner = pair_owner[in_winner]
+        w_rot = np.concatenate(pair_rot)[in_winner]
+        n_win = np.bincount(w_owner, minlength=b - a)
+        has = n_win > 0
+        sin_sum = np.bincount(w_owner, weights=np.sin(w_rot), minlength=b - a)
+        cos_sum = np.bincount(w_owner, weights=np.cos(w_rot), minlength=b - a)
+        tx_sum = np.bincount(w_owner, weights=np.concatenate(pair_tx)[in_winner], minlength=b - a)
+        ty_sum = np.bincount(w_owner, weights=np.concatenate(pair_ty)[in_winner], minlength=b - a)
+
+        votes[a:b] = best_votes
+        rotation[a:b][has] = np.arctan2(sin_sum[has], cos_sum[has])
+        dx[a:b][has] = tx_sum[has] / n_win[has]
+        dy[a:b][has] = ty_sum[has] / n_win[has]
+    return votes, rotation, dx, dy
+
+
+def _pair(query, gallery, indices, rotation, dx, dy, distance_tolerance, angle_tolerance):
+    """
+    Tahap 2. Jumlah pasangan minutiae satu-satu (tetangga terdekat mutual)
+    antara query yang sudah di-align dan template galeri `indices`.
+    """
+    matched = np.zeros(len(indices), dtype=np.int64)
+    if not len(indices) or not len(query):
+        return matched
+    qx = query["x"].astype(np.float64)
+    qy = query["y"].astype(np.float64)
+    qa = query["angle"].astype(np.float64)
+    qt = query["type"].astype(np.int16)
+    n = len(query)
+
+    for s in range(0, len(indices), REFINE_CHUNK):
+        idx = indices[s:s + REFINE_CHUNK]
+        starts = gallery.offsets[idx]
+        counts = gallery.offsets[idx + 1] - starts
+        width = int(counts.max()) if len(counts) else 0
+        if width == 0:
+            continue
+        cols = np.arange(width)
+        valid = cols[np.newaxis, :] < counts[:, np.newaxis]
+        g = gallery.minutiae[np.where(valid, starts[:, np.newaxis] + cols, 0)]
+
+        cos = np.cos(rotation[s:s + REFINE_CHUNK])[:, np.newaxis]
+        sin = np.sin(rotation[s:s + REFINE_CHUNK])[:, np.newaxis]
+        tx = cos * qx - sin * qy + dx[s:s + REFINE_CHUNK][:, np.newaxis]
+        ty = sin * qx + cos * qy + dy[s:s + REFINE_CHUNK][:, np.newaxis]
+        ta = qa + rotation[s:s + REFINE_CHUNK][:, np.newaxis]
+
+        # (kandidat, minutiae query, minutiae galeri)
+        d2 = ((tx[:, :, np.newaxis] - g["x"][:, np.newaxis, :]) ** 2
+              + (ty[:, :, np.newaxis] - g["y"][:, np.newaxis, :]) ** 2)
+        ok = valid[:, np.newaxis, :] & (d2 <= distance_tolerance ** 2)
+        ok &= np.abs(_wrap(ta[:, :, np.newaxis] - g["angle"][:, np.newaxis, :])) <= angle_tolerance
+        gt = g["type"].astype(np.int16)[:, np.newaxis, :]
+        ok &= (qt[np.newaxis, :, np.newaxis] == gt) | (qt[np.newaxis, :, np.newaxis] < 0) | (gt < 0)
+        cost = np.where(ok, d2, np.inf)
+
+        nearest_g = np.argmin(cost, axis=2)             # per minutiae query
+        nearest_q = np.argmin(cost, axis=1)             # per minutiae galeri
+        found = np.isfinite(np.min(cost, axis=2))
+        rows = np.arange(len(idx))[:, np.newaxis]
+        mutual = found & (nearest_q[rows, nearest_g] == np.arange(n)[np.newaxis, :])
+        matched[s:s + len(idx)] = mutual.sum(axis=1)
+    return matched
+
+
+def search(query, gallery, top_k=10, query_core=None, gallery_cores=None, candidates=None, query_ppi=None,
+           reference_ppi=REFERENCE_PPI, max_rotation=MAX_ROTATION, distance_tolerance=DISTANCE_TOLERANCE, angle_tolerance=ANGLE_TOLERANCE,
+           rotation_bin=ROTATION_BIN, translation_bin=TRANSLATION_BIN, core_tolerance=CORE_TOLERANCE,
+           chunk_minutiae=CHUNK_MINUTIAE):
+    """
+    Cari template galeri yang paling mirip dengan `query`.
+
+    query: array MINUTIA_DTYPE (Template.minutiae); gallery: TemplateGallery.
+    query_core: (x, y[, score]) core query atau None; gallery_cores: array
+    (jumlah template, 2) berisi (core_x, core_y) per template, NaN jika tidak
+    diketahui.
+    candidates: jumlah template (suara terbanyak) yang dipasangkan ulang di
+    tahap 2 (default max(20 * top_k, 200)).
+    query_ppi: resolusi frame query (Template.ppi); resolusi galeri dari
+    gallery.ppis. Keduanya dinormalkan ke reference_ppi sebelum voting.
+
+    Return: list Candidate (skor tertinggi dulu, maksimal top_k, hanya yang
+    punya minimal satu pasangan minutiae); rotation/dx/dy memetakan query ke
+    template galeri dalam koordinat reference_ppi.
+    """
+    n_templates = len(gallery.history_ids)
+    if n_templates == 0 or len(query) == 0 or top_k <= 0:
+        return []
+    if gallery_cores is not None:
+        gallery_cores = np.asarray(gallery_cores, dtype=np.float64).reshape(n_templates, 2)
+    query, query_core, gallery, gallery_cores = _normalize(
+        query, query_ppi, query_core, gallery, gallery_cores, reference_ppi
+    )
+
+    votes, rotation, dx, dy = _vote(
+        query, gallery, query_core, gallery_cores, max_rotation, rotation_bin, translation_bin,
+        core_tolerance, chunk_minutiae,
+    )
+
+    if candidates is None:
+        candidates = max(20 * top_k, 200)
+    candidates = min(int(candidates), int(np.count_nonzero(votes)))
+    if candidates == 0:
+        return []
+    shortlist = np.argpartition(-votes, candidates - 1)[:candidates]
+
+    matched = _pair(query, gallery, shortlist, rotation[shortlist], dx[shortlist], dy[shortlist],
+                    distance_tolerance, angle_tolerance)
+    sizes = (gallery.offsets[shortlist + 1] - gallery.offsets[shortlist]).astype(np.float64)
+    scores = matched.astype(np.float64) ** 2 / (len(query) * np.maximum(sizes, 1.0))
+
+    # Skor tertinggi dulu; seri -> suara terbanyak, lalu history_id terkecil
+    order = np.lexsort((gallery.history_ids[shortlist], -votes[shortlist], -scores))
+    results = []
+    for j in order:
+        if matched[j] == 0 or len(results) >= top_k:
+            break
+        i = shortlist[j]
+        results.append(Candidate(
+            int(gallery.history_ids[i]), float(scores[j]), int(matched[j]), int(votes[i]),
+            float(rotation[i]), float(dx[i]), float(dy[i]),
+        ))
+    return results
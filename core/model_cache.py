@@ -0,0 +1,227 @@
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from core.tflite_backend import MODEL_SLOTS
+
+# =========================================================================
+# --- CACHE BOBOT MODEL (ARSIP NUMPY, DIMUAT DENGAN MMAP) ---
+# =========================================================================
+#
+# Memuat Extractor dari file asli berarti mem-parse 4 file HDF5/weights lewat
+# Keras. Setelah pemuatan pertama, bobot keempat jaringan disimpan sebagai
+# satu file .npy datar per jaringan + manifest (bentuk & offset tiap array).
+# Pemuatan berikutnya:
+#   1. arsitektur dibangun oleh fingerflow seperti biasa, tetapi
+#      Model.load_weights (CoarseNet, FineNet, ClassifyNet) dan
+#      load_darknet_weights (CoreNet, dibaca dengan np.fromfile) dilewati,
+#   2. arsip dibuka dengan np.load(mmap_mode="r") dan diisikan lewat
+#      set_weights (tanpa parsing HDF5, tanpa salinan tambahan di Python).
+# Manifest menyimpan hash SHA-256 isi file model sumber; arsip hanya dipakai
+# jika hash-nya sama. Hash dihitung ulang hanya bila ukuran/mtime file
+# sumber berubah dari yang tercatat.
+
+MANIFEST_NAME = "manifest.json"
+ARCHIVE_VERSION = 1
+
+_patch_lock = threading.Lock()
+
+
+def _file_signature(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _sha256_file(path, chunk=4 * 1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def source_hashes(paths, known=None):
+    """
+    Hash isi file model sumber: dict nama file -> {"sig": [size, mtime], "sha256"}.
+    Entri `known` (dari manifest) dipakai ulang jika signature file tidak berubah.
+    """
+    known = known or {}
+    out = {}
+    for path in sorted(paths.values()):
+        name = os.path.basename(path)
+        sig = _file_signature(path)
+        prev = known.get(name)
+        if prev is not None and prev.get("sig") == sig:
+            out[name] = prev
+        else:
+            out[name] = {"sig": sig, "sha256": _sha256_file(path)}
+    return out
+
+
+def _same_sources(a, b):
+    return {k: v["sha256"] for k, v in a.items()} == {k: v["sha256"] for k, v in (b or {}).items()}
+
+
+def _load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _slot_models(extractor):
+    for name, (module_attr, model_attr) in MODEL_SLOTS.items():
+        yield name, getattr(getattr(extractor, module_attr), model_attr)
+
+
+def save_weight_archive(extractor, directory, sources):
+    """Tulis bobot keempat jaringan `extractor` ke `directory` (atomik per file)."""
+    import tensorflow as tf
+
+    os.makedirs(directory, exist_ok=True)
+    models = {}
+    for name, model in _slot_models(extractor):
+        weights = model.get_weights()
+        arrays, offset = [], 0
+        for w in weights:
+            arrays.append({"shape": list(w.shape), "dtype": str(w.dtype), "offset": offset})
+            offset += int(w.size)
+        flat = np.empty(offset, dtype=np.float32)
+        for w, meta in zip(weights, arrays):
+            flat[meta["offset"]:meta["offset"] + w.size] = w.ravel()
+
+        path = os.path.join(directory, f"{name}.npy")
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, flat)
+        os.replace(tmp, path)
+        models[name] = {"file": os.path.basename(path), "arrays": arrays}
+
+    _write_manifest(directory, {
+        "version": ARCHIVE_VERSION,
+        "tf_version": tf.__version__,
+        "sources": sources,
+        "models": models,
+    })
+
+
+def _write_manifest(directory, manifest):
+    tmp = os.path.join(directory, MANIFEST_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(directory, MANIFEST_NAME))
+
+
+def _restore_weights(extractor, directory, manifest):
+    for name, model in _slot_models(extractor):
+        entry = manifest["models"][name]
+        flat = np.load(os.path.join(directory, entry["file"]), mmap_mode="r")
+        expected = [tuple(v.shape) for v in model.weights]
+        stored = [tuple(a["shape"]) for a in entry["arrays"]]
+        if expected != stored:
+            raise ValueError(f"Arsitektur {name} tidak cocok dengan arsip bobot")
+        views = []
+        for meta in entry["arrays"]:
+            size = int(np.prod(meta["shape"], dtype=np.int64))
+            view = flat[meta["offset"]:meta["offset"] + size].reshape(meta["shape"])
+            views.append(view if meta["dtype"] == "float32" else view.astype(meta["dtype"]))
+        model.set_weights(views)
+
+
+def _skip(*args, **kwargs):
+    return None
+
+
+def _darknet_loaders():
+    """
+    (modul, fungsi asli) untuk setiap modul fingerflow yang memegang
+    CoreNet utils.load_darknet_weights (juga hasil `from .utils import ...`).
+    """
+    import sys
+
+    try:
+        import fingerflow.extractor  # noqa: F401 (memuat seluruh modul CoreNet)
+        from fingerflow.extractor.CoreNet import utils as core_utils
+    except ImportError:
+        return []
+    original = getattr(core_utils, "load_darknet_weights", None)
+    if original is None:
+        return []
+    return [
+        (module, original)
+        for name, module in list(sys.modules.items())
+        if name.startswith("fingerflow") and getattr(module, "load_darknet_weights", None) is original
+    ]
+
+
+@contextlib.contextmanager
+def _skip_load_weights():
+    """
+    Selama blok ini, Model.load_weights Keras dan load_darknet_weights
+    CoreNet tidak membaca file apa pun (bobot diisi dari arsip sesudahnya).
+    """
+    import tensorflow as tf
+
+    with _patch_lock:
+        original = tf.keras.Model.load_weights
+        darknet = _darknet_loaders()
+        tf.keras.Model.load_weights = _skip
+        for module, _ in darknet:
+            module.load_darknet_weights = _skip
+        try:
+            yield
+        finally:
+            tf.keras.Model.load_weights = original
+            for module, loader in darknet:
+                module.load_darknet_weights = loader
+
+
+def load_extractor(paths, directory):
+    """
+    Bangun fingerflow Extractor, memakai arsip bobot di `directory` bila valid.
+    Jika arsip belum ada / basi / rusak, model dimuat dari file asli lalu
+    arsipnya ditulis ulang. Return: (extractor, "cache" | "source").
+    """
+    import tensorflow as tf
+    from fingerflow.extractor import Extractor
+
+    manifest = _load_manifest(directory)
+    known = manifest.get("sources") if manifest else None
+    sources = source_hashes(paths, known)
+
+    valid = (
+        manifest is not None
+        and manifest.get("version") == ARCHIVE_VERSION
+        and manifest.get("tf_version") == tf.__version__
+        and _same_sources(sources, known)
+        and set(manifest.get("models", {})) == set(MODEL_SLOTS)
+    )
+    if valid:
+        try:
+            t0 = time.perf_counter()
+            with _skip_load_weights():
+                extractor = Extractor(**paths)
+            _restore_weights(extractor, directory, manifest)
+            if sources != known:
+                # Isi sama, hanya mtime berubah (mis. disalin ulang): simpan
+                # signature baru supaya hash tidak dihitung ulang tiap start
+                _write_manifest(directory, dict(manifest, sources=sources))
+            print(f"[model-cache] Bobot dimuat dari arsip dalam {time.perf_counter() - t0:.2f} dtk")
+            return extractor, "cache"
+        except Exception as e:
+            print(f"[model-cache] WARNING: arsip bobot tidak terpakai, memuat file model asli: {e}")
+
+    extractor = Extractor(**paths)
+    try:
+        save_weight_archive(extractor, directory, sources)
+        print(f"[model-cache] Arsip bobot ditulis ke {directory}")
+    except Exception as e:
+        # Cache hanya optimasi; folder read-only / disk penuh tidak fatal
+        print(f"[model-cache] WARNING: gagal menulis arsip bobot: {e}")
+    return extractor, "source"
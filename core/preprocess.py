@@ -0,0 +1,187 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from core.gabor import gabor_enhance, ridge_frequency
+
+# =========================================================================
+# --- PIPELINE PREPROSES IN-MEMORY ---
+# =========================================================================
+#
+# Satu kali decode -> satu ndarray grayscale -> (maks. satu kali) resize ->
+# CLAHE -> denoise -> sharpen. Tidak ada file JPEG/PNG perantara; yang
+# ditulis ke disk hanya artefak akhir (gambar mentah & hasil ekstraksi).
+
+
+def decode_gray(source):
+    """
+    Decode gambar menjadi grayscale uint8 (H x W).
+    `source` boleh path file atau bytes hasil upload.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        buf = np.frombuffer(source, dtype=np.uint8)
+    else:
+        # np.fromfile + imdecode juga aman untuk path Windows non-ASCII
+        buf = np.fromfile(os.fspath(source), dtype=np.uint8)
+
+    gray = cv2.imdecode(buf, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        # Format yang tidak dikenal OpenCV → coba lewat Pillow
+        import io
+        from PIL import Image
+        gray = np.array(Image.open(io.BytesIO(buf.tobytes())).convert("L"))
+    return gray
+
+
+def read_dpi(source):
+    """
+    Resolusi (ppi) dari metadata gambar, atau None jika tidak tercatat.
+    Hanya header yang dibaca (Pillow memuat piksel secara malas).
+    """
+    import io
+    from PIL import Image
+    try:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            img = Image.open(io.BytesIO(bytes(source)))
+        else:
+            img = Image.open(os.fspath(source))
+        with img:
+            dpi = img.info.get("dpi")
+    except Exception:
+        return None
+    if not dpi:
+        return None
+    value = float(dpi[0] if isinstance(dpi, (tuple, list)) else dpi)
+    # Banyak aplikasi menulis 72/96 dpi sebagai default layar, bukan resolusi scan
+    return value if value > 150 else None
+
+
+def ridge_period(gray, analysis_side=1024):
+    """
+    Median periode ridge (piksel pada resolusi `gray`) dari salinan kecil
+    gambar, atau None jika area ridge yang valid terlalu sedikit.
+    """
+    small = resize_long_side(gray, analysis_side, upscale=False)
+    f = small.shape[0] / float(gray.shape[0])
+    freq, valid = ridge_frequency(small)
+    if valid.sum() < 4:
+        return None
+    return float(np.median(1.0 / freq[valid])) / f
+
+
+def working_scale(gray, dpi=None, target_ppi=500, target_period=9.0, analysis_side=1024):
+    """
+    Faktor skala (<= 1) agar gambar mendekati resolusi latih model (~500 ppi).
+
+    Pakai metadata dpi bila ada; jika tidak, perkirakan dari periode ridge
+    (di ~500 ppi jarak antar ridge sekitar 9 piksel) pada salinan kecil gambar.
+    """
+    if dpi:
+        return min(1.0, target_ppi / float(dpi))
+
+    period_native = ridge_period(gray, analysis_side)
+    if period_native is None:
+        return 1.0
+    scale = target_period / period_native
+    # Selisih kecil dianggap noise estimasi → tidak di-resize
+    return 1.0 if scale > 0.85 else max(0.2, scale)
+
+
+def estimate_ppi(gray, dpi=None, target_ppi=500, target_period=9.0, analysis_side=1024):
+    """
+    Resolusi gambar (ppi): metadata dpi bila ada, selain itu dari periode
+    ridge (target_period piksel di target_ppi). None jika tidak bisa diperkirakan.
+    """
+    if dpi:
+        return float(dpi)
+    period_native = ridge_period(gray, analysis_side)
+    if period_native is None:
+        return None
+    return target_ppi * period_native / target_period
+
+
+def resize_long_side(gray, long_side, upscale=True, downscale=True):
+    """Resize sehingga sisi terpanjang = long_side (aspek rasio dijaga)."""
+    h, w = gray.shape[:2]
+    current = max(h, w)
+    if current == long_side or (current < long_side and not upscale) or (current > long_side and not downscale):
+        return gray
+    scale = long_side / float(current)
+    new_w, new_h = max(1, int(w * scale)), max(1, int(h * scale))
+    interp = cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA
+    return cv2.resize(gray, (new_w, new_h), interpolation=interp)
+
+
+# Objek CLAHE dipakai ulang per thread (cv2.CLAHE tidak aman dibagi antar thread)
+_local = threading.local()
+
+
+def _get_clahe(clip, grid):
+    cache = getattr(_local, "clahe", None)
+    if cache is None:
+        cache = _local.clahe = {}
+    key = (float(clip), tuple(grid))
+    clahe = cache.get(key)
+    if clahe is None:
+        clahe = cache[key] = cv2.createCLAHE(clipLimit=key[0], tileGridSize=key[1])
+    return clahe
+
+
+def enhance_gray(
+    gray,
+    clahe_clip=2.0,
+    clahe_grid=(8, 8),
+    denoise_strength=5,
+    sharp_amount=1.0,
+    mode="basic",
+):
+    """
+    Enhance gambar grayscale uint8.
+
+    mode="basic": CLAHE → bilateral denoise → unsharp mask.
+    mode="gabor": CLAHE → filter Gabor terarah (core/gabor.py); Gabor sudah
+    meredam noise, jadi denoise & sharpen dilewati.
+    """
+    # 1. CLAHE untuk kontras lokal
+    out = _get_clahe(clahe_clip, clahe_grid).apply(gray)
+
+    if mode == "gabor":
+        return gabor_enhance(out)
+    if mode != "basic":
+        raise ValueError(f"Mode enhance tidak dikenal: {mode}")
+
+    # 2. Denoise ringan (bilateral)
+    if denoise_strength > 0:
+        out = cv2.bilateralFilter(
+            out,
+            d=7,
+            sigmaColor=denoise_strength * 10,
+            sigmaSpace=denoise_strength,
+        )
+
+    # 3. Sharpen (unsharp masking)
+    if sharp_amount > 0:
+        blur = cv2.GaussianBlur(out, (0, 0), sigmaX=1.0)
+        out = cv2.addWeighted(out, 1 + sharp_amount, blur, -sharp_amount, 0)
+
+    return out
+
+
+def prepare_raw(gray, max_side=512):
+    """Gambar mentah untuk arsip & model: hanya diperkecil bila > max_side."""
+    if max_side:
+        return resize_long_side(gray, max_side, upscale=False)
+    return gray
+
+
+def enhance_for_model(raw_gray, target_long_side=512, **enhance_params):
+    """
+    Dari gambar mentah (grayscale) ke input FingerFlow.
+    Return: (enhanced_bgr, enhanced_gray).
+    """
+    gray = resize_long_side(raw_gray, target_long_side, downscale=False)
+    enhanced = enhance_gray(gray, **enhance_params)
+    # FingerFlow meminta input BGR 3-channel; konversi sekali di akhir
+    return cv2.cvtColor(enhanced, cv2.COLOR_GRAY2BGR), enhanced
@@ -0,0 +1,65 @@
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from core.gabor import orientation_field, ridge_frequency
+from core.segmentation import foreground_mask
+
+# =========================================================================
+# --- ESTIMASI KUALITAS GAMBAR (CEPAT, SEBELUM MODEL DEEP LEARNING) ---
+# =========================================================================
+#
+# Skor 0..1 dari empat komponen yang dihitung per blok pada salinan kecil
+# gambar (beberapa milidetik):
+# - foreground : porsi gambar yang berisi pola ridge (0 = kosong)
+# - coherence  : keteraturan arah ridge di area foreground (noda/smudge rendah)
+# - contrast   : simpangan baku intensitas per blok di area foreground
+# - clarity    : porsi blok foreground dengan puncak frekuensi ridge yang jelas
+
+QualityReport = namedtuple("QualityReport", "score foreground coherence contrast clarity")
+
+MIN_SIDE = 96           # gambar lebih kecil dari ini langsung skor 0
+ANALYSIS_SIDE = 512     # gambar besar diperkecil dulu ke ukuran ini
+# Nilai komponen yang dianggap "sudah bagus" (dinormalisasi ke 1.0)
+FULL_FOREGROUND = 0.15
+FULL_COHERENCE = 0.6
+FULL_CONTRAST = 40.0
+
+
+def assess_quality(gray, analysis_side=ANALYSIS_SIDE):
+    """Nilai kualitas gambar grayscale uint8. Return: QualityReport."""
+    h, w = gray.shape[:2]
+    if min(h, w) < MIN_SIDE:
+        return QualityReport(0.0, 0.0, 0.0, 0.0, 0.0)
+
+    if max(h, w) > analysis_side:
+        s = analysis_side / float(max(h, w))
+        gray = cv2.resize(gray, (max(1, int(w * s)), max(1, int(h * s))), interpolation=cv2.INTER_AREA)
+
+    block = 16
+    fg = foreground_mask(gray, block=block)
+    if not fg.any():
+        return QualityReport(0.0, 0.0, 0.0, 0.0, 0.0)
+    foreground = float(fg.mean())
+
+    _, coh = orientation_field(gray, block=block)
+    coherence = float(coh[fg].mean()) if coh.shape == fg.shape else float(coh.mean())
+
+    bh, bw = fg.shape
+    img = gray.astype(np.float32)
+    mean = cv2.resize(img, (bw, bh), interpolation=cv2.INTER_AREA)
+    mean_sq = cv2.resize(img * img, (bw, bh), interpolation=cv2.INTER_AREA)
+    std = np.sqrt(np.maximum(mean_sq - mean * mean, 0))
+    contrast = float(np.median(std[fg]))
+
+    _, valid = ridge_frequency(gray)
+    fg_freq = cv2.resize(fg.astype(np.uint8), (valid.shape[1], valid.shape[0]),
+                         interpolation=cv2.INTER_NEAREST).astype(bool)
+    clarity = float(valid[fg_freq].mean()) if fg_freq.any() else 0.0
+
+    c_fg = min(1.0, foreground / FULL_FOREGROUND)
+    c_coh = min(1.0, coherence / FULL_COHERENCE)
+    c_con = min(1.0, contrast / FULL_CONTRAST)
+    score = c_fg * (0.4 * c_coh + 0.3 * clarity + 0.3 * c_con)
+    return QualityReport(round(score, 4), foreground, coherence, contrast, clarity)
@@ -0,0 +1,130 @@
+import cv2
+import numpy as np
+
+# =========================================================================
+# --- RENDER OVERLAY MINUTIAE (VEKTORISASI) ---
+# =========================================================================
+#
+# Semua koordinat, sudut dan tipe diproses sebagai array NumPy; gambar
+# lingkaran & garis arah dikirim ke OpenCV dalam satu panggilan polylines per
+# warna, bukan satu cv2.circle per baris DataFrame.
+
+# Warna per kelas dalam RGB (kanvas disimpan lewat PIL, jadi urutan RGB)
+TYPE_COLORS = (
+    (255, 0, 0),      # ending      - merah
+    (0, 90, 255),     # bifurcation - biru
+    (0, 180, 0),      # fragment    - hijau
+    (255, 160, 0),    # enclosure   - oranye
+    (200, 0, 200),    # crossbar    - ungu
+    (0, 190, 190),    # other       - toska
+)
+UNKNOWN_COLOR = (255, 255, 0)  # kelas tidak diketahui / NaN
+
+_CIRCLE_VERTICES = 16
+_UNIT_CIRCLE = np.stack(
+    [np.cos(np.linspace(0, 2 * np.pi, _CIRCLE_VERTICES, endpoint=False)),
+     np.sin(np.linspace(0, 2 * np.pi, _CIRCLE_VERTICES, endpoint=False))],
+    axis=-1,
+).astype(np.float32)
+
+
+def minutiae_arrays(minutiae_df):
+    """
+    DataFrame fingerflow (x, y, angle, score, class) -> (xy, angles, types).
+    xy float32 (N, 2); angles float32 (N,) radian; types int16 (N,), -1 = tidak diketahui.
+    """
+    if minutiae_df is None or len(minutiae_df) == 0:
+        return np.zeros((0, 2), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int16)
+
+    xy = minutiae_df[["x", "y"]].to_numpy(dtype=np.float32)
+    angles = (
+        minutiae_df["angle"].to_numpy(dtype=np.float32)
+        if "angle" in minutiae_df else np.full(len(xy), np.nan, np.float32)
+    )
+    if "class" in minutiae_df:
+        cls = minutiae_df["class"].to_numpy(dtype=np.float32)
+        types = np.where(np.isfinite(cls), cls, -1).astype(np.int16)
+    else:
+        types = np.full(len(xy), -1, np.int16)
+    return xy, angles, types
+
+
+def render_minutiae(
+    image,
+    xy,
+    angles=None,
+    types=None,
+    scale=1.0,
+    offset=(0, 0),
+    out_size=None,
+    radius=5,
+    tick_length=12,
+    thickness=1,
+):
+    """
+    Gambar minutiae di atas `image` (grayscale atau 3-channel) dan kembalikan
+    kanvas 3-channel uint8 baru.
+
+    - scale/out_size: zoom. out_size=(w, h) mengubah ukuran kanvas dan skala
+      dihitung otomatis dari ukuran gambar asal.
+    - offset=(x0, y0): koordinat (dalam piksel gambar asal) yang menjadi pojok
+      kiri atas kanvas, untuk menggambar potongan/ROI.
+    - Lingkaran dan garis arah tidak ikut membesar, agar tetap terbaca pada
+      zoom berapa pun.
+    """
+    if image.ndim == 2:
+        canvas = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    else:
+        canvas = image.copy()
+
+    h, w = canvas.shape[:2]
+    if out_size is not None:
+        scale = out_size[0] / float(w)
+        canvas = cv2.resize(canvas, tuple(out_size), interpolation=cv2.INTER_LINEAR)
+    elif scale != 1.0:
+        canvas = cv2.resize(canvas, (max(1, int(round(w * scale))), max(1, int(round(h * scale)))),
+                            interpolation=cv2.INTER_LINEAR)
+    if canvas.dtype != np.uint8:
+        canvas = canvas.astype(np.uint8)
+
+    xy = np.asarray(xy, dtype=np.float32).reshape(-1, 2)
+    n = xy.shape[0]
+    if n == 0:
+        return canvas
+
+    angles = np.full(n, np.nan, np.float32) if angles is None else np.asarray(angles, np.float32)
+    types = np.full(n, -1, np.int16) if types is None else np.asarray(types, np.int16)
+
+    # Transformasi koordinat sekaligus untuk semua titik
+    pts = (xy - np.asarray(offset, np.float32)) * np.float32(scale)
+    ch, cw = canvas.shape[:2]
+    margin = radius + tick_length
+    visible = (
+        np.isfinite(pts).all(axis=1)
+        & (pts[:, 0] >= -margin) & (pts[:, 0] < cw + margin)
+        & (pts[:, 1] >= -margin) & (pts[:, 1] < ch + margin)
+    )
+    pts, angles, types = pts[visible], angles[visible], types[visible]
+    if pts.shape[0] == 0:
+        return canvas
+
+    # Lingkaran: (N, V, 2) dari satu lingkaran satuan yang di-broadcast
+    circles = np.rint(pts[:, None, :] + radius * _UNIT_CIRCLE[None, :, :]).astype(np.int32)
+
+    # Garis arah: titik awal di tepi lingkaran, titik akhir sejauh tick_length
+    has_dir = np.isfinite(angles)
+    direction = np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+    start = pts + radius * direction
+    end = pts + (radius + tick_length) * direction
+    ticks = np.rint(np.stack([start, end], axis=1)).astype(np.int32)
+
+    type_idx = np.where((types >= 0) & (types < len(TYPE_COLORS)), types, -1)
+    for t in np.unique(type_idx):
+        color = TYPE_COLORS[t] if t >= 0 else UNKNOWN_COLOR
+        sel = type_idx == t
+        cv2.polylines(canvas, circles[sel], True, color, thickness, cv2.LINE_AA)
+        sel_dir = sel & has_dir
+        if sel_dir.any():
+            cv2.polylines(canvas, ticks[sel_dir], False, color, thickness, cv2.LINE_AA)
+
+    return canvas
@@ -0,0 +1,143 @@
+import cv2
+import numpy as np
+
+from core.gabor import orientation_field
+
+# =========================================================================
+# --- SEGMENTASI FOREGROUND & ROI ---
+# =========================================================================
+#
+# Mask foreground per blok dari variansi lokal + koherensi orientasi.
+# Keduanya dihitung dengan resize INTER_AREA (rata-rata per blok), jadi
+# biayanya hanya beberapa milidetik pada gambar 512 px.
+
+SEGMENT_BLOCK = 16
+
+
+def foreground_mask(gray, block=SEGMENT_BLOCK, var_ratio=0.15, min_coherence=0.15):
+    """
+    Mask foreground per blok (bool, ukuran H // block x W // block).
+
+    Blok dianggap sidik jari jika variansinya >= var_ratio x persentil-95
+    variansi semua blok DAN pola orientasinya cukup koheren (ridge searah).
+    """
+    h, w = gray.shape[:2]
+    bh, bw = max(1, h // block), max(1, w // block)
+    img = gray.astype(np.float32)
+    mean = cv2.resize(img, (bw, bh), interpolation=cv2.INTER_AREA)
+    mean_sq = cv2.resize(img * img, (bw, bh), interpolation=cv2.INTER_AREA)
+    var = np.maximum(mean_sq - mean * mean, 0)
+
+    ref = np.percentile(var, 95)
+    if ref <= 1e-6:
+        return np.zeros((bh, bw), bool)
+    mask = var >= var_ratio * ref
+
+    _, coherence = orientation_field(gray, block=block)
+    if coherence.shape == mask.shape:
+        mask &= coherence >= min_coherence
+
+    # Rapikan: tutup lubang kecil, buang bintik terisolasi
+    m = mask.astype(np.uint8)
+    kernel = np.ones((3, 3), np.uint8)
+    m = cv2.morphologyEx(m, cv2.MORPH_CLOSE, kernel)
+    m = cv2.morphologyEx(m, cv2.MORPH_OPEN, kernel)
+    return m.astype(bool)
+
+
+def roi_box(gray, padding=24, block=SEGMENT_BLOCK, min_area_fraction=0.02):
+    """
+    Kotak pembatas sidik jari dalam piksel: (x0, y0, x1, y1), x1/y1 eksklusif.
+
+    Hanya komponen foreground yang luasnya >= min_area_fraction dari
+    komponen terbesar yang dipakai (noda kecil di tepi diabaikan). Jika tidak
+    ada foreground, seluruh frame dikembalikan.
+    """
+    h, w = gray.shape[:2]
+    mask = foreground_mask(gray, block=block)
+    if not mask.any():
+        return 0, 0, w, h
+
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(mask.astype(np.uint8), connectivity=8)
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    keep = np.flatnonzero(areas >= max(1, min_area_fraction * areas.max())) + 1
+    sel = stats[keep]
+    bx0 = sel[:, cv2.CC_STAT_LEFT].min()
+    by0 = sel[:, cv2.CC_STAT_TOP].min()
+    bx1 = (sel[:, cv2.CC_STAT_LEFT] + sel[:, cv2.CC_STAT_WIDTH]).max()
+    by1 = (sel[:, cv2.CC_STAT_TOP] + sel[:, cv2.CC_STAT_HEIGHT]).max()
+
+    x0 = max(0, int(bx0 * block) - padding)
+    y0 = max(0, int(by0 * block) - padding)
+    x1 = min(w, int(bx1 * block) + padding)
+    y1 = min(h, int(by1 * block) + padding)
+    # Blok terakhir yang terpotong (sisa H/W yang bukan kelipatan block) ikut
+    if x1 >= (w // block) * block:
+        x1 = w
+    if y1 >= (h // block) * block:
+        y1 = h
+    return x0, y0, x1, y1
+
+
+def select_foreground_tiles(gray, tiles, analysis_side=1024, block=SEGMENT_BLOCK):
+    """
+    Saring tile (core/tiling.py) yang area miliknya memuat foreground.
+    Mask dihitung pada salinan kecil gambar, jadi murah untuk scan besar.
+    Jika tidak ada foreground sama sekali, semua tile dikembalikan.
+    """
+    h, w = gray.shape[:2]
+    long_side = max(h, w)
+    if long_side > analysis_side:
+        s = analysis_side / float(long_side)
+        small = cv2.resize(gray, (max(1, int(w * s)), max(1, int(h * s))), interpolation=cv2.INTER_AREA)
+    else:
+        small = gray
+    mask = foreground_mask(small, block=block)
+    if not mask.any():
+        return list(tiles)
+
+    # Koordinat gambar penuh -> indeks blok mask
+    fy = mask.shape[0] / float(h)
+    fx = mask.shape[1] / float(w)
+    selected = []
+    for t in tiles:
+        by0, by1 = int(t.own_y0 * fy), max(int(t.own_y0 * fy) + 1, int(np.ceil(t.own_y1 * fy)))
+        bx0, bx1 = int(t.own_x0 * fx), max(int(t.own_x0 * fx) + 1, int(np.ceil(t.own_x1 * fx)))
+        if mask[by0:by1, bx0:bx1].any():
+            selected.append(t)
+    return selected
+
+
+def scale_box(box, from_shape, to_shape):
+    """Skalakan kotak (x0, y0, x1, y1) dari ukuran gambar from_shape ke to_shape."""
+    sy = to_shape[0] / float(from_shape[0])
+    sx = to_shape[1] / float(from_shape[1])
+    x0, y0, x1, y1 = box
+    return (
+        max(0, int(np.floor(x0 * sx))),
+        max(0, int(np.floor(y0 * sy))),
+        min(to_shape[1], int(np.ceil(x1 * sx))),
+        min(to_shape[0], int(np.ceil(y1 * sy))),
+    )
+
+
+def shift_extraction_output(output_data, x0, y0):
+    """
+    Geser koordinat hasil Extractor (minutiae & core) dari frame potongan ROI
+    kembali ke frame gambar penuh. Mengubah DataFrame di tempat.
+    """
+    if x0 == 0 and y0 == 0:
+        return output_data
+    minutiae = output_data.get("minutiae")
+    if minutiae is not None and len(minutiae):
+        minutiae["x"] += x0
+        minutiae["y"] += y0
+    core = output_data.get("core")
+    if core is not None and len(core):
+        for col in ("x1", "x2"):
+            if col in core:
+                core[col] += x0
+        for col in ("y1", "y2"):
+            if col in core:
+                core[col] += y0
+    return output_data
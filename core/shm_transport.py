@@ -0,0 +1,128 @@
+from collections import namedtuple
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python 3.7: belum ada, semua data lewat pickle
+    shared_memory = None
+
+# =========================================================================
+# --- TRANSPOR ARRAY LEWAT SHARED MEMORY ANTAR PROSES ---
+# =========================================================================
+#
+# Array NumPy besar (gambar input model, array hasil) tidak di-pickle ke
+# Pipe: isinya ditaruh sekali di segmen multiprocessing.shared_memory dan
+# yang dikirim hanya SharedArray (nama segmen, shape, dtype). Penerima
+# memetakan segmen itu langsung sebagai ndarray tanpa salinan.
+#
+# Siklus hidup segmen (supaya tidak ada yang bocor):
+#   - pembuat menyimpan segmennya di SegmentSet dan memegangnya sampai
+#     penerima pasti selesai memakai (balasan diterima / permintaan berikut
+#     datang), lalu close(); segmen permintaan di-unlink oleh pembuatnya,
+#   - segmen hasil di-unlink oleh penerimanya setelah isinya disalin
+#     (unpack(..., copy=True)),
+#   - jika salah satu proses mati di tengah jalan, resource tracker
+#     multiprocessing (dipakai bersama proses induk & anak 'spawn') meng-
+#     unlink sisa segmen saat aplikasi ditutup; di Windows segmen hilang
+#     sendiri begitu handle terakhir ditutup.
+# Tanpa shared_memory (Python 3.7) atau untuk array kecil (< SHM_MIN_BYTES),
+# objek dikirim apa adanya (pickle).
+
+SHM_MIN_BYTES = 64 * 1024
+
+SharedArray = namedtuple("SharedArray", "name shape dtype")
+
+available = shared_memory is not None
+
+
+class SegmentSet:
+    """Segmen shared memory yang dibuat satu pihak untuk satu pesan."""
+
+    def __init__(self):
+        self._segments = []
+
+    def share(self, array):
+        """Salin `array` ke segmen baru. Return: SharedArray (handle yang di-pickle)."""
+        array = np.ascontiguousarray(array)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        self._segments.append(shm)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+        return SharedArray(shm.name, array.shape, array.dtype.str)
+
+    def close(self, unlink=False):
+        segments, self._segments = self._segments, []
+        for shm in segments:
+            _close(shm, unlink)
+
+    def __len__(self):
+        return len(self._segments)
+
+
+def _close(shm, unlink):
+    try:
+        shm.close()
+    except BufferError:
+        # Masih ada view NumPy yang hidup; mmap ditutup saat objeknya di-GC
+        pass
+    if unlink:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def pack(obj, segments, min_bytes=SHM_MIN_BYTES):
+    """
+    Ganti setiap ndarray >= min_bytes di dalam obj (list/tuple/dict
+    bersarang) dengan SharedArray di segmen milik `segments`.
+    """
+    if not available:
+        return obj
+    if isinstance(obj, np.ndarray):
+        if obj.nbytes >= min_bytes and not obj.dtype.hasobject:
+            return segments.share(obj)
+        return obj
+    if isinstance(obj, SharedArray):
+        return obj
+    if isinstance(obj, dict):
+        return {k: pack(v, segments, min_bytes) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return _rebuild(obj, [pack(v, segments, min_bytes) for v in obj])
+    return obj
+
+
+def unpack(obj, attached=None, copy=False):
+    """
+    Kebalikan pack(). copy=False: SharedArray menjadi view ke segmen (segmen
+    yang dibuka dicatat di list `attached`; tutup setelah view tidak dipakai).
+    copy=True: isi disalin lalu segmen langsung ditutup & di-unlink.
+    """
+    if isinstance(obj, SharedArray):
+        shm = shared_memory.SharedMemory(name=obj.name)
+        view = np.ndarray(tuple(obj.shape), dtype=np.dtype(obj.dtype), buffer=shm.buf)
+        if copy:
+            out = view.copy()
+            del view
+            _close(shm, unlink=True)
+            return out
+        attached.append(shm)
+        return view
+    if isinstance(obj, dict):
+        return {k: unpack(v, attached, copy) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return _rebuild(obj, [unpack(v, attached, copy) for v in obj])
+    return obj
+
+
+def _rebuild(original, items):
+    """list/tuple/namedtuple baru bertipe sama dengan `original`."""
+    if isinstance(original, tuple) and hasattr(original, "_fields"):
+        return type(original)(*items)
+    return type(original)(items)
+
+
+def release(attached):
+    """Tutup segmen yang dibuka unpack(copy=False) (tanpa unlink: milik pengirim)."""
+    while attached:
+        _close(attached.pop(), unlink=False)
@@ -0,0 +1,124 @@
+from collections import namedtuple
+
+import numpy as np
+
+# =========================================================================
+# --- TEMPLATE MINUTIAE (ARRAY TERSTRUKTUR BINER) ---
+# =========================================================================
+#
+# Satu template = array NumPy terstruktur, satu baris per minutiae:
+#   x, y    float32  piksel pada gambar enhance (gambar overlay ekstraksi)
+#   angle   float32  radian
+#   score   float32  skor deteksi FingerFlow
+#   type    int8     indeks MINUTIAE_CLASS_NAMES, -1 = tidak diketahui
+# Disimpan apa adanya (little-endian, tanpa padding, 17 byte/minutiae) di
+# tabel minutiae_template, sehingga decode cukup np.frombuffer tanpa salinan.
+
+TEMPLATE_FORMAT_VERSION = 1
+
+# Urutan kelas ClassifyNet_6_classes (kolom 'class' pada DataFrame fingerflow)
+MINUTIAE_CLASS_NAMES = ("ending", "bifurcation", "fragment", "enclosure", "crossbar", "other")
+
+MINUTIA_DTYPE = np.dtype([
+    ("x", "<f4"),
+    ("y", "<f4"),
+    ("angle", "<f4"),
+    ("score", "<f4"),
+    ("type", "i1"),
+])
+
+# minutiae: array MINUTIA_DTYPE; width/height: ukuran gambar acuan koordinat;
+# ppi: resolusi gambar acuan itu (piksel per inci), None jika tidak diketahui.
+# Template dari jalur berbeda (upload biasa 512 px vs scan bertile ~500 ppi)
+# punya skala koordinat berbeda; pencocokan menormalkannya lewat ppi.
+Template = namedtuple("Template", "minutiae width height ppi", defaults=(None,))
+
+# Banyak template dalam satu buffer: minutiae[offsets[i]:offsets[i + 1]]
+# milik history_ids[i]; ppis NaN jika tidak diketahui
+TemplateGallery = namedtuple("TemplateGallery", "history_ids offsets minutiae widths heights ppis")
+
+
+def empty_minutiae():
+    return np.zeros(0, dtype=MINUTIA_DTYPE)
+
+
+def from_dataframe(minutiae_df):
+    """DataFrame fingerflow (x, y, angle, score, class) -> array MINUTIA_DTYPE."""
+    if minutiae_df is None or len(minutiae_df) == 0:
+        return empty_minutiae()
+    out = np.zeros(len(minutiae_df), dtype=MINUTIA_DTYPE)
+    for field, column in (("x", "x"), ("y", "y"), ("angle", "angle"), ("score", "score")):
+        if column in minutiae_df:
+            out[field] = minutiae_df[column].to_numpy(dtype=np.float32)
+    if "class" in minutiae_df:
+        cls = minutiae_df["class"].to_numpy(dtype=np.float32)
+        out["type"] = np.where(np.isfinite(cls), cls, -1).astype(np.int8)
+    else:
+        out["type"] = -1
+    return out
+
+
+def to_dataframe(minutiae):
+    """Array MINUTIA_DTYPE -> DataFrame berkolom sama dengan output fingerflow."""
+    import pandas as pd
+
+    cls = minutiae["type"].astype(np.float64)
+    cls[cls < 0] = np.nan
+    return pd.DataFrame({
+        "x": minutiae["x"].astype(np.float64),
+        "y": minutiae["y"].astype(np.float64),
+        "angle": minutiae["angle"].astype(np.float64),
+        "score": minutiae["score"].astype(np.float64),
+        "class": cls,
+    })
+
+
+def encode(minutiae):
+    """Array MINUTIA_DTYPE -> bytes untuk kolom BLOB."""
+    return np.ascontiguousarray(minutiae, dtype=MINUTIA_DTYPE).tobytes()
+
+
+def decode(blob):
+    """
+    bytes/BLOB -> array MINUTIA_DTYPE tanpa menyalin data (read-only, berbagi
+    memori dengan `blob`). Salin dengan .copy() jika perlu diubah.
+    """
+    if blob is None:
+        return empty_minutiae()
+    if len(blob) % MINUTIA_DTYPE.itemsize:
+        raise ValueError("Ukuran blob template tidak valid")
+    return np.frombuffer(blob, dtype=MINUTIA_DTYPE)
+
+
+def build_gallery(rows):
+    """
+    rows: iterable (history_id, blob, width, height, ppi) -> TemplateGallery.
+    Semua blob disambung sekali lalu dibaca dengan satu np.frombuffer, jadi
+    seluruh galeri berada di satu array kontigu yang siap divektorisasi.
+    """
+    ids, blobs, widths, heights, ppis = [], [], [], [], []
+    for history_id, blob, width, height, ppi in rows:
+        ids.append(history_id)
+        blobs.append(bytes(blob or b""))
+        widths.append(width or 0)
+        heights.append(height or 0)
+        ppis.append(ppi if ppi else np.nan)
+    counts = np.array([len(b) // MINUTIA_DTYPE.itemsize for b in blobs], dtype=np.int64)
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return TemplateGallery(
+        np.array(ids, dtype=np.int64),
+        offsets,
+        decode(b"".join(blobs)),
+        np.array(widths, dtype=np.int32),
+        np.array(heights, dtype=np.int32),
+        np.array(ppis, dtype=np.float64),
+    )
+
+
+def gallery_item(gallery, index):
+    """Template ke-`index` dari TemplateGallery (view, bukan salinan)."""
+    start, end = gallery.offsets[index], gallery.offsets[index + 1]
+    ppi = float(gallery.ppis[index])
+    return Template(gallery.minutiae[start:end], int(gallery.widths[index]), int(gallery.heights[index]),
+                    ppi if np.isfinite(ppi) else None)
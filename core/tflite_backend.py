@@ -0,0 +1,198 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# =========================================================================
+# --- BACKEND INFERENSI TFLITE TERKUANTISASI (CPU) ---
+# =========================================================================
+#
+# Keempat jaringan FingerFlow (CoarseNet, FineNet, ClassifyNet, CoreNet)
+# dikonversi SEKALI ke TFLite lalu disimpan di folder cache. Setelah itu
+# model Keras di dalam Extractor diganti objek TFLiteModel yang punya
+# .predict() dengan format output sama, sehingga Extractor.extract_minutiae
+# dan core/batched_inference.py tidak perlu diubah.
+#
+# Mode:
+#   "float16" : bobot float16, aktivasi float32 (akurasi hampir sama)
+#   "int8"    : kuantisasi dynamic-range (bobot int8, aktivasi float32)
+# Jaringan yang gagal dikonversi tetap memakai Keras (dilaporkan di log).
+
+QUANT_MODES = ("float16", "int8")
+
+# Lokasi model Keras di dalam Extractor fingerflow 3.0.1 (atribut ter-mangle)
+MODEL_SLOTS = {
+    "coarse_net": ("_Extractor__extraction_module", "_MinutiaeNet__coarse_net"),
+    "fine_net": ("_Extractor__extraction_module", "_MinutiaeNet__fine_net"),
+    "classify_net": ("_Extractor__classification_module", "_ClassifyNet__classify_net"),
+    "core_net": ("_Extractor__core_detection_module", "_CoreNet__core_net"),
+}
+
+# Input contoh untuk verifikasi urutan output setelah konversi
+_SAMPLE_SHAPES = {
+    "coarse_net": (1, 256, 256, 1),
+    "fine_net": (1, 224, 224, 3),
+    "classify_net": (1, 224, 224, 3),
+    "core_net": (1, 416, 416, 3),
+}
+
+MANIFEST_NAME = "manifest.json"
+
+
+class TFLiteModel:
+    """
+    Pengganti model Keras berbasis tf.lite.Interpreter.
+    predict(x) mengembalikan array (satu output) atau list array (banyak
+    output) dengan urutan sama seperti model Keras aslinya.
+    """
+
+    def __init__(self, path, output_order=None, num_threads=None, batch_size=32):
+        import tensorflow as tf
+
+        self.path = path
+        self.batch_size = batch_size
+        self._interp = tf.lite.Interpreter(model_path=path, num_threads=num_threads)
+        self._interp.allocate_tensors()
+        self._input = self._interp.get_input_details()[0]
+        self._outputs = self._interp.get_output_details()
+        self._order = list(output_order) if output_order is not None else list(range(len(self._outputs)))
+        self._shape = tuple(self._input["shape"])
+        self._lock = threading.Lock()
+
+    def _invoke(self, x):
+        if x.shape != self._shape:
+            self._interp.resize_tensor_input(self._input["index"], x.shape)
+            self._interp.allocate_tensors()
+            self._shape = x.shape
+        self._interp.set_tensor(self._input["index"], x)
+        self._interp.invoke()
+        return [self._interp.get_tensor(self._outputs[i]["index"]) for i in self._order]
+
+    def predict(self, x, batch_size=None, **kwargs):
+        x = np.ascontiguousarray(x, dtype=self._input["dtype"])
+        step = batch_size or self.batch_size
+        with self._lock:
+            parts = [self._invoke(x[i:i + step]) for i in range(0, max(1, x.shape[0]), step)]
+        outs = parts[0] if len(parts) == 1 else [np.concatenate(o, axis=0) for o in zip(*parts)]
+        return outs[0] if len(outs) == 1 else outs
+
+
+def _keras_outputs(model, x):
+    out = model.predict(x)
+    return list(out) if isinstance(out, (list, tuple)) else [out]
+
+
+def _match_output_order(keras_outs, tflite_outs):
+    """
+    Urutan output TFLite bisa berbeda dari Keras. Cocokkan tiap output Keras
+    dengan output TFLite berbentuk sama yang nilainya paling dekat.
+    """
+    order, used = [], set()
+    for k in keras_outs:
+        best, best_err = None, None
+        for j, t in enumerate(tflite_outs):
+            if j in used or t.shape != k.shape:
+                continue
+            err = float(np.mean(np.abs(t.astype(np.float32) - k.astype(np.float32))))
+            if best_err is None or err < best_err:
+                best, best_err = j, err
+        if best is None:
+            raise ValueError("Output TFLite tidak cocok dengan output Keras")
+        order.append(best)
+        used.add(best)
+    return order
+
+
+def convert_keras_model(model, mode):
+    """Konversi satu model Keras ke bytes TFLite sesuai mode kuantisasi."""
+    import tensorflow as tf
+
+    if mode not in QUANT_MODES:
+        raise ValueError(f"Mode kuantisasi tidak dikenal: {mode}")
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    # Layer Lambda CoarseNet & NMS CoreNet butuh op TF penuh (Flex)
+    converter.target_spec.supported_ops = [
+        tf.lite.OpsSet.TFLITE_BUILTINS,
+        tf.lite.OpsSet.SELECT_TF_OPS,
+    ]
+    return converter.convert()
+
+
+def _sample_input(name):
+    rng = np.random.RandomState(0)
+    return (rng.rand(*_SAMPLE_SHAPES[name]) * 255).astype(np.float32)
+
+
+def cache_dir_for(cache_root, mode):
+    return os.path.join(cache_root, f"tflite-{mode}")
+
+
+def _load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def apply_tflite_backend(extractor, model_version, cache_root, mode="float16", num_threads=None,
+                         progress_callback=None):
+    """
+    Ganti model Keras di `extractor` dengan TFLiteModel.
+
+    Model hasil konversi diambil dari cache_root/tflite-<mode>/ jika
+    manifest-nya cocok dengan `model_version` (sidik file model) dan versi
+    TensorFlow; jika tidak, dikonversi ulang dan disimpan.
+    Return: dict nama jaringan -> "tflite" / "keras".
+    """
+    import tensorflow as tf
+
+    directory = cache_dir_for(cache_root, mode)
+    os.makedirs(directory, exist_ok=True)
+    manifest = _load_manifest(directory) or {}
+    valid = manifest.get("model_version") == model_version and manifest.get("tf_version") == tf.__version__
+    entries = manifest.get("models", {}) if valid else {}
+
+    used = {}
+    for name, (module_attr, model_attr) in MODEL_SLOTS.items():
+        module = getattr(extractor, module_attr)
+        keras_model = getattr(module, model_attr)
+        path = os.path.join(directory, f"{name}.tflite")
+        try:
+            entry = entries.get(name)
+            if entry is None or not os.path.exists(path):
+                if progress_callback is not None:
+                    progress_callback(f"mengonversi {name} ke TFLite ({mode})...")
+                t0 = time.perf_counter()
+                data = convert_keras_model(keras_model, mode)
+                tmp = path + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+
+                x = _sample_input(name)
+                tflite = TFLiteModel(path, num_threads=num_threads)
+                raw = tflite.predict(x)
+                order = _match_output_order(_keras_outputs(keras_model, x), raw if isinstance(raw, list) else [raw])
+                entry = entries[name] = {"file": os.path.basename(path), "output_order": order}
+                print(f"[tflite] {name} dikonversi ({mode}) dalam {time.perf_counter() - t0:.1f} dtk, "
+                      f"{os.path.getsize(path) / 1e6:.1f} MB")
+
+            setattr(module, model_attr, TFLiteModel(path, entry["output_order"], num_threads=num_threads))
+            used[name] = "tflite"
+        except Exception as e:
+            print(f"[tflite] WARNING: {name} tetap memakai Keras: {e}")
+            entries.pop(name, None)
+            used[name] = "keras"
+
+    manifest = {"model_version": model_version, "tf_version": tf.__version__, "mode": mode, "models": entries}
+    tmp = os.path.join(directory, MANIFEST_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(directory, MANIFEST_NAME))
+    return used
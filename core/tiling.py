@@ -0,0 +1,135 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# =========================================================================
+# --- EKSTRAKSI BERTILE UNTUK SCAN RESOLUSI TINGGI ---
+# =========================================================================
+#
+# Gambar besar dibagi menjadi tile berukuran sama yang saling tumpang tindih.
+# Setiap tile "memiliki" satu area (dibatasi garis tengah area overlap dengan
+# tetangganya); minutiae/core hanya diambil dari area milik tile tsb, jadi
+# titik yang terdeteksi dua kali di zona overlap otomatis hanya dihitung
+# sekali. Sisa duplikat yang tepat di garis potong dibuang dengan NMS kecil.
+
+# x0..y1  : kotak tile di gambar penuh (x1/y1 eksklusif)
+# own_*   : area milik tile (juga koordinat gambar penuh)
+Tile = namedtuple("Tile", "x0 y0 x1 y1 own_x0 own_y0 own_x1 own_y1")
+
+
+def _axis_layout(n, tile, overlap):
+    """Posisi awal tile dan batas area milik di satu sumbu."""
+    if n <= tile:
+        return [0], [0, n]
+    step = max(1, tile - overlap)
+    starts = list(range(0, n - tile, step))
+    starts.append(n - tile)  # tile terakhir digeser agar semua tile berukuran sama
+    cuts = [0]
+    for a, b in zip(starts[:-1], starts[1:]):
+        # garis tengah area overlap antara tile a dan tile b
+        cuts.append((b + a + tile) // 2)
+    cuts.append(n)
+    return starts, cuts
+
+
+def tile_grid(h, w, tile=512, overlap=64):
+    """
+    Daftar Tile untuk gambar h x w. Semua tile berukuran tile x tile (kecuali
+    gambar lebih kecil dari tile), sehingga bisa diinferensi dalam satu batch.
+    """
+    ys, cuts_y = _axis_layout(h, tile, overlap)
+    xs, cuts_x = _axis_layout(w, tile, overlap)
+    tiles = []
+    for iy, y0 in enumerate(ys):
+        for ix, x0 in enumerate(xs):
+            tiles.append(Tile(
+                x0, y0, min(x0 + tile, w), min(y0 + tile, h),
+                cuts_x[ix], cuts_y[iy], cuts_x[ix + 1], cuts_y[iy + 1],
+            ))
+    return tiles
+
+
+def seam_lines(tiles):
+    """Garis potong vertikal & horizontal (koordinat x dan y) antar area milik tile."""
+    xs = sorted({t.own_x0 for t in tiles} - {0})
+    ys = sorted({t.own_y0 for t in tiles} - {0})
+    return np.asarray(xs, np.float32), np.asarray(ys, np.float32)
+
+
+def _owned(df, t, xcol, ycol):
+    x = df[xcol].to_numpy(dtype=np.float32) + t.x0
+    y = df[ycol].to_numpy(dtype=np.float32) + t.y0
+    return (x >= t.own_x0) & (x < t.own_x1) & (y >= t.own_y0) & (y < t.own_y1)
+
+
+def _suppress_seam_duplicates(minutiae, seams_x, seams_y, radius):
+    """
+    NMS berdasarkan skor untuk minutiae dalam jarak `radius` dari garis potong.
+    Hanya titik di dekat garis potong yang dibandingkan (biasanya sedikit).
+    """
+    if minutiae.empty or radius <= 0 or (len(seams_x) == 0 and len(seams_y) == 0):
+        return minutiae
+    x = minutiae["x"].to_numpy(dtype=np.float32)
+    y = minutiae["y"].to_numpy(dtype=np.float32)
+    near = np.zeros(len(minutiae), bool)
+    if len(seams_x):
+        near |= np.abs(x[:, None] - seams_x[None, :]).min(axis=1) < radius
+    if len(seams_y):
+        near |= np.abs(y[:, None] - seams_y[None, :]).min(axis=1) < radius
+    idx = np.flatnonzero(near)
+    if len(idx) < 2:
+        return minutiae
+
+    score = minutiae["score"].to_numpy(dtype=np.float32)[idx] if "score" in minutiae else np.zeros(len(idx))
+    order = idx[np.argsort(-score, kind="stable")]
+    pts = np.stack([x[order], y[order]], axis=1)
+    close = ((pts[:, None, :] - pts[None, :, :]) ** 2).sum(axis=2) < radius * radius
+
+    drop = np.zeros(len(order), bool)
+    for i in range(len(order)):
+        if not drop[i]:
+            later = close[i].copy()
+            later[: i + 1] = False
+            drop |= later
+    keep = np.ones(len(minutiae), bool)
+    keep[order[drop]] = False
+    return minutiae[keep]
+
+
+def merge_tile_outputs(outputs, tiles, dedup_radius=6.0):
+    """
+    Gabungkan output Extractor per tile ({'minutiae': df, 'core': df}, koordinat
+    tile) menjadi satu output berkoordinat gambar penuh.
+    """
+    minutiae_parts, core_parts = [], []
+    for out, t in zip(outputs, tiles):
+        m = out.get("minutiae")
+        if m is not None and len(m):
+            m = m[_owned(m, t, "x", "y")].copy()
+            m["x"] += t.x0
+            m["y"] += t.y0
+            minutiae_parts.append(m)
+        c = out.get("core")
+        if c is not None and len(c):
+            # Core dimiliki tile yang memuat titik tengah kotaknya
+            centre = pd.DataFrame({
+                "cx": (c["x1"].to_numpy(dtype=np.float32) + c["x2"].to_numpy(dtype=np.float32)) / 2,
+                "cy": (c["y1"].to_numpy(dtype=np.float32) + c["y2"].to_numpy(dtype=np.float32)) / 2,
+            })
+            c = c[_owned(centre, t, "cx", "cy")].copy()
+            c[["x1", "x2"]] += t.x0
+            c[["y1", "y2"]] += t.y0
+            core_parts.append(c)
+
+    minutiae = (
+        pd.concat(minutiae_parts, ignore_index=True)
+        if minutiae_parts else pd.DataFrame(columns=["x", "y", "angle", "score", "class"])
+    )
+    seams_x, seams_y = seam_lines(tiles)
+    minutiae = _suppress_seam_duplicates(minutiae, seams_x, seams_y, dedup_radius).reset_index(drop=True)
+    core = (
+        pd.concat(core_parts, ignore_index=True)
+        if core_parts else pd.DataFrame(columns=["x1", "y1", "x2", "y2", "score", "w", "h"])
+    )
+    return {"core": core, "minutiae": minutiae}
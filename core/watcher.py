@@ -0,0 +1,199 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+# =========================================================================
+# --- PEMANTAU FOLDER (INOTIFY / POLLING) ---
+# =========================================================================
+#
+# DirectoryWatcher.poll(timeout) mengembalikan path file yang (mungkin)
+# baru/berubah di satu folder. Di Linux memakai inotify lewat ctypes (tanpa
+# dependensi tambahan); di OS lain, share jaringan yang tidak mengirim event,
+# atau jika inotify gagal, memakai polling snapshot (ukuran, mtime).
+# StabilityTracker menahan file sampai ukurannya tidak berubah selama
+# `settle_seconds`, supaya file yang masih ditulis scanner tidak diproses.
+
+# Konstanta inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class _InotifyBackend:
+    def __init__(self, path):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 gagal")
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(err, f"inotify_add_watch gagal untuk {path}")
+        self._path = path
+
+    def poll(self, timeout):
+        """Return: (set path, overflow)."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set(), False
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set(), False
+
+        paths, overflow, offset = set(), False, 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b"\0")
+            offset += name_len
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+            elif name and not mask & IN_ISDIR:
+                paths.add(os.path.join(self._path, os.fsdecode(name)))
+        return paths, overflow
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class _PollingBackend:
+    def __init__(self, path, interval=1.0):
+        self._path = path
+        self._interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snap = {}
+        try:
+            with os.scandir(self._path) as it:
+                for entry in it:
+                    if entry.is_file():
+                        st = entry.stat()
+                        snap[entry.path] = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            pass
+        return snap
+
+    def poll(self, timeout):
+        time.sleep(min(timeout, self._interval))
+        current = self._scan()
+        changed = {p for p, sig in current.items() if self._snapshot.get(p) != sig}
+        self._snapshot = current
+        return changed, False
+
+    def close(self):
+        pass
+
+
+class DirectoryWatcher:
+    """
+    Pemantau satu folder (tidak rekursif).
+
+        watcher = DirectoryWatcher(path)
+        for path in watcher.existing_files(): ...
+        while True:
+            for path in watcher.poll(timeout=1.0): ...
+    """
+
+    def __init__(self, path, use_inotify=None, poll_interval=1.0):
+        self.path = os.path.abspath(path)
+        if not os.path.isdir(self.path):
+            raise FileNotFoundError(f"Folder tidak ditemukan: {self.path}")
+        if use_inotify is None:
+            use_inotify = sys.platform.startswith("linux")
+
+        self.backend_name = "polling"
+        self._backend = None
+        if use_inotify:
+            try:
+                self._backend = _InotifyBackend(self.path)
+                self.backend_name = "inotify"
+            except (OSError, AttributeError) as e:
+                print(f"[watcher] inotify tidak tersedia ({e}), memakai polling.")
+        if self._backend is None:
+            self._backend = _PollingBackend(self.path, poll_interval)
+
+    def existing_files(self):
+        """Semua file yang sudah ada di folder (untuk dipindai saat mulai)."""
+        try:
+            with os.scandir(self.path) as it:
+                return sorted(e.path for e in it if e.is_file())
+        except OSError:
+            return []
+
+    def poll(self, timeout=1.0):
+        """
+        Tunggu event sampai `timeout` detik. Return: set path kandidat.
+        Jika buffer event kernel meluap, seluruh folder dipindai ulang.
+        """
+        paths, overflow = self._backend.poll(timeout)
+        if overflow:
+            paths |= set(self.existing_files())
+        return paths
+
+    def close(self):
+        self._backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class StabilityTracker:
+    """
+    Tahan file sampai (ukuran, mtime)-nya tetap selama `settle_seconds`.
+    Panggil add() untuk setiap event, lalu ready() secara berkala.
+    """
+
+    def __init__(self, settle_seconds=2.0, clock=time.monotonic):
+        self.settle_seconds = settle_seconds
+        self._clock = clock
+        self._pending = {}  # path -> (signature, sejak kapan signature ini terlihat)
+
+    def add(self, path):
+        if path not in self._pending:
+            self._pending[path] = (None, self._clock())
+
+    def discard(self, path):
+        self._pending.pop(path, None)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def ready(self):
+        """Return: list path yang sudah stabil (dan dikeluarkan dari daftar tunggu)."""
+        now = self._clock()
+        done = []
+        for path, (sig, since) in list(self._pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._pending.pop(path, None)  # file dihapus/dipindah sebelum stabil
+                continue
+            current = (st.st_size, st.st_mtime_ns)
+            if current != sig:
+                self._pending[path] = (current, now)
+            elif st.st_size > 0 and now - since >= self.settle_seconds:
+                done.append(path)
+                self._pending.pop(path, None)
+        return sorted(done)
@@ -1,14 +1,29 @@
 import sqlite3
 import os
 import hashlib
+import io
+import json
+import threading
+import time
 from datetime import datetime
 from PIL import Image
 import numpy as np
-import pandas as pd # Tambahkan Pandas untuk menangani DataFrame minutiae
 
-# Impor Pustaka Utama
-import cv2 # Digunakan untuk visualisasi fallback OpenCV
-from fingerflow.extractor import Extractor 
+# Pustaka berat (OpenCV, Pandas, modul core/ berbasis cv2; TensorFlow lewat
+# extractor_pool) baru dimuat saat ekstraksi pertama kali dibutuhkan atau
+# lewat preload_extraction_stack() setelah login. Halaman login, riwayat dan
+# manajemen user cukup memakai sqlite.
+from core.lazy import LazyModule, preload
+cv2 = LazyModule("cv2")
+pd = LazyModule("pandas")
+preprocess = LazyModule("core.preprocess")
+render = LazyModule("core.render")
+segmentation = LazyModule("core.segmentation")
+tiling = LazyModule("core.tiling")
+quality = LazyModule("core.quality")
+from core.extractor_pool import get_extractor_manager as _get_extractor_manager, model_fingerprint
+from core.jobs import ExtractionJob, ExtractionResult, JobCancelled, Stage
+from core import buckets, features, matching, template
 import shutil 
 import sys, os
 # =========================================================================
@@ -48,6 +63,90 @@ for d in (DATA_DIR, MENTAH_DIR, EKSTRAKSI_DIR):
 MODEL_DIR = resource_path("models")
 DB_PATH = os.path.join(APP_BASE, "minutiae_app_fixed.db")
 
+# Model FingerFlow dilepas dari memori setelah tidak dipakai selama ini (detik).
+# 0 = model tetap dimuat selama aplikasi berjalan.
+EXTRACTOR_IDLE_TIMEOUT = 15 * 60
+
+# Aplikasi GUI menjalankan TensorFlow di proses anak yang diawasi
+# (core/inference_process.py): crash/OOM/hang di model tidak membekukan GUI,
+# proses diganti otomatis. Aktif setelah isolate_inference() dipanggil
+# (main.py); CLI & worker ExtractionEngine sudah berupa proses terpisah.
+INFERENCE_SUBPROCESS_ENABLED = True
+# Permintaan inferensi yang tidak selesai dalam waktu ini dianggap hang
+INFERENCE_REQUEST_TIMEOUT = 300
+
+# Backend inferensi: "keras" (float32, default), "tflite-float16" atau
+# "tflite-int8" (model dikonversi sekali & di-cache di MODEL_CACHE_DIR).
+# Cek akurasinya dulu dengan: python cek_kuantisasi.py <folder sampel>
+INFERENCE_BACKEND = "keras"
+MODEL_CACHE_DIR = os.path.join(APP_BASE, "models_cache")
+# Simpan bobot model sebagai arsip NumPy (MODEL_CACHE_DIR/weights) yang
+# dimuat dengan mmap; divalidasi dengan hash SHA-256 file model asli.
+MODEL_WEIGHT_CACHE_ENABLED = True
+
+# Gambar upload diperkecil sampai sisi terpanjang <= nilai ini sebelum diproses
+MODEL_INPUT_MAX_SIDE = 512
+
+# Parameter enhance gambar sebelum ekstraksi (juga bagian dari kunci cache)
+ENHANCE_PARAMS = {
+    "target_long_side": 512,
+    "clahe_clip": 2.0,
+    "clahe_grid": (8, 8),
+    "denoise_strength": 5,
+    "sharp_amount": 1.0,
+    # "gabor" = enhance terarah orientasi ridge (lebih baik untuk laten),
+    # "basic" = CLAHE + bilateral + unsharp seperti versi awal
+    "mode": "gabor",
+}
+
+# Potong gambar ke bounding box sidik jari (+ padding, piksel) sebelum inferensi
+ROI_CROP_ENABLED = True
+ROI_PADDING = 24
+
+# Scan resolusi tinggi (1000-2000 ppi): gambar disesuaikan ke ~MODEL_TARGET_PPI
+# lalu, jika sisi terpanjangnya masih > TILED_MIN_SIDE, diekstraksi per tile
+# (TILE_SIZE px, overlap TILE_OVERLAP px) alih-alih diperkecil ke
+# MODEL_INPUT_MAX_SIDE. TILED_MIN_SIDE harus > MODEL_INPUT_MAX_SIDE.
+# Memori inferensi dibatasi TILE_BATCH tile sekaligus, berapa pun ukuran gambar.
+TILED_EXTRACTION_ENABLED = True
+TILED_MIN_SIDE = 768
+TILE_SIZE = 512
+TILE_OVERLAP = 64
+TILE_BATCH = 4
+MODEL_TARGET_PPI = 500
+
+# Input model dipad (kanan & bawah) ke kelipatan SHAPE_BUCKET_MULTIPLE piksel
+# (core/buckets.py) supaya CoarseNet hanya melihat sedikit bentuk tensor dan
+# tidak di-trace ulang tiap gambar. Saat warm-up hanya bucket yang dihasilkan
+# pipeline yang di-trace: sisi panjang ENHANCE_PARAMS["target_long_side"]
+# (gambar tunggal) dan tile TILE_SIZE per TILE_BATCH; bucket lain (potongan
+# ROI kecil, kelompok batch N>1) di-trace saat pertama kali dipakai.
+SHAPE_BUCKETS_ENABLED = True
+SHAPE_BUCKET_MULTIPLE = 64
+SHAPE_BUCKET_MIN_SIDE = 128
+
+# Gerbang kualitas: gambar dengan skor (0..1, core/quality.py) di bawah
+# QUALITY_MIN_SCORE tidak diteruskan ke model (kosong/smudge/terlalu kecil)
+QUALITY_GATE_ENABLED = True
+QUALITY_MIN_SCORE = 0.2
+
+# Antrean job ekstraksi persisten (tabel extraction_jobs, job_scheduler.py).
+# Job 'running' memegang lease yang diperpanjang selama diproses; jika
+# prosesnya mati, lease habis dan job dikembalikan ke antrean (maksimal
+# JOB_MAX_ATTEMPTS percobaan).
+JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED = "queued", "running", "done", "failed"
+JOB_LEASE_SECONDS = 30
+JOB_MAX_ATTEMPTS = 3
+
+# Pencarian kasus serupa (core/matching.py): jumlah kandidat yang ditampilkan
+MATCH_TOP_K = 10
+
+# Cache hasil ekstraksi (tabel extraction_cache di database yang sama)
+EXTRACTION_CACHE_ENABLED = True
+EXTRACTION_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Naikkan angka ini jika logika enhance/visualisasi berubah agar cache lama tidak terpakai
+EXTRACTION_PIPELINE_VERSION = 8
+
 # MODEL_FILE = os.path.join(MODEL_DIR, "minutiae_net.h5")
 
 # if not os.path.exists(MODEL_FILE):
@@ -96,6 +195,99 @@ def ensure_user_columns(conn):
     conn.commit()
 
 
+def ensure_history_columns(conn):
+    """
+    Pastikan kolom-kolom tambahan pada tabel history ada (migrasi database lama).
+    Aman dijalankan berulang kali.
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(history)")
+    existing = {row[1] for row in cursor.fetchall()}
+
+    columns = {
+        "quality_score": "REAL",  # skor kualitas gambar 0..1 (core/quality.py)
+    }
+    # Fitur partisi galeri (core/features.py): distribusi kelas minutiae &
+    # titik singular CoreNet
+    for col in features.CLASS_COLUMNS:
+        columns[col] = "REAL"
+    columns.update({
+        "dominant_class": "INTEGER",
+        "core_x": "REAL",
+        "core_y": "REAL",
+        "core_score": "REAL",
+        "delta_x": "REAL",
+        "delta_y": "REAL",
+    })
+
+    for col, coldef in columns.items():
+        if col not in existing:
+            try:
+                cursor.execute(f"ALTER TABLE history ADD COLUMN {col} {coldef}")
+            except Exception as e:
+                print(f"[migrasi] Gagal menambah kolom history.{col}: {e}")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_quality ON history(quality_score)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_class ON history(dominant_class, user_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_core ON history(core_score)")
+    conn.commit()
+
+
+def ensure_cache_columns(conn):
+    """Kolom tambahan tabel extraction_cache (database lama). Aman dijalankan berulang kali."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(extraction_cache)")
+    existing = {row[1] for row in cursor.fetchall()}
+    if "singular_points" not in existing:
+        try:
+            # JSON [core, delta], masing-masing [x, y, score] atau null
+            cursor.execute("ALTER TABLE extraction_cache ADD COLUMN singular_points TEXT")
+        except Exception as e:
+            print(f"[migrasi] Gagal menambah kolom extraction_cache.singular_points: {e}")
+    conn.commit()
+
+
+def ensure_template_columns(conn):
+    """Kolom tambahan tabel minutiae_template (database lama). Aman dijalankan berulang kali."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(minutiae_template)")
+    existing = {row[1] for row in cursor.fetchall()}
+    if "ppi" not in existing:
+        try:
+            # Resolusi gambar acuan koordinat; NULL untuk template lama (dianggap matching.REFERENCE_PPI)
+            cursor.execute("ALTER TABLE minutiae_template ADD COLUMN ppi REAL")
+        except Exception as e:
+            print(f"[migrasi] Gagal menambah kolom minutiae_template.ppi: {e}")
+    conn.commit()
+
+
+def backfill_history_features(batch_size=1000):
+    """
+    Isi kolom distribusi kelas untuk riwayat lama yang sudah punya template
+    tetapi belum punya fitur (titik core tidak bisa dihitung ulang tanpa
+    menjalankan model, jadi tetap NULL). Return: jumlah riwayat yang diisi.
+    """
+    conn = get_db_connection()
+    filled = 0
+    try:
+        while True:
+            rows = conn.execute(
+                "SELECT t.history_id, t.data FROM minutiae_template t JOIN history h ON h.id = t.history_id "
+                "WHERE h.class_ending IS NULL AND t.format_version = ? LIMIT ?",
+                (template.TEMPLATE_FORMAT_VERSION, batch_size),
+            ).fetchall()
+            if not rows:
+                break
+            with conn:
+                conn.executemany(
+                    _UPDATE_CLASS_SQL,
+                    [_class_row(row["history_id"], template.decode(row["data"])) for row in rows],
+                )
+            filled += len(rows)
+    finally:
+        conn.close()
+    return filled
+
+
 def create_default_admin(conn, username="admin", password="123"):
     """
     Buat user admin default jika belum ada (berlaku untuk inisialisasi dev).
@@ -150,10 +342,96 @@ def init_db():
             user_id INTEGER,
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
             minutiae_count INTEGER,
+            quality_score REAL,
+            class_ending REAL,
+            class_bifurcation REAL,
+            class_fragment REAL,
+            class_enclosure REAL,
+            class_crossbar REAL,
+            class_other REAL,
+            dominant_class INTEGER,
+            core_x REAL,
+            core_y REAL,
+            core_score REAL,
+            delta_x REAL,
+            delta_y REAL,
             FOREIGN KEY (user_id) REFERENCES users(id)
         )
     ''')
     
+    # Tabel Cache Ekstraksi (hasil per isi gambar, dibuang secara LRU)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS extraction_cache (
+            cache_key TEXT PRIMARY KEY,
+            model_version TEXT NOT NULL,
+            minutiae_count INTEGER NOT NULL,
+            minutiae BLOB,
+            overlay_png BLOB NOT NULL,
+            singular_points TEXT,
+            size_bytes INTEGER NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            last_access REAL NOT NULL
+        )
+    ''')
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_extraction_cache_access ON extraction_cache(last_access)"
+    )
+
+    # Template minutiae per riwayat (core/template.py): array terstruktur
+    # x, y, angle, score, type dalam satu BLOB, koordinat pada gambar
+    # ekstraksi berukuran image_width x image_height beresolusi ppi
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS minutiae_template (
+            history_id INTEGER PRIMARY KEY,
+            format_version INTEGER NOT NULL,
+            minutiae_count INTEGER NOT NULL,
+            image_width INTEGER,
+            image_height INTEGER,
+            ppi REAL,
+            data BLOB NOT NULL,
+            FOREIGN KEY (history_id) REFERENCES history(id)
+        )
+    ''')
+
+    # Antrean job ekstraksi persisten (job_scheduler.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS extraction_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            input_path TEXT NOT NULL,
+            judul_kasus TEXT NOT NULL,
+            nomor_lp TEXT,
+            tanggal_kejadian TEXT,
+            user_id INTEGER,
+            min_quality REAL,
+            state TEXT NOT NULL DEFAULT 'queued',
+            priority INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            lease_owner TEXT,
+            lease_expires REAL,
+            history_id INTEGER,
+            error TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_extraction_jobs_claim ON extraction_jobs(state, priority DESC, id)"
+    )
+
+    # Progres batch headless (batch_extract.py): status per file per run,
+    # supaya run yang terputus bisa dilanjutkan tanpa memproses ulang
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS batch_progress (
+            run_name TEXT NOT NULL,
+            input_path TEXT NOT NULL,
+            status TEXT NOT NULL,
+            history_id INTEGER,
+            error TEXT,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (run_name, input_path)
+        )
+    ''')
     
     # Pastikan kolom-kolom users ada (migrasi bila perlu)
     try:
@@ -161,6 +439,22 @@ def init_db():
     except Exception as e:
         print('[init_db] ensure_user_columns error:', e)
 
+    # Kolom tambahan history (database lama)
+    try:
+        ensure_history_columns(conn)
+    except Exception as e:
+        print('[init_db] ensure_history_columns error:', e)
+
+    try:
+        ensure_cache_columns(conn)
+    except Exception as e:
+        print('[init_db] ensure_cache_columns error:', e)
+
+    try:
+        ensure_template_columns(conn)
+    except Exception as e:
+        print('[init_db] ensure_template_columns error:', e)
+
     # Buat admin default jika belum ada
     try:
         create_default_admin(conn)
@@ -169,12 +463,18 @@ def init_db():
 
     conn.commit()
     conn.close()
+
+    # Riwayat lama: distribusi kelas dihitung dari template tersimpan
+    try:
+        filled = backfill_history_features()
+        if filled:
+            print(f"[init_db] Fitur kelas {filled} riwayat lama diisi dari template.")
+    except Exception as e:
+        print('[init_db] backfill_history_features error:', e)
 # =========================================================================
-# --- IMPORT VISUALISASI FINGERFLOW (PERBAIKAN TERAKHIR) ---
+# --- ENHANCE & VISUALISASI GAMBAR ---
 # =========================================================================
 
-# Menggunakan satu variabel fungsi tunggal untuk visualisasi
-draw_minutiae_func = None
 def enhance_fingerprint_image_array(
     img_bgr,
     target_long_side=512,
@@ -182,107 +482,45 @@ def enhance_fingerprint_image_array(
     clahe_grid=(8, 8),
     denoise_strength=5,
     sharp_amount=1.0,
+    mode="basic",
 ):
     """
     Enhance gambar sidik jari sebelum ekstraksi minutiae.
 
     Parameter:
         img_bgr : np.ndarray, gambar 3-channel (BGR) uint8
+        mode    : "basic" (CLAHE + bilateral + unsharp) atau
+                  "gabor" (CLAHE + filter Gabor terarah orientasi ridge)
     Return:
         enhanced_bgr : np.ndarray (BGR)
         enhanced_gray : np.ndarray (grayscale)
     """
-    import cv2
-    import numpy as np
-
     if img_bgr is None:
         raise ValueError("img_bgr = None (gambar tidak terbaca)")
 
-    # 1. Konversi ke grayscale
-    gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
-
-    # 2. Resize (upscale kalau gambar kecil)
-    h, w = gray.shape[:2]
-    long_side = max(h, w)
-    if long_side < target_long_side:
-        scale = target_long_side / float(long_side)
-        new_w, new_h = int(w * scale), int(h * scale)
-        gray = cv2.resize(gray, (new_w, new_h), interpolation=cv2.INTER_CUBIC)
-    else:
-        new_h, new_w = h, w  # tidak di-resize
-
-    # 3. CLAHE untuk kontras lokal
-    clahe = cv2.createCLAHE(clipLimit=clahe_clip, tileGridSize=clahe_grid)
-    gray_clahe = clahe.apply(gray)
-
-    # 4. Denoise ringan (bilateral)
-    if denoise_strength > 0:
-        gray_denoised = cv2.bilateralFilter(
-            gray_clahe,
-            d=7,
-            sigmaColor=denoise_strength * 10,
-            sigmaSpace=denoise_strength,
-        )
-    else:
-        gray_denoised = gray_clahe
-
-    # 5. Sharpen (unsharp masking)
-    if sharp_amount > 0:
-        blur = cv2.GaussianBlur(gray_denoised, (0, 0), sigmaX=1.0)
-        gray_sharp = cv2.addWeighted(
-            gray_denoised,
-            1 + sharp_amount,
-            blur,
-            -sharp_amount,
-            0,
-        )
-    else:
-        gray_sharp = gray_denoised
-
-    # 6. Balik ke BGR untuk FingerFlow
-    enhanced_bgr = cv2.cvtColor(gray_sharp, cv2.COLOR_GRAY2BGR)
+    gray = img_bgr if img_bgr.ndim == 2 else cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+    return preprocess.enhance_for_model(
+        gray,
+        target_long_side=target_long_side,
+        clahe_clip=clahe_clip,
+        clahe_grid=clahe_grid,
+        denoise_strength=denoise_strength,
+        sharp_amount=sharp_amount,
+        mode=mode,
+    )
+# --- VISUALISASI MINUTIAE (RENDERER VEKTORISASI, core/render.py) ---
+def draw_minutiae_fallback_cv2(img_canvas, minutiae_df, scale=1.0, offset=(0, 0)):
+    """
+    Visualisasi minutiae menggunakan OpenCV: lingkaran + garis arah, warna per
+    tipe minutiae. Koordinat diambil sekaligus sebagai array (tanpa iterrows).
+    """
+    xy, angles, types = render.minutiae_arrays(minutiae_df)
+    return render.render_minutiae(img_canvas, xy, angles, types, scale=scale, offset=offset)
 
-    return enhanced_bgr, gray_sharp
-# --- FUNGSI FALLBACK VISUALISASI MENGGUNAKAN OPENCV (SELALU DEFINISIKAN) ---
-def draw_minutiae_fallback_cv2(img_canvas, minutiae_df):
-    """Visualisasi minutiae manual menggunakan OpenCV."""
-    # Input sekarang adalah minutiae_df (Pandas DataFrame)
-    
-    if minutiae_df is not None and isinstance(minutiae_df, pd.DataFrame) and not minutiae_df.empty:
-        
-        # Iterasi melalui baris DataFrame
-        for index, minutia in minutiae_df.iterrows():
-            # Ambil koordinat X dan Y dari kolom DataFrame
-            try:
-                # Kolom X dan Y dari DataFrame harus diubah ke integer untuk OpenCV
-                x, y = int(round(minutia["x"])), int(round(minutia["y"])) 
-            except (KeyError, ValueError, IndexError):
-                # Abaikan baris data yang rusak atau yang tidak memiliki kolom x/y
-                continue
-            
-            # Gambar lingkaran merah (BGR: Merah = 0, 0, 255)
-            # Gambar, Center (x, y), Radius, Warna (BGR: Merah), Ketebalan (-1 = Fill)
-            cv2.circle(img_canvas, (x, y), 5, (255, 0, 0), -1) 
-            
-    return img_canvas 
 
-
-# --- Mencoba Impor Fungsi Otomatis dari Fingerflow ---
-try:
-    from fingerflow.io import draw_minutiae as draw_minutiae_func
-except ImportError:
-    try:
-        from fingerflow.extractor import draw_minutiae as draw_minutiae_func
-    except ImportError:
-        try:
-            from fingerflow import draw_minutiae as draw_minutiae_func
-        except ImportError:
-            pass # Lanjut ke penugasan fallback
-            
-if draw_minutiae_func is None:
-    print("Peringatan: Gagal mengimpor draw_minutiae. Menggunakan visualisasi manual (OpenCV).")
-    # Tetapkan fungsi fallback manual sebagai visualizer
-    draw_minutiae_func = draw_minutiae_fallback_cv2
+# fingerflow 3.0.1 tidak menyediakan fungsi draw_minutiae untuk overlay,
+# jadi renderer OpenCV di atas menjadi visualizer utama.
+draw_minutiae_func = draw_minutiae_fallback_cv2
 
 # =========================================================================
 # --- MANAJEMEN USER ---
@@ -325,145 +563,822 @@ def check_user_credentials(username, password):
     return None
 
 
+# =========================================================================
+# --- CACHE HASIL EKSTRAKSI ---
+# =========================================================================
+# Kunci cache = SHA-256 dari piksel hasil decode + parameter enhance +
+# versi model + versi pipeline. Upload ulang file yang sama (walau judul
+# kasus berbeda) langsung memakai minutiae & gambar overlay yang tersimpan.
+
+_cache_checked_version = None
+
+
+def extraction_cache_key(gray_pixels, working_shape=None):
+    """
+    Kunci cache untuk gambar grayscale uint8 (hasil decode). working_shape:
+    ukuran gambar kerja model (_working_image); piksel yang sama dengan DPI
+    berbeda diproses di skala lain sehingga overlay & frame template-nya beda.
+    """
+    gray_pixels = np.ascontiguousarray(gray_pixels)
+    h = hashlib.sha256()
+    h.update(str(gray_pixels.shape).encode())
+    h.update(gray_pixels.tobytes())
+    h.update(f"working:{tuple(working_shape[:2]) if working_shape is not None else None}".encode())
+    h.update(json.dumps(ENHANCE_PARAMS, sort_keys=True).encode())
+    h.update(f"max_side:{MODEL_INPUT_MAX_SIDE}".encode())
+    h.update(f"roi:{ROI_CROP_ENABLED}:{ROI_PADDING}".encode())
+    h.update(
+        f"tiled:{TILED_EXTRACTION_ENABLED}:{TILED_MIN_SIDE}:{TILE_SIZE}:{TILE_OVERLAP}:{MODEL_TARGET_PPI}".encode()
+    )
+    h.update(model_fingerprint(MODEL_DIR).encode())
+    h.update(f"backend:{INFERENCE_BACKEND}".encode())
+    h.update(f"buckets:{SHAPE_BUCKETS_ENABLED}:{SHAPE_BUCKET_MULTIPLE}:{SHAPE_BUCKET_MIN_SIDE}".encode())
+    h.update(f"pipeline:{EXTRACTION_PIPELINE_VERSION}".encode())
+    return h.hexdigest()
+
+
+def _invalidate_stale_cache(conn, model_version):
+    """Hapus entri cache yang dibuat dengan file model versi lain (sekali per versi)."""
+    global _cache_checked_version
+    if _cache_checked_version == model_version:
+        return
+    conn.execute("DELETE FROM extraction_cache WHERE model_version != ?", (model_version,))
+    conn.commit()
+    _cache_checked_version = model_version
+
+
+def cache_lookup(cache_key):
+    """
+    Cari hasil ekstraksi di cache.
+    Return: (minutiae_df, minutiae_count, overlay_png_bytes, (core_point,
+    delta_point)) atau None.
+    """
+    if not EXTRACTION_CACHE_ENABLED:
+        return None
+    conn = get_db_connection()
+    try:
+        _invalidate_stale_cache(conn, model_fingerprint(MODEL_DIR))
+        row = conn.execute(
+            "SELECT minutiae_count, minutiae, overlay_png, singular_points FROM extraction_cache WHERE cache_key = ?",
+            (cache_key,),
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE extraction_cache SET last_access = ? WHERE cache_key = ?",
+            (time.time(), cache_key),
+        )
+        conn.commit()
+    except Exception as e:
+        print(f"WARNING: cache ekstraksi tidak bisa dibaca: {e}")
+        return None
+    finally:
+        conn.close()
+
+    minutiae_df = None
+    if row["minutiae"] is not None:
+        arr = np.load(io.BytesIO(row["minutiae"]), allow_pickle=False)
+        minutiae_df = pd.DataFrame(arr, columns=["x", "y", "angle", "score", "class"])
+    singular = (None, None)
+    if row["singular_points"]:
+        singular = tuple(tuple(p) if p else None for p in json.loads(row["singular_points"]))
+    return minutiae_df, row["minutiae_count"], bytes(row["overlay_png"]), singular
+
+
+def cache_store(cache_key, minutiae_df, minutiae_count, path_ekstraksi, singular=(None, None)):
+    """
+    Simpan hasil ekstraksi ke cache lalu buang entri lama (LRU) bila melebihi batas.
+    singular: (core_point, delta_point) dari core.features.singular_points.
+    """
+    if not EXTRACTION_CACHE_ENABLED:
+        return
+    try:
+        with open(path_ekstraksi, "rb") as f:
+            overlay_png = f.read()
+
+        minutiae_blob = None
+        if minutiae_df is not None and not minutiae_df.empty:
+            buf = io.BytesIO()
+            np.save(buf, minutiae_df[["x", "y", "angle", "score", "class"]].to_numpy(dtype="float64"),
+                    allow_pickle=False)
+            minutiae_blob = buf.getvalue()
+
+        size_bytes = len(overlay_png) + (len(minutiae_blob) if minutiae_blob else 0)
+        conn = get_db_connection()
+        try:
+            conn.execute(
+                '''
+                INSERT OR REPLACE INTO extraction_cache
+                    (cache_key, model_version, minutiae_count, minutiae, overlay_png, singular_points,
+                     size_bytes, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (cache_key, model_fingerprint(MODEL_DIR), minutiae_count,
+                 minutiae_blob, overlay_png, json.dumps(list(singular)), size_bytes, time.time()),
+            )
+            _evict_cache(conn, EXTRACTION_CACHE_MAX_BYTES)
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"WARNING: gagal menyimpan cache ekstraksi: {e}")
+
+
+def _evict_cache(conn, max_bytes):
+    """Buang entri yang paling lama tidak diakses sampai total ukuran <= max_bytes."""
+    total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM extraction_cache").fetchone()[0]
+    if total <= max_bytes:
+        return
+    victims = []
+    for row in conn.execute("SELECT cache_key, size_bytes FROM extraction_cache ORDER BY last_access ASC"):
+        if total <= max_bytes:
+            break
+        victims.append((row["cache_key"],))
+        total -= row["size_bytes"]
+    conn.executemany("DELETE FROM extraction_cache WHERE cache_key = ?", victims)
+
+
+def clear_extraction_cache():
+    """Kosongkan seluruh cache ekstraksi."""
+    conn = get_db_connection()
+    conn.execute("DELETE FROM extraction_cache")
+    conn.commit()
+    conn.close()
+
+
 # =========================================================================
 # --- LOGIKA EKSTRAKSI MINUTIAE (CORE LOGIC) ---
 # =========================================================================
 
-def run_minutiae_extraction(input_filepath, case_judul, progress_callback=None):
-    def report(msg):
-        if progress_callback is not None:
-            try:
-                progress_callback(msg)
-            except Exception:
-                pass
+class LowQualityError(Exception):
+    """Gambar ditolak gerbang kualitas sebelum masuk model. Atribut: score."""
+
+    def __init__(self, score, min_score):
+        super().__init__(
+            f"Kualitas gambar terlalu rendah (skor {score:.2f} < {min_score:.2f}). "
+            "Gambar kosong, buram/smudge, atau terlalu kecil."
+        )
+        self.score = score
+        self.min_score = min_score
+
+
+_inference_isolated = False
+
+
+def isolate_inference():
+    """Dipanggil sekali oleh GUI: inferensi berikutnya berjalan di proses anak."""
+    global _inference_isolated
+    _inference_isolated = INFERENCE_SUBPROCESS_ENABLED
+
+
+def inference_interruptible():
+    """
+    True jika inferensi yang sedang berjalan bisa dihentikan saat job
+    dibatalkan (proses inferensi terpisah). Selain itu pembatalan baru
+    berlaku di batas tahap berikutnya.
+    """
+    return _inference_isolated
+
+
+def get_extractor_manager():
+    """
+    Mengembalikan ExtractorManager bersama (model FingerFlow dimuat sekali
+    dan dipakai ulang oleh GUI maupun jalur batch), atau InferenceProcess
+    dengan antarmuka yang sama jika isolate_inference() sudah dipanggil.
+    """
+    kwargs = dict(
+        model_dir=MODEL_DIR,
+        idle_timeout=EXTRACTOR_IDLE_TIMEOUT,
+        backend=INFERENCE_BACKEND,
+        cache_dir=MODEL_CACHE_DIR,
+        weight_cache=MODEL_WEIGHT_CACHE_ENABLED,
+        warm_up_shapes=_warm_up_shapes(),
+    )
+    if _inference_isolated:
+        from core.inference_process import get_inference_process
+        return get_inference_process(kwargs, request_timeout=INFERENCE_REQUEST_TIMEOUT)
+    return _get_extractor_manager(**kwargs)
+
+
+def _warm_up_shapes():
+    """
+    Bucket input yang di-trace saat warm-up (kosong jika bucket dimatikan):
+    (h, w) gambar tunggal yang sisi panjangnya diresize ke target_long_side,
+    plus (TILE_BATCH, h, w) untuk kelompok tile penuh.
+    """
+    if not SHAPE_BUCKETS_ENABLED:
+        return []
+    shapes = buckets.long_side_shapes(
+        ENHANCE_PARAMS["target_long_side"], SHAPE_BUCKET_MULTIPLE, SHAPE_BUCKET_MIN_SIDE
+    )
+    if TILED_EXTRACTION_ENABLED:
+        tile = buckets.bucket_side(TILE_SIZE, SHAPE_BUCKET_MULTIPLE, SHAPE_BUCKET_MIN_SIDE)
+        shapes.append((TILE_BATCH, tile, tile))
+    return shapes
+
+
+def _pad_model_input(image):
+    """Pad input model ke bucket-nya. Return: (gambar, (h, w) ukuran asli)."""
+    if not SHAPE_BUCKETS_ENABLED:
+        return image, image.shape[:2]
+    return buckets.pad_to_bucket(image, SHAPE_BUCKET_MULTIPLE, SHAPE_BUCKET_MIN_SIDE)
+
+
+def _extract_bucketed(extractor, images_bgr):
+    """
+    Ekstraksi banyak gambar (extract_minutiae_batch) dengan input dipad ke
+    bucket; output dipotong kembali ke ukuran masing-masing gambar.
+    """
+    from core.batched_inference import extract_minutiae_batch
+
+    padded = [_pad_model_input(img) for img in images_bgr]
+    if hasattr(extractor, "extract_minutiae_batch"):
+        # RemoteExtractor: batch dijalankan di proses inferensi
+        outputs = extractor.extract_minutiae_batch([p[0] for p in padded])
+    else:
+        outputs = extract_minutiae_batch(extractor, [p[0] for p in padded])
+    for output_data, (_, (h, w)) in zip(outputs, padded):
+        buckets.crop_extraction_output(output_data, h, w)
+    return outputs
 
+
+def preload_extraction_stack():
+    """
+    Muat OpenCV/Pandas/modul core lalu model FingerFlow di thread latar
+    (dipanggil setelah login), supaya ekstraksi pertama tidak menunggu.
+    """
+    def _run():
+        t0 = time.perf_counter()
+        try:
+            preload(cv2, pd, preprocess, render, segmentation, tiling, quality)
+            print(f"[startup] Pustaka ekstraksi dimuat di latar dalam {time.perf_counter() - t0:.2f} dtk")
+        except Exception as e:
+            print(f"[startup] WARNING: gagal memuat pustaka ekstraksi: {e}")
+            return
+        get_extractor_manager().warm_up_async()
+
+    t = threading.Thread(target=_run, name="preload-extraction", daemon=True)
+    t.start()
+    return t
+
+
+def _build_output_paths(case_judul, suffix=""):
+    """Menentukan path sementara gambar mentah & ekstraksi di DATA_DIR."""
     # Format judul kasus agar aman digunakan sebagai nama file
-    report("Menyiapkan nama file & lokasi output...")
     sanitized_judul = "".join(
         c for c in case_judul if c.isalnum() or c in (" ", "_")
     ).rstrip()[:30].replace(" ", "_")
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    base_filename = f"{timestamp}_{sanitized_judul}"
+    # Mikrodetik + PID: nama tetap unik walau banyak worker memproses judul yang sama
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    base_filename = f"{timestamp}_{os.getpid()}_{sanitized_judul}{suffix}"
 
     path_mentah = os.path.join(DATA_DIR, f"{base_filename}_mentah.png")
     path_ekstraksi = os.path.join(DATA_DIR, f"{base_filename}_ekstraksi.png")
+    return path_mentah, path_ekstraksi
 
-    # 1. Buka Gambar & Simpan Versi Mentah (Grayscale)
+
+def _working_image(decoded, source):
+    """
+    Gambar mentah yang dipakai model. Scan besar hanya disesuaikan ke
+    ~MODEL_TARGET_PPI (untuk ekstraksi bertile); selain itu diperkecil ke
+    MODEL_INPUT_MAX_SIDE seperti biasa.
+    """
+    if TILED_EXTRACTION_ENABLED and max(decoded.shape[:2]) > TILED_MIN_SIDE:
+        scale = preprocess.working_scale(decoded, preprocess.read_dpi(source), MODEL_TARGET_PPI)
+        long_side = int(max(decoded.shape[:2]) * scale)
+        if long_side > TILED_MIN_SIDE:
+            return preprocess.resize_long_side(decoded, long_side, upscale=False)
+    return preprocess.prepare_raw(decoded, MODEL_INPUT_MAX_SIDE)
+
+
+def _is_tiled(raw_gray):
+    return TILED_EXTRACTION_ENABLED and max(raw_gray.shape[:2]) > TILED_MIN_SIDE
+
+
+def _load_raw_image(input_filepath, path_mentah):
+    """
+    Decode gambar sekali, perkecil ke ukuran kerja model dan simpan versi
+    mentah (grayscale PNG) untuk arsip.
+    Return: (gray hasil decode asli, gray mentah yang dipakai model,
+    resolusi gray mentah dalam ppi atau None).
+    """
+    decoded = preprocess.decode_gray(input_filepath)
+    raw_gray = _working_image(decoded, input_filepath)
+    Image.fromarray(raw_gray).save(path_mentah, "PNG")  # simpan mentah grayscale untuk arsip
+    return decoded, raw_gray, _raw_ppi(decoded, raw_gray, input_filepath)
+
+
+def _raw_ppi(decoded, raw_gray, source):
+    """
+    Resolusi gambar kerja model (ppi): dpi metadata file atau perkiraan dari
+    periode ridge gambar asli, diskalakan ke ukuran gambar kerja.
+    """
     try:
-        # Buka gambar dan konversi ke Grayscale (L)
-        report("Memuat gambar dan menyimpan versi mentah (Hitam Putih)...")
-        img_pil = Image.open(input_filepath).convert("L")
-        img_pil.save(path_mentah, "PNG")  # simpan mentah grayscale untuk arsip
+        ppi = preprocess.estimate_ppi(decoded, preprocess.read_dpi(source), MODEL_TARGET_PPI)
+    except Exception as e:
+        print(f"WARNING: Gagal memperkirakan resolusi gambar: {e}")
+        return None
+    return ppi * raw_gray.shape[0] / float(decoded.shape[0]) if ppi else None
 
-        # Konversi ke NumPy Array (1 channel, 0-255)
-        img_raw_single_channel = np.array(img_pil)
 
-        # Buat 3-channel (BGR) untuk diproses OpenCV / FingerFlow
-        img_raw_3channel = np.stack(
-            (img_raw_single_channel,) * 3,
-            axis=-1,
-        ).astype("uint8")
+def _enhance_for_model(raw_gray):
+    """Enhance gambar sebelum diumpankan ke FingerFlow (fallback: gambar mentah)."""
+    try:
+        return preprocess.enhance_for_model(raw_gray, **ENHANCE_PARAMS)
+    except Exception as e:
+        print(f"WARNING: Gagal enhance gambar, pakai gambar mentah 3-channel. Error: {e}")
+        return cv2.cvtColor(raw_gray, cv2.COLOR_GRAY2BGR), raw_gray
 
+
+def _crop_to_roi(raw_gray, enhanced_bgr):
+    """
+    Potong gambar enhance ke area sidik jari. ROI dicari pada gambar mentah
+    (background belum diperkuat CLAHE/Gabor) lalu diskalakan ke ukuran enhance.
+    Return: (gambar input model, (x0, y0) offset potongan).
+    """
+    if not ROI_CROP_ENABLED:
+        return enhanced_bgr, (0, 0)
+    try:
+        box = segmentation.roi_box(raw_gray, padding=ROI_PADDING)
+        x0, y0, x1, y1 = segmentation.scale_box(box, raw_gray.shape[:2], enhanced_bgr.shape[:2])
     except Exception as e:
-        print(f"ERROR: Gagal memuat atau menyimpan gambar mentah: {e}")
-        return None, None
+        print(f"WARNING: Segmentasi ROI gagal, pakai gambar penuh. Error: {e}")
+        return enhanced_bgr, (0, 0)
+    # ROI terlalu kecil → kemungkinan segmentasi salah, pakai gambar penuh
+    if (x1 - x0) < 64 or (y1 - y0) < 64:
+        return enhanced_bgr, (0, 0)
+    return np.ascontiguousarray(enhanced_bgr[y0:y1, x0:x1]), (x0, y0)
+
 
-    # 1b. ENHANCE GAMBAR SEBELUM DIUMPANKAN KE FINGERFLOW
+def _enhance_tile(tile_gray):
+    """Enhance satu tile pada resolusi aslinya (tanpa resize)."""
+    params = {k: v for k, v in ENHANCE_PARAMS.items() if k != "target_long_side"}
     try:
-        report("Meningkatkan kualitas gambar sidik jari...")
-        enhanced_bgr, enhanced_gray = enhance_fingerprint_image_array(
-            img_raw_3channel,
-            target_long_side=512,
-            clahe_clip=2.0,
-            clahe_grid=(8, 8),
-            denoise_strength=5,
-            sharp_amount=1.0,
+        return preprocess.enhance_gray(tile_gray, **params)
+    except Exception as e:
+        print(f"WARNING: Gagal enhance tile, pakai tile mentah. Error: {e}")
+        return tile_gray
+
+
+def _extract_tiled(raw_gray, manager, progress_callback=None, job=None, cancel_token=None):
+    """
+    Ekstraksi bertile untuk gambar besar.
+    Return: (output_data berkoordinat gambar penuh, enhanced_gray gambar penuh).
+
+    Tile yang seluruhnya background dilewati. Hanya TILE_BATCH tile yang
+    di-enhance & diinferensi sekaligus; gambar enhance penuh disusun dari area
+    milik tiap tile untuk visualisasi. Jika `job` diberikan, progres
+    dilaporkan & pembatalan diperiksa di antara kelompok tile; tanpa job
+    (batch) cukup `cancel_token`. Raise JobCancelled jika dibatalkan.
+    """
+    h, w = raw_gray.shape[:2]
+    tiles = tiling.tile_grid(h, w, TILE_SIZE, TILE_OVERLAP)
+    tiles = segmentation.select_foreground_tiles(raw_gray, tiles)
+    enhanced_gray = raw_gray.copy()
+    outputs = []
+
+    if job is not None:
+        cancel_token = job.token
+    with manager.acquire(progress_callback=progress_callback, cancel_token=cancel_token) as extractor:
+        for start in range(0, len(tiles), TILE_BATCH):
+            group = tiles[start:start + TILE_BATCH]
+            if job is not None:
+                job.set_progress(start / float(max(1, len(tiles))))
+            elif cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            if progress_callback is not None:
+                progress_callback(
+                    f"Menjalankan ekstraksi minutiae (tile {start + 1}-{start + len(group)} dari {len(tiles)})..."
+                )
+            inputs = []
+            for t in group:
+                enh = _enhance_tile(raw_gray[t.y0:t.y1, t.x0:t.x1])
+                enhanced_gray[t.own_y0:t.own_y1, t.own_x0:t.own_x1] = \
+                    enh[t.own_y0 - t.y0:t.own_y1 - t.y0, t.own_x0 - t.x0:t.own_x1 - t.x0]
+                inputs.append(cv2.cvtColor(enh, cv2.COLOR_GRAY2BGR))
+            outputs.extend(_extract_bucketed(extractor, inputs))
+
+    return tiling.merge_tile_outputs(outputs, tiles), enhanced_gray
+
+
+def _quality_gate(raw_gray, min_quality=None):
+    """
+    Hitung skor kualitas gambar (milidetik). Return: skor.
+    Raise LowQualityError jika gerbang aktif dan skor < ambang.
+    """
+    score = quality.assess_quality(raw_gray).score
+    threshold = QUALITY_MIN_SCORE if min_quality is None else min_quality
+    if QUALITY_GATE_ENABLED and score < threshold:
+        raise LowQualityError(score, threshold)
+    return score
+
+
+def _count_minutiae(minutiae_df):
+    return (
+        len(minutiae_df)
+        if minutiae_df is not None and not minutiae_df.empty
+        else 0
+    )
+
+
+def _make_template(minutiae_df, frame_shape, raw_ppi=None, raw_shape=None):
+    """
+    Template minutiae + ukuran gambar acuan koordinatnya (h, w). Resolusi
+    frame = raw_ppi (gambar kerja berukuran raw_shape) diskalakan ke frame.
+    """
+    ppi = raw_ppi * frame_shape[0] / float(raw_shape[0]) if raw_ppi and raw_shape is not None else None
+    return template.Template(template.from_dataframe(minutiae_df), int(frame_shape[1]), int(frame_shape[0]), ppi)
+
+
+def _cached_template(minutiae_df, path_ekstraksi, raw_ppi=None, raw_shape=None):
+    """Template untuk cache hit: ukuran acuan = ukuran overlay tersimpan."""
+    with Image.open(path_ekstraksi) as im:
+        width, height = im.size
+    return _make_template(minutiae_df, (height, width), raw_ppi, raw_shape)
+
+
+def _save_extraction_image(enhanced_bgr, enhanced_gray, minutiae_df, path_ekstraksi):
+    """Gambar minutiae di atas gambar enhance lalu simpan sebagai PNG."""
+    if _count_minutiae(minutiae_df) == 0:
+        print(
+            "Peringatan: Tidak ada minutiae yang terdeteksi. Menyimpan gambar enhance grayscale saja."
         )
+        # pakai enhanced_gray sebagai gambar hasil
+        img_hasil_pil = Image.fromarray(enhanced_gray)
+    else:
+        # Gunakan salinan gambar enhance 3-channel sebagai kanvas
+        img_canvas = enhanced_bgr.copy()
+
+        # Panggil draw_minutiae_func (renderer OpenCV vektorisasi)
+        img_with_minutiae_np = draw_minutiae_func(img_canvas, minutiae_df)
+        img_with_minutiae_np = img_with_minutiae_np.astype("uint8")
+        # Konversi ke PIL untuk disimpan
+        img_hasil_pil = Image.fromarray(img_with_minutiae_np)
+
+    # Simpan gambar hasil ekstraksi
+    img_hasil_pil.save(path_ekstraksi, "PNG")
+
+
+def _try_cache(gray, raw_gray, path_ekstraksi):
+    """
+    Cek cache untuk gambar ini (gray hasil decode, raw_gray gambar kerja
+    model). Jika ada, tulis overlay tersimpan ke
+    path_ekstraksi. Return: (cache_key, (minutiae_df, count, (core_point,
+    delta_point)) atau None).
+    """
+    try:
+        cache_key = extraction_cache_key(gray, raw_gray.shape)
+        cached = cache_lookup(cache_key)
     except Exception as e:
-        print(f"WARNING: Gagal enhance gambar, pakai gambar mentah 3-channel. Error: {e}")
-        enhanced_bgr = img_raw_3channel
-        enhanced_gray = img_raw_single_channel
+        print(f"WARNING: cek cache ekstraksi gagal: {e}")
+        return None, None
+    if cached is None:
+        return cache_key, None
+    minutiae_df, minutiae_count, overlay_png, singular = cached
+    with open(path_ekstraksi, "wb") as f:
+        f.write(overlay_png)
+    return cache_key, (minutiae_df, minutiae_count, singular)
+
+
+def _remove_files(*paths):
+    for path in paths:
+        try:
+            if path and os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            print(f"WARNING: gagal menghapus {path}: {e}")
+
+
+def run_minutiae_extraction(input_filepath, case_judul, progress_callback=None, min_quality=None, job=None):
+    """
+    Ekstraksi minutiae satu gambar. Return: core.jobs.ExtractionResult
+    (path, skor kualitas, jumlah & template minutiae, core, waktu per tahap).
+    Jika gagal, path-nya None dan pesan ada di result.error.
+
+    Raise LowQualityError jika skor kualitas < min_quality (default
+    QUALITY_MIN_SCORE); model tidak dijalankan sama sekali.
+
+    job (core.jobs.ExtractionJob, opsional): menerima tahap, progres & waktu
+    tiap tahap. Jika job.cancel() dipanggil, pipeline berhenti di batas tahap
+    berikutnya, file sementara dihapus dan JobCancelled di-raise.
+    """
+    if job is None:
+        job = ExtractionJob(input_filepath, case_judul)
+
+    def report(msg):
+        job.message = msg
+        if progress_callback is not None:
+            try:
+                progress_callback(msg)
+            except Exception:
+                pass
+
+    report("Menyiapkan nama file & lokasi output...")
+    path_mentah, path_ekstraksi = _build_output_paths(case_judul)
+    result = ExtractionResult(input_filepath)
+    try:
+        _run_single_extraction(job, result, path_mentah, path_ekstraksi, min_quality, report)
+    except JobCancelled:
+        print("INFO: Ekstraksi dibatalkan pengguna.")
+        _remove_files(path_mentah, path_ekstraksi)
+        job.finish(Stage.CANCELLED)
+        raise
+    except LowQualityError as e:
+        job.finish(Stage.FAILED, error=str(e))
+        raise
+
+    if result.ok:
+        job.finish(Stage.DONE)
+    else:
+        _remove_files(path_mentah, path_ekstraksi)
+        result.error = job.error or "Gagal ekstraksi"
+        job.finish(Stage.FAILED, error=result.error)
+    result.durations = job.durations()
+    print(f"DEBUG: Waktu per tahap: { {k: round(v, 3) for k, v in result.durations.items()} }")
+    return result
+
+
+def _run_single_extraction(job, result, path_mentah, path_ekstraksi, min_quality, report):
+    """
+    Isi pipeline run_minutiae_extraction (setiap job.enter() memeriksa
+    pembatalan). Mengisi `result`; path-nya hanya di-set jika berhasil.
+    """
+    # 1. Buka Gambar & Simpan Versi Mentah (Grayscale)
+    job.enter(Stage.LOADING)
+    try:
+        report("Memuat gambar dan menyimpan versi mentah (Hitam Putih)...")
+        decoded_gray, raw_gray, raw_ppi = _load_raw_image(result.input_filepath, path_mentah)
+    except Exception as e:
+        print(f"ERROR: Gagal memuat atau menyimpan gambar mentah: {e}")
+        job.error = f"Gagal memuat gambar: {e}"
+        return
+
+    # 1a. GERBANG KUALITAS: gambar kosong/smudge tidak perlu masuk model
+    job.enter(Stage.QUALITY)
+    report("Memeriksa kualitas gambar...")
+    try:
+        result.quality_score = _quality_gate(raw_gray, min_quality)
+    except LowQualityError as e:
+        result.quality_score = e.score
+        print(f"INFO: {e}")
+        _remove_files(path_mentah)
+        raise
+    print(f"DEBUG: Skor kualitas gambar: {result.quality_score:.3f}")
+
+    # 1b. CEK CACHE: gambar yang sama sudah pernah diekstraksi → pakai hasilnya
+    job.enter(Stage.CACHE)
+    cache_key, cached = _try_cache(decoded_gray, raw_gray, path_ekstraksi)
+    if cached is not None:
+        report("Hasil ekstraksi ditemukan di cache...")
+        result.minutiae_count = cached[1]
+        result.template = _cached_template(cached[0], path_ekstraksi, raw_ppi, raw_gray.shape)
+        result.core_point, result.delta_point = cached[2]
+        result.cached = True
+        result.path_mentah, result.path_ekstraksi = path_mentah, path_ekstraksi
+        print(f"DEBUG: Cache hit, jumlah minutiae: {result.minutiae_count}")
+        return
+
+    job.enter(Stage.PREPROCESS)
+    tiled = _is_tiled(raw_gray)
+    if not tiled:
+        # 1c. ENHANCE GAMBAR SEBELUM DIUMPANKAN KE FINGERFLOW
+        report("Meningkatkan kualitas gambar sidik jari...")
+        enhanced_bgr, enhanced_gray = _enhance_for_model(raw_gray)
+
+        # 1d. POTONG KE AREA SIDIK JARI (background tidak ikut diinferensi)
+        model_input, (roi_x, roi_y) = _crop_to_roi(raw_gray, enhanced_bgr)
 
     # 2. EKSTRAKSI MINUTIAE (Fingerflow)
     try:
-        # Tentukan path lengkap ke setiap model menggunakan folder 'models'
+        # Model dimuat sekali oleh ExtractorManager (FileNotFoundError jika file model hilang)
+        job.enter(Stage.INFERENCE)
         report("Memuat model...")
-        coarse_path = os.path.join(MODEL_DIR, "CoarseNet.h5")
-        fine_path = os.path.join(MODEL_DIR, "FineNet.h5")
-        classify_path = os.path.join(MODEL_DIR, "ClassifyNet_6_classes.h5")
-        core_path = os.path.join(MODEL_DIR, "CoreNet.weights")
-
-        # Pengecekan Eksistensi File Model
-        if not all(os.path.exists(p) for p in [coarse_path, fine_path, classify_path, core_path]):
-            raise FileNotFoundError(
-                f"Satu atau lebih file model Fingerflow (.h5/weights) tidak ditemukan di: {MODEL_DIR}"
-            )
+        manager = get_extractor_manager()
+        if tiled:
+            # Scan resolusi tinggi: enhance + ekstraksi per tile
+            output_data, enhanced_gray = _extract_tiled(raw_gray, manager, progress_callback=report, job=job)
+            enhanced_bgr = cv2.cvtColor(enhanced_gray, cv2.COLOR_GRAY2BGR)
+        else:
+            with manager.acquire(progress_callback=report, cancel_token=job.token) as extractor:
+                # Ekstraksi minutiae → PAKAI GAMBAR YANG SUDAH DI-ENHANCE
+                report("Menjalankan ekstraksi minutiae...")
+                padded_input, (in_h, in_w) = _pad_model_input(model_input)
+                output_data = extractor.extract_minutiae(padded_input)  # Output: dict
 
-        # Inisialisasi Extractor
-        report("memuat model ekstraksi minutiae...")
-        extractor = Extractor(
-            coarse_net_path=coarse_path,
-            fine_net_path=fine_path,
-            classify_net_path=classify_path,
-            core_net_path=core_path,
-        )
-         # Ekstraksi minutiae → PAKAI GAMBAR YANG SUDAH DI-ENHANCE
-        report("Menjalankan ekstraksi minutiae...")
-        output_data = extractor.extract_minutiae(enhanced_bgr)  # Output: dict
+            # Frame bucket → frame potongan ROI (minutiae di area pad dibuang)
+            buckets.crop_extraction_output(output_data, in_h, in_w)
+
+            # Koordinat potongan ROI → koordinat gambar enhance penuh
+            segmentation.shift_extraction_output(output_data, roi_x, roi_y)
 
         # AMBIL DATAFRAME MINUTIAE
         minutiae_df = output_data.get("minutiae")
 
         # Hitung jumlah minutiae
-        num_minutiae = (
-            len(minutiae_df)
-            if minutiae_df is not None and not minutiae_df.empty
-            else 0
-        )
+        num_minutiae = _count_minutiae(minutiae_df)
 
-        global MINUTIAE_COUNT 
-        MINUTIAE_COUNT = num_minutiae  # Simpan ke atribut untuk referensi luar
+        result.minutiae_count = num_minutiae
+        result.template = _make_template(minutiae_df, enhanced_gray.shape, raw_ppi, raw_gray.shape)
+        result.core = output_data.get("core")
+        result.core_point, result.delta_point = features.singular_points(result.core)
         print(f"DEBUG: Jumlah minutiae yang terdeteksi: {num_minutiae}")
 
         # 3. Visualisasi Hasil Ekstraksi
+        job.enter(Stage.RENDER)
         report("Menyusun visualisasi hasil ekstraksi...")
-        if num_minutiae == 0:
-            print(
-                "Peringatan: Tidak ada minutiae yang terdeteksi. Menyimpan gambar enhance grayscale saja."
-            )
-            
-            # pakai enhanced_gray sebagai gambar hasil
-            img_hasil_pil = Image.fromarray(enhanced_gray)
-        else:
-            # Gunakan salinan gambar enhance 3-channel sebagai kanvas
-            img_canvas = enhanced_bgr.copy()
-
-            # Panggil draw_minutiae_func (dari fingerflow atau fallback OpenCV)
-            img_with_minutiae_np = draw_minutiae_func(img_canvas, minutiae_df)
-            img_with_minutiae_np = img_with_minutiae_np.astype("uint8")
-            # Konversi ke PIL untuk disimpan
-            report("Menyimpan gambar hasil ekstraksi...")
-            img_hasil_pil = Image.fromarray(img_with_minutiae_np)
-            print("DEBUG SAVE PATH:", path_ekstraksi)
-            print("DEBUG EXISTS DIR:", os.path.exists(os.path.dirname(path_ekstraksi)))
-
+        _save_extraction_image(enhanced_bgr, enhanced_gray, minutiae_df, path_ekstraksi)
 
-        # Simpan gambar hasil ekstraksi
-        img_hasil_pil.save(path_ekstraksi, "PNG")
+        # 4. Simpan ke cache untuk upload ulang berikutnya
+        job.enter(Stage.SAVING)
+        if cache_key is not None:
+            cache_store(cache_key, minutiae_df, num_minutiae, path_ekstraksi,
+                        (result.core_point, result.delta_point))
 
+    except JobCancelled:
+        raise
     except FileNotFoundError as fnf_e:
         print(
             f"ERROR: Model tidak ditemukan. Pastikan 4 file model ada di folder 'models'. {fnf_e}"
         )
-        return None, None
+        job.error = f"Model tidak ditemukan: {fnf_e}"
+        return
     except Exception as e:
         print(f"ERROR: Gagal ekstraksi minutiae (Fingerflow). Error: {e}")
-        if os.path.exists(path_ekstraksi):
-            os.remove(path_ekstraksi)
-        return None, None
+        job.error = str(e)
+        _remove_files(path_ekstraksi)
+        return
+
+    # Path tempat file disimpan
+    result.path_mentah, result.path_ekstraksi = path_mentah, path_ekstraksi
+
+
+def run_minutiae_extraction_batch(input_filepaths, case_judul, batch_size=8, progress_callback=None,
+                                  min_quality=None, cancel_token=None):
+    """
+    Ekstraksi minutiae untuk banyak gambar sekaligus (mis. satu folder kasus).
+
+    - case_judul boleh satu string (dipakai semua gambar) atau list per gambar.
+    - Gambar diproses per kelompok `batch_size`: CoarseNet menerima tensor
+      berbentuk tetap per bucket ukuran (SHAPE_BUCKET_MULTIPLE), FineNet/
+      ClassifyNet/CoreNet menerima semua patch/gambar kelompok dalam satu predict.
+    - progress_callback(done, total) dipanggil setelah tiap kelompok.
+
+    Return: list core.jobs.ExtractionResult (urutan sama dengan input).
+    Gambar yang gagal (termasuk yang ditolak gerbang kualitas) punya path
+    None dan pesan di `error`.
+
+    cancel_token (core.jobs.CancelToken, opsional) diperiksa sebelum tiap
+    gambar dan tiap kelompok inferensi; gambar yang belum diproses saat
+    dibatalkan ditandai error "Dibatalkan".
+    """
+    input_filepaths = list(input_filepaths)
+    if isinstance(case_judul, str):
+        juduls = [case_judul] * len(input_filepaths)
+    else:
+        juduls = list(case_judul)
+    if len(juduls) != len(input_filepaths):
+        raise ValueError("Jumlah judul kasus harus sama dengan jumlah gambar")
+
+    if batch_size < 1:
+        raise ValueError(f"batch_size harus >= 1 (diberikan {batch_size})")
+
+    results = [ExtractionResult(path) for path in input_filepaths]
+    manager = get_extractor_manager()
+    total = len(input_filepaths)
+
+    def cancelled():
+        return cancel_token is not None and cancel_token.cancelled
+
+    for start in range(0, total, batch_size):
+        if cancelled():
+            break
+        # 1. Muat + enhance satu kelompok (hanya kelompok ini yang ada di memori)
+        chunk = []
+        for i in range(start, min(start + batch_size, total)):
+            if cancelled():
+                break
+            path_mentah, path_ekstraksi = _build_output_paths(juduls[i], suffix=f"_{i + 1:03d}")
+            try:
+                decoded_gray, raw_gray, raw_ppi = _load_raw_image(input_filepaths[i], path_mentah)
+            except Exception as e:
+                results[i].error = f"Gagal memuat gambar: {e}"
+                _remove_files(path_mentah)
+                continue
+
+            try:
+                results[i].quality_score = _quality_gate(raw_gray, min_quality)
+            except LowQualityError as e:
+                results[i].quality_score = e.score
+                results[i].error = str(e)
+                _remove_files(path_mentah)
+                continue
+
+            cache_key, cached = _try_cache(decoded_gray, raw_gray, path_ekstraksi)
+            if cached is not None:
+                _fill_result(
+                    results[i], path_mentah, path_ekstraksi, cached[1],
+                    _cached_template(cached[0], path_ekstraksi, raw_ppi, raw_gray.shape), singular=cached[2],
+                    cached=True,
+                )
+                continue
+
+            if _is_tiled(raw_gray):
+                # Scan besar sudah di-batch per tile; tidak digabung dengan kelompok
+                try:
+                    output_data, enhanced_gray = _extract_tiled(raw_gray, manager, cancel_token=cancel_token)
+                    minutiae_df = output_data.get("minutiae")
+                    num_minutiae = _count_minutiae(minutiae_df)
+                    _save_extraction_image(
+                        cv2.cvtColor(enhanced_gray, cv2.COLOR_GRAY2BGR), enhanced_gray, minutiae_df, path_ekstraksi
+                    )
+                except JobCancelled:
+                    # Dibatalkan di antara kelompok tile / di tengah predict
+                    _remove_files(path_mentah, path_ekstraksi)
+                    break
+                except Exception as e:
+                    print(f"ERROR: Gagal ekstraksi bertile (Fingerflow). Error: {e}")
+                    results[i].error = f"Gagal ekstraksi: {e}"
+                    _remove_files(path_mentah, path_ekstraksi)
+                    continue
+                core = output_data.get("core")
+                if cache_key is not None:
+                    cache_store(cache_key, minutiae_df, num_minutiae, path_ekstraksi,
+                                features.singular_points(core))
+                _fill_result(
+                    results[i], path_mentah, path_ekstraksi, num_minutiae,
+                    _make_template(minutiae_df, enhanced_gray.shape, raw_ppi, raw_gray.shape), core=core,
+                )
+                continue
+
+            enhanced_bgr, enhanced_gray = _enhance_for_model(raw_gray)
+            model_input, roi_offset = _crop_to_roi(raw_gray, enhanced_bgr)
+            raw_frame = (raw_ppi, raw_gray.shape)
+            chunk.append((i, path_mentah, path_ekstraksi, enhanced_bgr, enhanced_gray, cache_key, model_input, roi_offset,
+                          raw_frame))
+
+        if cancelled():
+            for c in chunk:
+                _remove_files(c[1])
+            break
+
+        # 2. Inferensi batch
+        if chunk:
+            try:
+                with manager.acquire(cancel_token=cancel_token) as extractor:
+                    outputs = _extract_bucketed(extractor, [c[6] for c in chunk])
+            except JobCancelled:
+                # Proses inferensi terpisah dihentikan di tengah predict
+                for c in chunk:
+                    _remove_files(c[1])
+                break
+            except Exception as e:
+                print(f"ERROR: Gagal ekstraksi batch (Fingerflow). Error: {e}")
+                for c in chunk:
+                    results[c[0]].error = f"Gagal ekstraksi: {e}"
+                    _remove_files(c[1])
+                outputs = []
+
+            # 3. Visualisasi & simpan per gambar
+            for (i, path_mentah, path_ekstraksi, enhanced_bgr, enhanced_gray, cache_key, _, roi_offset, raw_frame), output_data in zip(chunk, outputs):
+                segmentation.shift_extraction_output(output_data, *roi_offset)
+                minutiae_df = output_data.get("minutiae")
+                num_minutiae = _count_minutiae(minutiae_df)
+                try:
+                    _save_extraction_image(enhanced_bgr, enhanced_gray, minutiae_df, path_ekstraksi)
+                except Exception as e:
+                    results[i].error = f"Gagal menyimpan hasil: {e}"
+                    _remove_files(path_mentah, path_ekstraksi)
+                    continue
+                core = output_data.get("core")
+                if cache_key is not None:
+                    cache_store(cache_key, minutiae_df, num_minutiae, path_ekstraksi,
+                                features.singular_points(core))
+                _fill_result(
+                    results[i], path_mentah, path_ekstraksi, num_minutiae,
+                    _make_template(minutiae_df, enhanced_gray.shape, *raw_frame), core=core,
+                )
+
+        if progress_callback is not None:
+            try:
+                progress_callback(min(start + batch_size, total), total)
+            except Exception:
+                pass
+
+    if cancelled():
+        for r in results:
+            if r.path_ekstraksi is None and r.error is None:
+                r.error = "Dibatalkan"
+    return results
 
-    # Mengembalikan path tempat file disimpan
-    return path_mentah, path_ekstraksi
+
+def _fill_result(result, path_mentah, path_ekstraksi, minutiae_count, tpl, core=None, singular=None,
+                 cached=False):
+    result.path_mentah, result.path_ekstraksi = path_mentah, path_ekstraksi
+    result.minutiae_count = minutiae_count
+    result.template = tpl
+    result.core = core
+    result.core_point, result.delta_point = singular if singular is not None else features.singular_points(core)
+    result.cached = cached
 
 
 # =========================================================================
@@ -519,17 +1434,26 @@ def get_history_data(user_id=None):
     finally:
         conn.close()
 
-def save_history(judul_kasus, nomor_lp, tanggal_kejadian, path_mentah, path_ekstraksi, user_id, minutiae_count=None):
-    """Menyimpan riwayat ke database dan mengembalikan ID baris yang baru dibuat."""
+def save_history(judul_kasus, nomor_lp, tanggal_kejadian, path_mentah, path_ekstraksi, user_id, minutiae_count=None,
+                 quality_score=None, minutiae_template=None, singular=None):
+    """
+    Menyimpan riwayat (+ template minutiae & fitur partisi jika ada) ke
+    database dan mengembalikan ID baris yang baru dibuat.
+    singular: (core_point, delta_point) dari ExtractionResult, opsional.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
         cursor.execute('''
-            INSERT INTO history (judul_kasus, nomor_lp, tanggal_kejadian, path_mentah, path_ekstraksi, user_id, minutiae_count)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (judul_kasus, nomor_lp, tanggal_kejadian, path_mentah, path_ekstraksi, user_id, minutiae_count))
+            INSERT INTO history (judul_kasus, nomor_lp, tanggal_kejadian, path_mentah, path_ekstraksi, user_id,
+                                 minutiae_count, quality_score)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (judul_kasus, nomor_lp, tanggal_kejadian, path_mentah, path_ekstraksi, user_id, minutiae_count,
+              quality_score))
         
         last_id = cursor.lastrowid
+        if minutiae_template is not None:
+            _insert_template(cursor, last_id, minutiae_template, singular)
         conn.commit()
         conn.close()
         return last_id
@@ -539,6 +1463,338 @@ def save_history(judul_kasus, nomor_lp, tanggal_kejadian, path_mentah, path_ekst
         conn.close()
         return None
 
+# -------------------------------------------------------------------------
+# Template minutiae (tabel minutiae_template)
+# -------------------------------------------------------------------------
+
+_INSERT_TEMPLATE_SQL = """
+    INSERT OR REPLACE INTO minutiae_template
+        (history_id, format_version, minutiae_count, image_width, image_height, ppi, data)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+# Fitur partisi galeri (core/features.py) di baris history
+_UPDATE_FEATURES_SQL = (
+    "UPDATE history SET " + ", ".join(f"{c} = ?" for c in features.HISTORY_FEATURE_COLUMNS) + " WHERE id = ?"
+)
+# Tanpa hasil CoreNet (import, backfill): hanya kolom kelas, titik singular tidak disentuh
+_UPDATE_CLASS_SQL = (
+    "UPDATE history SET " + ", ".join(f"{c} = ?" for c in features.CLASS_COLUMNS + ("dominant_class",))
+    + " WHERE id = ?"
+)
+
+
+def _template_row(history_id, tpl):
+    return (history_id, template.TEMPLATE_FORMAT_VERSION, len(tpl.minutiae),
+            tpl.width, tpl.height, tpl.ppi, template.encode(tpl.minutiae))
+
+
+def _features_row(history_id, tpl, singular=None):
+    core, delta = singular if singular is not None else (None, None)
+    return features.history_features(tpl.minutiae, core, delta) + (history_id,)
+
+
+def _class_row(history_id, minutiae):
+    distribution = features.class_distribution(minutiae)
+    return tuple(float(p) for p in distribution) + (features.dominant_class(distribution), history_id)
+
+
+def _insert_template(cursor, history_id, tpl, singular=None):
+    cursor.execute(_INSERT_TEMPLATE_SQL, _template_row(history_id, tpl))
+    cursor.execute(_UPDATE_FEATURES_SQL, _features_row(history_id, tpl, singular))
+
+
+def save_template(history_id, tpl, singular=None):
+    """
+    Simpan/ganti template minutiae (core.template.Template) milik satu
+    riwayat beserta fitur partisinya (distribusi kelas, titik core/delta).
+    """
+    if tpl is None:
+        return False
+    conn = get_db_connection()
+    try:
+        with conn:
+            _insert_template(conn.cursor(), history_id, tpl, singular)
+        return True
+    except Exception as e:
+        print(f"Error saving template for history ID {history_id}: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def load_template(history_id):
+    """
+    Template minutiae satu riwayat (array di-decode tanpa salinan dari BLOB),
+    atau None jika riwayat belum punya template (data lama).
+    """
+    conn = get_db_connection()
+    try:
+        row = conn.execute(
+            "SELECT format_version, image_width, image_height, ppi, data FROM minutiae_template WHERE history_id = ?",
+            (history_id,),
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None or row["format_version"] != template.TEMPLATE_FORMAT_VERSION:
+        return None
+    return template.Template(template.decode(row["data"]), row["image_width"], row["image_height"], row["ppi"])
+
+
+def _gallery_filter(user_id=None, dominant_class=None, exclude_ids=()):
+    """WHERE (alias h = history, t = minutiae_template) untuk template galeri."""
+    where, params = ["t.format_version = ?"], [template.TEMPLATE_FORMAT_VERSION]
+    if user_id is not None:
+        where.append("h.user_id = ?")
+        params.append(user_id)
+    if dominant_class is not None:
+        where.append("h.dominant_class = ?")
+        params.append(int(dominant_class))
+    exclude_ids = [int(i) for i in exclude_ids if i is not None]
+    if exclude_ids:
+        where.append(f"h.id NOT IN ({', '.join('?' * len(exclude_ids))})")
+        params.extend(exclude_ids)
+    return where, params
+
+
+def load_template_gallery(user_id=None, history_ids=None, dominant_class=None, exclude_ids=()):
+    """
+    Muat banyak template sekaligus (satu query, satu buffer) sebagai
+    core.template.TemplateGallery, diurutkan menurut history_id.
+    Filter opsional: pemilik riwayat, kelas dominan (partisi
+    idx_history_class), daftar history_id dan/atau history_id yang dilewati.
+    """
+    where, params = _gallery_filter(user_id, dominant_class, exclude_ids)
+    if history_ids is not None:
+        history_ids = [int(i) for i in history_ids]
+        if not history_ids:
+            return template.build_gallery([])
+        where.append(f"t.history_id IN ({', '.join('?' * len(history_ids))})")
+        params.extend(history_ids)
+    sql = (
+        "SELECT t.history_id, t.data, t.image_width, t.image_height, t.ppi FROM minutiae_template t "
+        "JOIN history h ON h.id = t.history_id WHERE " + " AND ".join(where) + " ORDER BY t.history_id"
+    )
+    conn = get_db_connection()
+    try:
+        return template.build_gallery(tuple(row) for row in conn.execute(sql, params))
+    finally:
+        conn.close()
+
+
+def iter_history_templates(start_id=None, end_id=None, user_id=None, batch_size=500):
+    """
+    Streaming template per riwayat untuk ekspor massal: yield
+    (history_id, judul_kasus, quality_score, Template) berurutan menurut ID.
+    Baris diambil per `batch_size` (fetchmany), jadi rentang riwayat sebesar
+    apa pun tidak dimuat sekaligus ke memori.
+    """
+    where, params = ["t.format_version = ?"], [template.TEMPLATE_FORMAT_VERSION]
+    if start_id is not None:
+        where.append("t.history_id >= ?")
+        params.append(int(start_id))
+    if end_id is not None:
+        where.append("t.history_id <= ?")
+        params.append(int(end_id))
+    if user_id is not None:
+        where.append("h.user_id = ?")
+        params.append(user_id)
+    sql = (
+        "SELECT t.history_id, h.judul_kasus, h.quality_score, t.image_width, t.image_height, t.ppi, t.data "
+        "FROM minutiae_template t JOIN history h ON h.id = t.history_id "
+        "WHERE " + " AND ".join(where) + " ORDER BY t.history_id"
+    )
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield (
+                    row["history_id"], row["judul_kasus"], row["quality_score"],
+                    template.Template(template.decode(row["data"]), row["image_width"], row["image_height"],
+                                      row["ppi"]),
+                )
+    finally:
+        conn.close()
+
+
+def import_templates(items, user_id):
+    """
+    Masukkan template dari luar (mis. record ISO/ANSI) ke galeri sebagai
+    riwayat tanpa gambar (path_mentah/path_ekstraksi kosong).
+    items: list (judul_kasus, Template, quality_score atau None).
+
+    Semua baris history dan template ditulis dengan executemany dalam satu
+    transaksi. Return: list history_id sesuai urutan items.
+    """
+    if not items:
+        return []
+    conn = get_db_connection()
+    try:
+        with conn:
+            # BEGIN IMMEDIATE: tidak ada penulis lain, jadi ID baru berurutan setelah last_id
+            conn.execute("BEGIN IMMEDIATE")
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM history").fetchone()[0]
+            conn.executemany(
+                '''
+                INSERT INTO history (judul_kasus, nomor_lp, tanggal_kejadian, path_mentah, path_ekstraksi, user_id,
+                                     minutiae_count, quality_score)
+                VALUES (?, NULL, NULL, '', '', ?, ?, ?)
+                ''',
+                [(judul, user_id, len(tpl.minutiae), quality) for judul, tpl, quality in items],
+            )
+            ids = [row[0] for row in conn.execute("SELECT id FROM history WHERE id > ? ORDER BY id", (last_id,))]
+            if len(ids) != len(items):
+                raise RuntimeError("Jumlah ID riwayat hasil import tidak sesuai")
+            conn.executemany(
+                _INSERT_TEMPLATE_SQL,
+                [_template_row(hid, tpl) for hid, (_, tpl, _) in zip(ids, items)],
+            )
+            conn.executemany(
+                _UPDATE_CLASS_SQL,
+                [_class_row(hid, tpl.minutiae) for hid, (_, tpl, _) in zip(ids, items)],
+            )
+        return ids
+    finally:
+        conn.close()
+
+
+def get_history_by_quality(min_score=None, user_id=None, limit=None, ascending=False):
+    """
+    Riwayat diurutkan berdasarkan skor kualitas (terbaik dulu; ascending=True
+    untuk terburuk dulu). Baris tanpa skor (data lama) ditaruh paling akhir.
+    Return: list sqlite3.Row (id, judul_kasus, path_mentah, path_ekstraksi,
+    minutiae_count, quality_score).
+    """
+    where, params = [], []
+    if min_score is not None:
+        where.append("quality_score >= ?")
+        params.append(min_score)
+    if user_id is not None:
+        where.append("user_id = ?")
+        params.append(user_id)
+    sql = (
+        "SELECT id, judul_kasus, path_mentah, path_ekstraksi, minutiae_count, quality_score FROM history"
+        + (" WHERE " + " AND ".join(where) if where else "")
+        + f" ORDER BY quality_score IS NULL, quality_score {'ASC' if ascending else 'DESC'}"
+    )
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    conn = get_db_connection()
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def get_history_by_features(dominant_class=None, user_id=None, min_core_score=None, limit=None):
+    """
+    Partisi galeri berdasarkan fitur tersimpan (indeks idx_history_class /
+    idx_history_core): kelas minutiae dominan (indeks MINUTIAE_CLASS_NAMES)
+    dan/atau titik core dengan skor >= min_core_score.
+    Return: list sqlite3.Row (id, judul_kasus, minutiae_count, dominant_class,
+    class_*, core_x, core_y, core_score, delta_x, delta_y), urut menurut id.
+    """
+    where, params = [], []
+    if dominant_class is not None:
+        where.append("dominant_class = ?")
+        params.append(int(dominant_class))
+    if user_id is not None:
+        where.append("user_id = ?")
+        params.append(user_id)
+    if min_core_score is not None:
+        where.append("core_score >= ?")
+        params.append(float(min_core_score))
+    sql = (
+        "SELECT id, judul_kasus, minutiae_count, " + ", ".join(features.HISTORY_FEATURE_COLUMNS) + " FROM history"
+        + (" WHERE " + " AND ".join(where) if where else "")
+        + " ORDER BY id"
+    )
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    conn = get_db_connection()
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def search_similar(query_tpl, core_point=None, top_k=None, user_id=None, dominant_class=None, exclude_ids=()):
+    """
+    Pencocokan 1:N: bandingkan template query (core.template.Template) dengan
+    semua template tersimpan, dengan alignment pada titik core bila query dan
+    riwayat galeri sama-sama punya core. Galeri bisa dipersempit dengan
+    user_id dan/atau dominant_class (partisi idx_history_class). Koordinat
+    query & galeri dinormalkan lewat ppi template (core/matching.py).
+
+    Return: list dict (history_id, judul_kasus, nomor_lp, tanggal_kejadian,
+    score, matched), skor tertinggi dulu, maksimal top_k (default MATCH_TOP_K).
+    Riwayat di exclude_ids (mis. riwayat query itu sendiri) dilewati.
+    """
+    top_k = MATCH_TOP_K if top_k is None else top_k
+    if query_tpl is None or len(query_tpl.minutiae) == 0:
+        return []
+    gallery = load_template_gallery(user_id, dominant_class=dominant_class, exclude_ids=exclude_ids)
+    if len(gallery.history_ids) == 0:
+        return []
+
+    gallery_cores = None
+    if core_point is not None:
+        # Filter yang sama dengan galeri: biaya sebanding galeri, bukan seluruh tabel
+        where, params = _gallery_filter(user_id, dominant_class, exclude_ids)
+        conn = get_db_connection()
+        try:
+            rows = conn.execute(
+                "SELECT h.id, h.core_x, h.core_y FROM minutiae_template t JOIN history h ON h.id = t.history_id "
+                "WHERE h.core_x IS NOT NULL AND h.core_y IS NOT NULL AND " + " AND ".join(where),
+                params,
+            ).fetchall()
+        finally:
+            conn.close()
+        # Core per template galeri (NaN jika tidak diketahui); gallery.history_ids terurut
+        gallery_cores = np.full((len(gallery.history_ids), 2), np.nan)
+        if rows:
+            ids = np.array([row["id"] for row in rows], dtype=np.int64)
+            cores = np.array([(row["core_x"], row["core_y"]) for row in rows], dtype=np.float64)
+            pos = np.minimum(np.searchsorted(gallery.history_ids, ids), len(gallery.history_ids) - 1)
+            found = gallery.history_ids[pos] == ids
+            gallery_cores[pos[found]] = cores[found]
+
+    candidates = matching.search(query_tpl.minutiae, gallery, top_k, core_point, gallery_cores,
+                                 query_ppi=query_tpl.ppi)
+    if not candidates:
+        return []
+
+    conn = get_db_connection()
+    try:
+        ids = [c.history_id for c in candidates]
+        rows = {
+            row["id"]: row for row in conn.execute(
+                f"SELECT id, judul_kasus, nomor_lp, tanggal_kejadian FROM history "
+                f"WHERE id IN ({', '.join('?' * len(ids))})", ids,
+            )
+        }
+    finally:
+        conn.close()
+    return [
+        {
+            "history_id": c.history_id,
+            "judul_kasus": rows[c.history_id]["judul_kasus"],
+            "nomor_lp": rows[c.history_id]["nomor_lp"],
+            "tanggal_kejadian": rows[c.history_id]["tanggal_kejadian"],
+            "score": c.score,
+            "matched": c.matched,
+        }
+        for c in candidates if c.history_id in rows
+    ]
+
+
 def fetch_history_by_id(history_id):
     """Mengambil detail satu entri riwayat berdasarkan ID."""
     conn = get_db_connection()
@@ -579,6 +1835,7 @@ def delete_history(history_id, path_mentah=None, path_ekstraksi=None):
     cursor = conn.cursor()
     try:
         # Hapus data pada database
+        cursor.execute("DELETE FROM minutiae_template WHERE history_id = ?", (history_id,))
         cursor.execute("DELETE FROM history WHERE id = ?", (history_id,))
         conn.commit()
         conn.close()
@@ -604,15 +1861,11 @@ def delete_history(history_id, path_mentah=None, path_ekstraksi=None):
         conn.close()
         return False
 
-def move_and_rename_history_images(history_id, old_path_mentah, old_path_ekstraksi):
+def _move_history_files(history_id, old_path_mentah, old_path_ekstraksi):
     """
-    Pindahkan dan rename file gambar mentah & ekstraksi
-    ke folder:
-      - data_kasus/mentah/ID_mentah.png
-      - data_kasus/ekstraksi/ID_ekstraksi.png
-    lalu update path di tabel history.
-
-    Return: (final_path_mentah, final_path_ekstraksi)
+    Pindahkan & rename file ke data_kasus/mentah/ID_mentah.png dan
+    data_kasus/ekstraksi/ID_ekstraksi.png (tanpa menyentuh database).
+    Return: (new_mentah, new_ekstraksi); None untuk file yang gagal dipindah.
     """
     # Pastikan folder tujuan tetap ada (jaga-jaga)
     os.makedirs(MENTAH_DIR, exist_ok=True)
@@ -641,19 +1894,34 @@ def move_and_rename_history_images(history_id, old_path_mentah, old_path_ekstrak
             print(f"WARNING: gagal memindahkan file ekstraksi: {e}")
             new_ekstraksi = None
 
+    return new_mentah, new_ekstraksi
+
+
+_UPDATE_HISTORY_PATHS_SQL = """
+    UPDATE history
+    SET path_mentah   = COALESCE(?, path_mentah),
+        path_ekstraksi = COALESCE(?, path_ekstraksi)
+    WHERE id = ?
+"""
+
+
+def move_and_rename_history_images(history_id, old_path_mentah, old_path_ekstraksi):
+    """
+    Pindahkan dan rename file gambar mentah & ekstraksi
+    ke folder:
+      - data_kasus/mentah/ID_mentah.png
+      - data_kasus/ekstraksi/ID_ekstraksi.png
+    lalu update path di tabel history.
+
+    Return: (final_path_mentah, final_path_ekstraksi)
+    """
+    new_mentah, new_ekstraksi = _move_history_files(history_id, old_path_mentah, old_path_ekstraksi)
+
     # --- Update path di database ---
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute(
-            """
-            UPDATE history
-            SET path_mentah   = COALESCE(?, path_mentah),
-                path_ekstraksi = COALESCE(?, path_ekstraksi)
-            WHERE id = ?
-            """,
-            (new_mentah, new_ekstraksi, history_id),
-        )
+        cursor.execute(_UPDATE_HISTORY_PATHS_SQL, (new_mentah, new_ekstraksi, history_id))
         conn.commit()
     except Exception as e:
         print(f"WARNING: gagal update path history ID {history_id}: {e}")
@@ -666,8 +1934,337 @@ def move_and_rename_history_images(history_id, old_path_mentah, old_path_ekstrak
     return final_mentah, final_ekstraksi
 
 
+# =========================================================================
+# --- RIWAYAT MASSAL & PROGRES BATCH (HEADLESS) ---
+# =========================================================================
+
+def save_history_bulk(entries, user_id, batch_run=None):
+    """
+    Simpan banyak hasil ekstraksi sekaligus.
+
+    entries: list dict berisi judul_kasus, nomor_lp, tanggal_kejadian,
+    path_mentah, path_ekstraksi, minutiae_count, quality_score, template
+    (opsional, core.template.Template), singular (opsional, (core_point,
+    delta_point)) dan (jika batch_run diisi) input_path.
+
+    Semua baris history (+ status 'done' di batch_progress) ditulis dalam
+    SATU transaksi; setelah commit, file dipindah ke nama berbasis ID dan
+    path-nya di-update dengan satu executemany.
+    Return: list (history_id, path_mentah, path_ekstraksi) sesuai urutan entries.
+    """
+    if not entries:
+        return []
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        ids = []
+        with conn:
+            for e in entries:
+                cursor.execute('''
+                    INSERT INTO history (judul_kasus, nomor_lp, tanggal_kejadian, path_mentah, path_ekstraksi, user_id,
+                                         minutiae_count, quality_score)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (e["judul_kasus"], e.get("nomor_lp"), e.get("tanggal_kejadian"), e["path_mentah"],
+                      e["path_ekstraksi"], user_id, e.get("minutiae_count"), e.get("quality_score")))
+                ids.append(cursor.lastrowid)
+            template_rows = [
+                _template_row(hid, e["template"]) for e, hid in zip(entries, ids) if e.get("template") is not None
+            ]
+            if template_rows:
+                cursor.executemany(_INSERT_TEMPLATE_SQL, template_rows)
+                cursor.executemany(_UPDATE_FEATURES_SQL, [
+                    _features_row(hid, e["template"], e.get("singular"))
+                    for e, hid in zip(entries, ids) if e.get("template") is not None
+                ])
+            if batch_run is not None:
+                cursor.executemany(
+                    "INSERT OR REPLACE INTO batch_progress (run_name, input_path, status, history_id, error) "
+                    "VALUES (?, ?, 'done', ?, NULL)",
+                    [(batch_run, e["input_path"], hid) for e, hid in zip(entries, ids)],
+                )
+
+        moved = [
+            _move_history_files(hid, e["path_mentah"], e["path_ekstraksi"])
+            for e, hid in zip(entries, ids)
+        ]
+        with conn:
+            cursor.executemany(
+                _UPDATE_HISTORY_PATHS_SQL,
+                [(m, x, hid) for (m, x), hid in zip(moved, ids)],
+            )
+    finally:
+        conn.close()
+
+    return [
+        (hid, m or e["path_mentah"], x or e["path_ekstraksi"])
+        for e, hid, (m, x) in zip(entries, ids, moved)
+    ]
+
+
+def record_batch_status(batch_run, items):
+    """
+    Catat status file yang tidak menghasilkan history.
+    items: list (input_path, status, error), status mis. 'failed' / 'rejected'.
+    """
+    if not items:
+        return
+    conn = get_db_connection()
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO batch_progress (run_name, input_path, status, history_id, error) "
+                "VALUES (?, ?, ?, NULL, ?)",
+                [(batch_run, path, status, error) for path, status, error in items],
+            )
+    finally:
+        conn.close()
+
+
+def get_batch_progress(batch_run):
+    """Return: dict input_path -> status untuk satu run batch."""
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(
+            "SELECT input_path, status FROM batch_progress WHERE run_name = ?", (batch_run,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return {row["input_path"]: row["status"] for row in rows}
+
+
+def get_user_id_by_username(username):
+    """ID user berdasarkan username, atau None jika tidak ada."""
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+    finally:
+        conn.close()
+    return row["id"] if row else None
+
+
 # Inisialisasi DB saat modul dimuat (opsional, tapi disarankan)
 
+# =========================================================================
+# --- ANTREAN JOB EKSTRAKSI PERSISTEN ---
+# =========================================================================
+
+def enqueue_extraction_job(input_path, judul_kasus, user_id, nomor_lp=None, tanggal_kejadian=None, priority=0,
+                           min_quality=None, max_attempts=None, owner=None, lease_seconds=None):
+    """
+    Tambahkan job ekstraksi ke antrean. Return: ID job.
+
+    Jika `owner` diisi, job langsung dicatat 'running' dengan lease milik
+    owner tersebut (dipakai GUI yang memproses job-nya sendiri); jika proses
+    itu mati, job dipulihkan ke antrean oleh recover_orphaned_jobs().
+    """
+    max_attempts = JOB_MAX_ATTEMPTS if max_attempts is None else max_attempts
+    if owner is None:
+        state, attempts, lease_expires = JOB_QUEUED, 0, None
+    else:
+        state, attempts = JOB_RUNNING, 1
+        lease_expires = time.time() + (lease_seconds or JOB_LEASE_SECONDS)
+    conn = get_db_connection()
+    try:
+        with conn:
+            cursor = conn.execute(
+                '''
+                INSERT INTO extraction_jobs (input_path, judul_kasus, nomor_lp, tanggal_kejadian, user_id, min_quality,
+                                             state, priority, attempts, max_attempts, lease_owner, lease_expires)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (input_path, judul_kasus, nomor_lp, tanggal_kejadian, user_id, min_quality,
+                 state, priority, attempts, max_attempts, owner, lease_expires),
+            )
+            return cursor.lastrowid
+    finally:
+        conn.close()
+
+
+def claim_extraction_jobs(owner, limit=1, lease_seconds=None):
+    """
+    Ambil sampai `limit` job 'queued' (prioritas tertinggi, lalu terlama)
+    secara atomik dan tandai 'running' dengan lease milik `owner`.
+    Return: list sqlite3.Row job yang berhasil diambil.
+    """
+    if limit <= 0:
+        return []
+    lease_expires = time.time() + (lease_seconds or JOB_LEASE_SECONDS)
+    conn = get_db_connection()
+    try:
+        with conn:
+            # BEGIN IMMEDIATE: dua scheduler tidak bisa mengambil job yang sama
+            conn.execute("BEGIN IMMEDIATE")
+            ids = [
+                row[0] for row in conn.execute(
+                    "SELECT id FROM extraction_jobs WHERE state = ? ORDER BY priority DESC, id LIMIT ?",
+                    (JOB_QUEUED, int(limit)),
+                )
+            ]
+            if not ids:
+                return []
+            marks = ", ".join("?" * len(ids))
+            conn.execute(
+                f"UPDATE extraction_jobs SET state = ?, attempts = attempts + 1, lease_owner = ?, "
+                f"lease_expires = ?, error = NULL, updated_at = CURRENT_TIMESTAMP WHERE id IN ({marks})",
+                [JOB_RUNNING, owner, lease_expires] + ids,
+            )
+            return conn.execute(
+                f"SELECT * FROM extraction_jobs WHERE id IN ({marks}) ORDER BY priority DESC, id", ids
+            ).fetchall()
+    finally:
+        conn.close()
+
+
+def renew_job_leases(owner, job_ids, lease_seconds=None):
+    """Perpanjang lease job yang masih diproses `owner` (heartbeat)."""
+    job_ids = list(job_ids)
+    if not job_ids:
+        return
+    lease_expires = time.time() + (lease_seconds or JOB_LEASE_SECONDS)
+    conn = get_db_connection()
+    try:
+        with conn:
+            conn.executemany(
+                "UPDATE extraction_jobs SET lease_expires = ? WHERE id = ? AND state = ? AND lease_owner = ?",
+                [(lease_expires, job_id, JOB_RUNNING, owner) for job_id in job_ids],
+            )
+    finally:
+        conn.close()
+
+
+_FINISH_JOB_SQL = """
+    UPDATE extraction_jobs
+    SET state = ?, history_id = ?, error = ?, lease_owner = NULL, lease_expires = NULL,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = ? AND state = 'running' AND lease_owner = ?
+"""
+
+
+class _LeaseLost(Exception):
+    """Lease job sudah diambil alih proses lain; transaksi dibatalkan."""
+
+
+def complete_extraction_job(job, owner, result):
+    """
+    Simpan hasil ekstraksi job sebagai riwayat (+ template) dan tandai job
+    'done' dalam SATU transaksi, lalu pindahkan file ke nama berbasis ID.
+    job: baris extraction_jobs; result: core.jobs.ExtractionResult.
+    Return: (history_id, path_mentah, path_ekstraksi), atau None jika lease
+    job sudah tidak dimiliki `owner` (job diambil alih proses lain).
+    """
+    conn = get_db_connection()
+    try:
+        with conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO history (judul_kasus, nomor_lp, tanggal_kejadian, path_mentah, path_ekstraksi, user_id,
+                                     minutiae_count, quality_score)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (job["judul_kasus"], job["nomor_lp"], job["tanggal_kejadian"], result.path_mentah,
+                  result.path_ekstraksi, job["user_id"], result.minutiae_count,
+                  result.quality_score))
+            history_id = cursor.lastrowid
+            if result.template is not None:
+                _insert_template(cursor, history_id, result.template,
+                                 (result.core_point, result.delta_point))
+            cursor.execute(_FINISH_JOB_SQL, (JOB_DONE, history_id, None, job["id"], owner))
+            if cursor.rowcount == 0:
+                raise _LeaseLost()
+    except _LeaseLost:
+        print(f"WARNING: lease job #{job['id']} sudah lepas, hasil tidak disimpan.")
+        _remove_files(result.path_mentah, result.path_ekstraksi)
+        return None
+    finally:
+        conn.close()
+
+    path_mentah, path_ekstraksi = move_and_rename_history_images(
+        history_id, result.path_mentah, result.path_ekstraksi
+    )
+    return history_id, path_mentah, path_ekstraksi
+
+
+def fail_extraction_job(job_id, owner, error, retry=True):
+    """
+    Catat kegagalan job. Jika retry dan percobaan belum habis, job kembali
+    'queued'; selain itu 'failed'. Return: state baru job.
+    """
+    conn = get_db_connection()
+    try:
+        with conn:
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM extraction_jobs WHERE id = ? AND state = ? AND lease_owner = ?",
+                (job_id, JOB_RUNNING, owner),
+            ).fetchone()
+            if row is None:
+                return None
+            state = JOB_QUEUED if retry and row["attempts"] < row["max_attempts"] else JOB_FAILED
+            conn.execute(_FINISH_JOB_SQL, (state, None, error, job_id, owner))
+            return state
+    finally:
+        conn.close()
+
+
+def recover_orphaned_jobs(now=None):
+    """
+    Kembalikan job 'running' yang lease-nya habis (prosesnya mati/crash) ke
+    antrean, atau 'failed' jika percobaannya sudah habis.
+    Return: jumlah job yang dipulihkan.
+    """
+    now = time.time() if now is None else now
+    conn = get_db_connection()
+    try:
+        with conn:
+            cursor = conn.execute(
+                """
+                UPDATE extraction_jobs
+                SET state = CASE WHEN attempts < max_attempts THEN ? ELSE ? END,
+                    error = 'Proses berhenti saat job berjalan (lease habis)',
+                    lease_owner = NULL, lease_expires = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE state = ? AND (lease_expires IS NULL OR lease_expires < ?)
+                """,
+                (JOB_QUEUED, JOB_FAILED, JOB_RUNNING, now),
+            )
+            return cursor.rowcount
+    finally:
+        conn.close()
+
+
+def get_extraction_job_counts():
+    """Jumlah job per state, mis. {'queued': 3, 'running': 1, 'done': 10, 'failed': 0}."""
+    counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_DONE: 0, JOB_FAILED: 0}
+    conn = get_db_connection()
+    try:
+        for row in conn.execute("SELECT state, COUNT(*) FROM extraction_jobs GROUP BY state"):
+            counts[row[0]] = row[1]
+    finally:
+        conn.close()
+    return counts
+
+
+def get_extraction_job(job_id):
+    """Satu baris extraction_jobs berdasarkan ID, atau None."""
+    conn = get_db_connection()
+    try:
+        return conn.execute("SELECT * FROM extraction_jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+
+
+def get_extraction_jobs(state=None, limit=100):
+    """Daftar job (terbaru dulu), opsional difilter state."""
+    sql, params = "SELECT * FROM extraction_jobs", []
+    if state is not None:
+        sql += " WHERE state = ?"
+        params.append(state)
+    sql += " ORDER BY id DESC LIMIT ?"
+    params.append(int(limit))
+    conn = get_db_connection()
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
 def force_admin_fix():
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -784,6 +2381,10 @@ def delete_user_and_history(user_id):
     cursor = conn.cursor()
     try:
         # delete history entries by user_id (assuming history table has user_id column)
+        cursor.execute(
+            "DELETE FROM minutiae_template WHERE history_id IN (SELECT id FROM history WHERE user_id = ?)",
+            (user_id,),
+        )
         cursor.execute("DELETE FROM history WHERE user_id = ?", (user_id,))
         # delete user
         cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
@@ -794,8 +2395,3 @@ def delete_user_and_history(user_id):
         conn.close()
         print('[db_manager] delete_user_and_history error:', e)
         return False
-# -------------------------------------------------------
-def get_minutiae_count():
-    """Mengembalikan jumlah minutiae dari ekstraksi terakhir."""
-    global MINUTIAE_COUNT
-    return MINUTIAE_COUNT
@@ -0,0 +1,155 @@
+import os
+import multiprocessing
+import signal
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from core.jobs import ExtractionResult
+
+# =========================================================================
+# --- ENGINE EKSTRAKSI BERBASIS PROCESS POOL ---
+# =========================================================================
+#
+# Setiap worker adalah proses terpisah dengan interpreter, GIL dan graph
+# TensorFlow sendiri. Model FingerFlow dimuat sekali per worker (lewat
+# ExtractorManager di proses tsb) lalu dipakai untuk semua job berikutnya.
+# Perkiraan memori: ~1 GB per worker setelah keempat model dimuat.
+
+
+def default_worker_count(intra_op_threads=2):
+    """Jumlah worker default: semua core dibagi jumlah thread per worker."""
+    cpu = os.cpu_count() or 1
+    return max(1, cpu // max(1, intra_op_threads))
+
+
+def _init_worker(intra_op_threads, warm_up):
+    """Dijalankan sekali di setiap proses worker sebelum job pertama."""
+    # Ctrl+C ditangani proses induk (mis. batch_extract.py berhenti rapi);
+    # worker tidak ikut mati di tengah job
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Batasi thread BLAS/OpenMP/TF supaya worker tidak saling berebut core
+    threads = str(intra_op_threads)
+    os.environ["OMP_NUM_THREADS"] = threads
+    os.environ["TF_NUM_INTRAOP_THREADS"] = threads
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    try:
+        import cv2
+        cv2.setNumThreads(intra_op_threads)
+    except Exception:
+        pass
+    try:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except Exception as e:
+        print(f"[engine] WARNING: gagal mengatur thread TensorFlow: {e}")
+
+    if warm_up:
+        import db_manager
+        try:
+            manager = db_manager.get_extractor_manager()
+            manager.load()
+            # Trace bucket input yang dihasilkan pipeline sebelum job pertama (latensi stabil)
+            manager.trace_shapes()
+        except Exception as e:
+            # Job pertama akan mencoba lagi dan melaporkan error-nya
+            print(f"[engine] WARNING: worker gagal memuat model: {e}")
+
+
+def _run_job(input_filepath, case_judul, min_quality=None):
+    """Satu job ekstraksi di dalam proses worker."""
+    import db_manager
+
+    try:
+        return db_manager.run_minutiae_extraction(input_filepath, case_judul, min_quality=min_quality)
+    except Exception as e:
+        # Ditolak gerbang kualitas / dibatalkan / error lain: tetap satu hasil per job
+        return ExtractionResult(input_filepath, quality_score=getattr(e, "score", None), error=str(e))
+
+
+class ExtractionEngine:
+    """
+    Process pool untuk ekstraksi minutiae paralel di banyak core CPU.
+
+        with ExtractionEngine(max_workers=8, intra_op_threads=2) as engine:
+            results = engine.map(paths, "Kasus A")
+
+    Hasil map() selalu berurutan sesuai urutan submit.
+    """
+
+    def __init__(self, max_workers=None, intra_op_threads=2, warm_up=True):
+        self.intra_op_threads = max(1, int(intra_op_threads))
+        self.max_workers = max_workers or default_worker_count(self.intra_op_threads)
+        # 'spawn': proses anak tidak mewarisi state TensorFlow/thread dari induk
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.intra_op_threads, warm_up),
+        )
+
+    def submit(self, input_filepath, case_judul, min_quality=None):
+        """Kirim satu job; mengembalikan Future berisi ExtractionResult."""
+        return self._executor.submit(_run_job, input_filepath, case_judul, min_quality)
+
+    def map(self, input_filepaths, case_judul, progress_callback=None, cancel_token=None, min_quality=None):
+        """
+        Jalankan banyak job sekaligus. case_judul boleh string tunggal atau
+        list per file. progress_callback(done, total) dipanggil tiap job selesai.
+        Jika cancel_token (core.jobs.CancelToken) dibatalkan, job yang belum
+        mulai dibatalkan dan dilaporkan dengan error "Dibatalkan"; job yang
+        sedang berjalan di worker tetap diselesaikan.
+        """
+        input_filepaths = list(input_filepaths)
+        if isinstance(case_judul, str):
+            juduls = [case_judul] * len(input_filepaths)
+        else:
+            juduls = list(case_judul)
+        if len(juduls) != len(input_filepaths):
+            raise ValueError("Jumlah judul kasus harus sama dengan jumlah gambar")
+
+        futures = [self.submit(p, j, min_quality) for p, j in zip(input_filepaths, juduls)]
+        total = len(futures)
+        done = [0]
+
+        def _on_done(_):
+            done[0] += 1
+            if progress_callback is not None:
+                try:
+                    progress_callback(done[0], total)
+                except Exception:
+                    pass
+
+        for f in futures:
+            f.add_done_callback(_on_done)
+
+        def _failed(path, error):
+            return ExtractionResult(path, error=error)
+
+        results = []
+        for path, f in zip(input_filepaths, futures):
+            while True:
+                if cancel_token is not None and cancel_token.cancelled:
+                    for pending in futures:
+                        pending.cancel()
+                try:
+                    results.append(f.result(timeout=0.25 if cancel_token is not None else None))
+                except FutureTimeout:
+                    continue
+                except CancelledError:
+                    results.append(_failed(path, "Dibatalkan"))
+                except Exception as e:
+                    # Worker mati (mis. crash native) -> laporkan per job
+                    results.append(_failed(path, f"Worker gagal: {e}"))
+                break
+        return results
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(wait=True)
+        return False
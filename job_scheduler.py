@@ -0,0 +1,340 @@
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import db_manager
+from core.jobs import ExtractionResult
+
+# =========================================================================
+# --- SCHEDULER ANTREAN JOB EKSTRAKSI (TABEL extraction_jobs) ---
+# =========================================================================
+#
+#   python job_scheduler.py enqueue scan/*.png --judul "Kasus A" --priority 5
+#   python job_scheduler.py run --workers 4          # layanan, Ctrl+C untuk berhenti
+#   python job_scheduler.py run --drain              # proses sampai antrean kosong
+#   python job_scheduler.py status
+#
+# Alur: recover_orphaned_jobs() saat mulai → klaim job 'queued' sebanyak slot
+# worker yang kosong (BEGIN IMMEDIATE, prioritas tertinggi dulu) → worker
+# ExtractionEngine (atau thread di proses ini) → riwayat + status 'done'
+# ditulis dalam satu transaksi. Selama job berjalan lease-nya diperpanjang
+# oleh LeaseKeeper; job milik proses yang crash dipulihkan setelah lease habis.
+
+
+def default_owner(prefix="scheduler"):
+    """Identitas pemegang lease: jenis proses + host + PID."""
+    return f"{prefix}:{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseKeeper:
+    """
+    Thread heartbeat yang memperpanjang lease semua job milik `owner` yang
+    sedang diproses, setiap sepertiga durasi lease.
+    """
+
+    def __init__(self, owner, lease_seconds=None):
+        self.owner = owner
+        self.lease_seconds = lease_seconds or db_manager.JOB_LEASE_SECONDS
+        self._ids = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, job_id):
+        with self._lock:
+            self._ids.add(job_id)
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="job-lease", daemon=True)
+                self._thread.start()
+
+    def discard(self, job_id):
+        with self._lock:
+            self._ids.discard(job_id)
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3.0):
+            with self._lock:
+                ids = list(self._ids)
+            if not ids:
+                continue
+            try:
+                db_manager.renew_job_leases(self.owner, ids, self.lease_seconds)
+            except Exception as e:
+                print(f"[jobs] WARNING: gagal memperpanjang lease: {e}")
+
+
+def _is_rejected(result, min_quality):
+    threshold = db_manager.QUALITY_MIN_SCORE if min_quality is None else min_quality
+    return (
+        db_manager.QUALITY_GATE_ENABLED
+        and result.quality_score is not None
+        and result.quality_score < threshold
+    )
+
+
+class JobScheduler:
+    """
+    Menarik job dari tabel extraction_jobs ke worker ekstraksi.
+
+    - in_process=False: ExtractionEngine (process pool, max_workers proses).
+    - in_process=True : satu thread di proses ini, memakai model yang sama
+      dengan GUI (dipakai GUI untuk melanjutkan job setelah crash).
+    """
+
+    def __init__(self, max_workers=None, intra_op_threads=2, in_process=False, lease_seconds=None,
+                 poll_interval=1.0, owner=None):
+        self.max_workers = max_workers
+        self.intra_op_threads = intra_op_threads
+        self.in_process = in_process
+        self.lease_seconds = lease_seconds or db_manager.JOB_LEASE_SECONDS
+        self.poll_interval = poll_interval
+        self.owner = owner or default_owner()
+
+        self._keeper = LeaseKeeper(self.owner, self.lease_seconds)
+        self._stop = threading.Event()
+        self._idle = threading.Event()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._engine = None
+        self._executor = None
+        self._thread = None
+        self.capacity = 1
+        self.stats = {"done": 0, "failed": 0, "retried": 0}
+
+    # ---- siklus hidup ----
+    def start(self):
+        recovered = db_manager.recover_orphaned_jobs()
+        if recovered:
+            print(f"[jobs] {recovered} job yatim (proses sebelumnya berhenti) dikembalikan ke antrean.")
+        if self.in_process:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-worker")
+            self.capacity = 1
+        else:
+            from extraction_engine import ExtractionEngine
+            self._engine = ExtractionEngine(max_workers=self.max_workers, intra_op_threads=self.intra_op_threads)
+            # Satu job cadangan per worker supaya worker tidak menunggu klaim berikutnya
+            self.capacity = self._engine.max_workers * 2
+        self._thread = threading.Thread(target=self._dispatch_loop, name="job-dispatch", daemon=True)
+        self._thread.start()
+        print(f"[jobs] Scheduler {self.owner} berjalan, kapasitas {self.capacity} job.")
+
+    def request_stop(self):
+        """Berhenti mengambil job baru (aman dipanggil dari signal handler)."""
+        self._stop.set()
+
+    def stop(self):
+        """Berhenti mengambil job baru dan tunggu job yang sedang berjalan selesai."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._engine is not None:
+            self._engine.shutdown(wait=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self._keeper.stop()
+        print(
+            f"[jobs] Berhenti. {self.stats['done']} selesai, {self.stats['failed']} gagal, "
+            f"{self.stats['retried']} dijadwalkan ulang."
+        )
+
+    def run_forever(self, drain=False):
+        """Jalankan sampai request_stop(); drain=True juga berhenti saat antrean kosong."""
+        self.start()
+        try:
+            while not self._stop.is_set():
+                if drain and self._idle.wait(0.5):
+                    break
+                time.sleep(0.5)
+        finally:
+            self.stop()
+
+    # ---- dispatch ----
+    def _dispatch_loop(self):
+        last_recover = time.monotonic()
+        while not self._stop.is_set():
+            if time.monotonic() - last_recover > self.lease_seconds:
+                db_manager.recover_orphaned_jobs()
+                last_recover = time.monotonic()
+
+            with self._lock:
+                free = self.capacity - len(self._in_flight)
+            jobs = []
+            if free > 0:
+                try:
+                    jobs = db_manager.claim_extraction_jobs(self.owner, free, self.lease_seconds)
+                except Exception as e:
+                    print(f"[jobs] WARNING: gagal mengambil job: {e}")
+            for job in jobs:
+                self._submit(job)
+
+            with self._lock:
+                busy = bool(self._in_flight)
+            if not jobs and not busy:
+                self._idle.set()
+            else:
+                self._idle.clear()
+            if not jobs:
+                self._stop.wait(self.poll_interval)
+
+    def _submit(self, job):
+        from extraction_engine import _run_job
+
+        self._keeper.add(job["id"])
+        with self._lock:
+            self._in_flight[job["id"]] = job
+        if self._engine is not None:
+            future = self._engine.submit(job["input_path"], job["judul_kasus"], job["min_quality"])
+        else:
+            future = self._executor.submit(_run_job, job["input_path"], job["judul_kasus"], job["min_quality"])
+        future.add_done_callback(lambda f, j=job: self._on_done(j, f))
+
+    def _on_done(self, job, future):
+        try:
+            try:
+                result = future.result()
+            except Exception as e:
+                result = ExtractionResult(job["input_path"], error=f"Worker gagal: {e}")
+            self._finish(job, result)
+        except Exception as e:
+            print(f"[jobs] ERROR: job #{job['id']} tidak bisa dicatat: {e}")
+        finally:
+            self._keeper.discard(job["id"])
+            with self._lock:
+                self._in_flight.pop(job["id"], None)
+
+    def _finish(self, job, result):
+        name = os.path.basename(job["input_path"])
+        if result.ok:
+            saved = db_manager.complete_extraction_job(job, self.owner, result)
+            if saved is not None:
+                self.stats["done"] += 1
+                print(f"[jobs] OK     #{job['id']} {name} → riwayat #{saved[0]}")
+            return
+
+        # Gambar ditolak gerbang kualitas tidak akan berhasil jika diulang
+        retry = not _is_rejected(result, job["min_quality"])
+        state = db_manager.fail_extraction_job(job["id"], self.owner, result.error, retry=retry)
+        if state == db_manager.JOB_QUEUED:
+            self.stats["retried"] += 1
+            print(f"[jobs] ULANG  #{job['id']} {name}: {result.error}")
+        else:
+            self.stats["failed"] += 1
+            print(f"[jobs] GAGAL  #{job['id']} {name}: {result.error}")
+
+
+def resume_pending_jobs_async():
+    """
+    Dipanggil GUI setelah login: pulihkan job yatim dan, jika ada job di
+    antrean, proses di thread latar sampai antrean kosong.
+    """
+    def _run():
+        try:
+            db_manager.recover_orphaned_jobs()
+            pending = db_manager.get_extraction_job_counts()[db_manager.JOB_QUEUED]
+            if pending:
+                print(f"[jobs] Melanjutkan {pending} job ekstraksi yang tertunda...")
+                JobScheduler(in_process=True, owner=default_owner("gui-resume")).run_forever(drain=True)
+        except Exception as e:
+            print(f"[jobs] WARNING: gagal melanjutkan job tertunda: {e}")
+
+    t = threading.Thread(target=_run, name="job-resume", daemon=True)
+    t.start()
+    return t
+
+
+# -------------------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------------------
+
+def _cmd_enqueue(args):
+    from batch_extract import BatchItem, collect_items
+
+    user_id = db_manager.get_user_id_by_username(args.user)
+    if user_id is None:
+        print(f"ERROR: user '{args.user}' tidak ditemukan.")
+        return 2
+    items = collect_items(args.sources, BatchItem(None, args.judul, args.nomor_lp, args.tanggal), args.recursive)
+    for item in items:
+        judul = item.judul_kasus or os.path.splitext(os.path.basename(item.path))[0]
+        db_manager.enqueue_extraction_job(
+            item.path, judul, user_id, item.nomor_lp, item.tanggal_kejadian,
+            priority=args.priority, min_quality=args.min_quality, max_attempts=args.max_attempts,
+        )
+    print(f"{len(items)} job ditambahkan ke antrean.")
+    return 0 if items else 1
+
+
+def _cmd_status(args):
+    counts = db_manager.get_extraction_job_counts()
+    print(", ".join(f"{state}: {n}" for state, n in counts.items()))
+    for job in db_manager.get_extraction_jobs(state=args.state, limit=args.limit):
+        print(f"  #{job['id']:<6} {job['state']:<8} p={job['priority']:<3} "
+              f"percobaan {job['attempts']}/{job['max_attempts']}  {job['input_path']}"
+              + (f"  ({job['error']})" if job["error"] else ""))
+    return 0
+
+
+def _cmd_run(args):
+    scheduler = JobScheduler(
+        max_workers=args.workers, intra_op_threads=args.threads,
+        in_process=args.workers == 0, lease_seconds=args.lease,
+    )
+
+    def _on_signal(signum, frame):
+        print("\nMenghentikan setelah job yang sedang berjalan...")
+        scheduler.request_stop()
+
+    signal.signal(signal.SIGINT, _on_signal)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, _on_signal)
+    scheduler.run_forever(drain=args.drain)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Antrean job ekstraksi minutiae yang tahan crash.")
+    sub = parser.add_subparsers(dest="command")
+    sub.required = True
+
+    enq = sub.add_parser("enqueue", help="Tambahkan gambar ke antrean")
+    enq.add_argument("sources", nargs="+", help="Direktori, pola glob, atau manifest .csv")
+    enq.add_argument("--judul", default=None, help="Judul kasus (default: nama file)")
+    enq.add_argument("--nomor-lp", default=None)
+    enq.add_argument("--tanggal", default=None, help="Tanggal kejadian (YYYY-MM-DD)")
+    enq.add_argument("--user", default="admin", help="Username pemilik riwayat (default: admin)")
+    enq.add_argument("--recursive", action="store_true")
+    enq.add_argument("--priority", type=int, default=0, help="Angka lebih besar diproses lebih dulu")
+    enq.add_argument("--min-quality", type=float, default=None)
+    enq.add_argument("--max-attempts", type=int, default=None,
+                     help=f"Batas percobaan (default: {db_manager.JOB_MAX_ATTEMPTS})")
+
+    run = sub.add_parser("run", help="Jalankan scheduler")
+    run.add_argument("--workers", type=int, default=None,
+                     help="Jumlah proses worker (default: otomatis; 0 = satu thread di proses ini)")
+    run.add_argument("--threads", type=int, default=2, help="Thread TensorFlow per worker")
+    run.add_argument("--lease", type=float, default=None,
+                     help=f"Durasi lease job dalam detik (default: {db_manager.JOB_LEASE_SECONDS})")
+    run.add_argument("--drain", action="store_true", help="Berhenti saat antrean kosong")
+
+    st = sub.add_parser("status", help="Ringkasan antrean")
+    st.add_argument("--state", default=None, choices=(
+        db_manager.JOB_QUEUED, db_manager.JOB_RUNNING, db_manager.JOB_DONE, db_manager.JOB_FAILED))
+    st.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args(argv)
+    db_manager.init_db()
+    handlers = {"enqueue": _cmd_enqueue, "status": _cmd_status, "run": _cmd_run}
+    return handlers[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
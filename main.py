@@ -1,5 +1,10 @@
+import time
+_STARTUP_T0 = time.perf_counter()  # diukur sejak sebelum impor apa pun
+
 import customtkinter as ctk
 import os
+import sys
+import multiprocessing
 from tkinter import messagebox
 
 # Import modul yang sudah dipisahkan
@@ -98,6 +103,19 @@ class App(ctk.CTk):
 
         # Mulai dari halaman Login
         self.show_frame("Login")
+        self.after_idle(self._report_startup_time)
+
+    def _report_startup_time(self):
+        """
+        Cetak waktu sampai jendela login siap. Stack ML (TensorFlow/OpenCV/
+        Pandas) seharusnya belum dimuat di titik ini; jika sudah, ada impor
+        berat baru di jalur startup.
+        """
+        elapsed = time.perf_counter() - _STARTUP_T0
+        heavy = [m for m in ("tensorflow", "fingerflow", "cv2", "pandas") if m in sys.modules]
+        print(f"[startup] Jendela login siap dalam {elapsed:.2f} dtk")
+        if heavy:
+            print(f"[startup] WARNING: modul berat sudah dimuat sebelum login: {', '.join(heavy)}")
 
     def show_frame(self, page_name, data=None):
         """
@@ -217,6 +235,20 @@ class App(ctk.CTk):
         except Exception as e:
             print("[DEBUG] login_success: update_admin_menu error:", e)
 
+        # Muat pustaka & model ekstraksi di latar selagi user di halaman Home
+        try:
+            from db_manager import preload_extraction_stack
+            preload_extraction_stack()
+        except Exception as e:
+            print("[DEBUG] login_success: preload_extraction_stack error:", e)
+
+        # Lanjutkan job ekstraksi yang tertinggal (mis. aplikasi crash saat ekstraksi)
+        try:
+            from job_scheduler import resume_pending_jobs_async
+            resume_pending_jobs_async()
+        except Exception as e:
+            print("[DEBUG] login_success: resume_pending_jobs_async error:", e)
+
         # Pindah halaman
         self.show_frame("Home")
 
@@ -249,5 +281,10 @@ class App(ctk.CTk):
 
 # --- Jalankan Aplikasi ---
 if __name__ == "__main__":
+    # Wajib untuk build PyInstaller: worker ExtractionEngine memakai proses 'spawn'
+    multiprocessing.freeze_support()
+    # TensorFlow dijalankan di proses anak terpisah dari GUI
+    import db_manager
+    db_manager.isolate_inference()
     app = App()
     app.mainloop()
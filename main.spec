@@ -16,6 +16,7 @@ datas = [
     ('models', 'models'),
     ('assets', 'assets'),
     ('components', 'components'),
+    ('core', 'core'),
     ('pages', 'pages'),
     ('images_for_models', 'images_for_models'),
     (os.path.join(cv2_dir, 'config.py'), 'cv2'),
@@ -6,7 +6,15 @@ from PIL import Image, ImageTk
 from datetime import datetime
 import calendar
 import db_manager
-from db_manager import get_db_connection, run_minutiae_extraction 
+from db_manager import run_minutiae_extraction 
+from core.jobs import ExtractionJob, JobCancelled, Stage
+from job_scheduler import LeaseKeeper, default_owner
+
+# Setiap ekstraksi dari GUI juga dicatat di antrean job persisten
+# (extraction_jobs) dengan lease milik proses ini; jika aplikasi crash di
+# tengah ekstraksi, job-nya dilanjutkan setelah login berikutnya.
+_JOB_OWNER = default_owner("gui")
+_lease_keeper = LeaseKeeper(_JOB_OWNER)
 class CTkDatePicker(ctk.CTkFrame):
     def __init__(self, master, width=180, **kwargs):
         super().__init__(master, fg_color="transparent", **kwargs)
@@ -205,55 +213,6 @@ def _display_image(label_widget, path, max_size=(250, 180)):
 
 
 
-def _prepare_image_for_model(path, target_max_side=384):
-    """
-    Menyiapkan gambar khusus untuk input model FingerFlow:
-    - Membuka gambar asli
-    - Mengecilkan sehingga sisi terpanjang <= target_max_side (dengan menjaga aspek rasio)
-    - Menyimpan sebagai file JPEG baru dengan suffix "_model.jpg" di folder images_for_models
-    - Mengembalikan path file baru tersebut
-    """
-    try:
-        img = Image.open(path).convert("RGB")
-    except Exception as e:
-        print("Prepare image: gagal membuka:", e)
-        return path
-
-    w, h = img.size
-    max_dim = max(w, h)
-    if max_dim > target_max_side:
-        scale = target_max_side / float(max_dim)
-        new_size = (int(w * scale), int(h * scale))
-        img = img.resize(new_size, Image.LANCZOS)
-
-    # Tentukan root project = folder di atas "pages"
-    # __file__ = .../minutiae_ekstraksi/pages/cari_minutiae.py
-    # os.path.dirname(__file__)            -> .../minutiae_ekstraksi/pages
-    # os.path.dirname(os.path.dirname())   -> .../minutiae_ekstraksi  (root project)
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-    # Pastikan folder images_for_models ada di root project
-    images_dir = os.path.join(project_root, "images_for_models")
-    os.makedirs(images_dir, exist_ok=True)
-
-    # Nama file dasar diambil dari nama file asli
-    base = os.path.splitext(os.path.basename(path))[0]
-    out_path = os.path.join(images_dir, f"{base}_model.jpg")
-
-    try:
-        img.save(out_path, format="JPEG", quality=80, optimize=True)
-    except Exception:
-        img.save(out_path, format="JPEG", quality=80)
-
-    try:
-        size_bytes = os.path.getsize(out_path)
-    except Exception:
-        size_bytes = None
-
-    print(f"[MODEL PREP] path={out_path}, size={size_bytes}, dims={img.size}")
-    return out_path
-
-
 # =========================================================================
 # --- HALAMAN 3A: CARI MINUTIAE (FORM) ---
 # =========================================================================
@@ -266,6 +225,8 @@ class CariMinutiaePage(ctk.CTkFrame):
         self.loading_anim_after_id = None
         self.loading_image_label = None
         self.loading_text_label = None
+        self.loading_cancel_button = None
+        self.active_job = None  # ExtractionJob yang sedang berjalan (None = tidak ada)
 
         super().__init__(parent, fg_color=controller.BACKGROUND_COLOR)
         self.controller = controller
@@ -277,6 +238,9 @@ class CariMinutiaePage(ctk.CTkFrame):
         self.grid_rowconfigure(0, weight=1) 
         
         self._setup_main_content()
+
+        # Muat & panaskan model FingerFlow di latar supaya ekstraksi pertama tidak menunggu
+        db_manager.get_extractor_manager().warm_up_async()
         
     def _setup_main_content(self):
         # Frame Konten Utama (Kanan)
@@ -423,6 +387,17 @@ class CariMinutiaePage(ctk.CTkFrame):
         )
         self.loading_text_label.pack()
 
+        # tombol batal: hentikan job di batas tahap berikutnya
+        self.loading_cancel_button = ctk.CTkButton(
+            center,
+            text="Batalkan",
+            width=120,
+            fg_color="#8B1E1E",
+            hover_color="#A52A2A",
+            command=self.cancel_process
+        )
+        self.loading_cancel_button.pack(pady=(15, 0))
+
         # set frame awal kalau ada
         if self.loading_frames:
             self.loading_image_label.configure(image=self.loading_frames[0])
@@ -456,6 +431,8 @@ class CariMinutiaePage(ctk.CTkFrame):
         # reset teks default
         if self.loading_text_label is not None:
             self.loading_text_label.configure(text="Sedang memproses...")
+        if self.loading_cancel_button is not None:
+            self.loading_cancel_button.configure(state="normal", text="Batalkan")
 
         # mulai animasi
         if self.loading_frames:
@@ -498,6 +475,30 @@ class CariMinutiaePage(ctk.CTkFrame):
             self.update_idletasks()
 
 
+    def cancel_process(self):
+        """
+        Batalkan job yang sedang berjalan. Form langsung bisa dipakai lagi;
+        thread lama membersihkan file sementaranya sendiri dan hasilnya
+        diabaikan. Inferensi yang sedang berjalan di proses inferensi terpisah
+        langsung dihentikan (proses diganti); tanpa proses terpisah,
+        pembatalan baru berlaku di batas tahap berikutnya.
+        """
+        job = self.active_job
+        if job is None:
+            return
+        in_inference = job.stage == Stage.INFERENCE
+        job.cancel()
+        self.active_job = None
+        self._hide_loading_overlay()
+        if in_inference and not db_manager.inference_interruptible():
+            self.upload_label.configure(
+                text="Ekstraksi dibatalkan (inferensi yang sedang berjalan diselesaikan dulu di latar).",
+                text_color="orange",
+            )
+        else:
+            self.upload_label.configure(text="Ekstraksi dibatalkan.", text_color="orange")
+
+
     def upload_file(self):
         self.filepath = filedialog.askopenfilename(
             title="Pilih Gambar Sidik Jari",
@@ -531,46 +532,68 @@ class CariMinutiaePage(ctk.CTkFrame):
         self._show_loading_overlay()
         self.update_idletasks()
 
-        # ---- KERJA BERAT DIPINDAH KE THREAD TERPISAH ----
+        # Job terstruktur: tahap, progres & token pembatalan
+        def job_to_ui(j):
+            # dipanggil di thread worker → lempar ke main thread
+            def _update():
+                if self.active_job is not j:
+                    return  # job lama yang sudah dibatalkan
+                short = j.message.replace("\n", " ").strip()
+                if len(short) > 30:
+                    short = short[:30] + "..."
+                self._set_loading_text(f"Sedang memproses ({j.progress:.0%}): {short}")
+            self.after(0, _update)
+
+        job = ExtractionJob(self.filepath, judul, listener=job_to_ui)
+        self.active_job = job
+
+        user_id = self.controller.logged_in_user_id if hasattr(self.controller, 'logged_in_user_id') else 1
+        filepath = self.filepath
+
         def worker():
+            durable_id = self._start_durable_job(filepath, judul, nomor_lp, tanggal, user_id)
+            outcome = {"history_id": None, "error": "Dibatalkan"}
+            try:
+                extract_and_save(durable_id, outcome)
+            finally:
+                self._finish_durable_job(durable_id, outcome)
+
+        # ---- KERJA BERAT DIPINDAH KE THREAD TERPISAH ----
+        def extract_and_save(durable_id, outcome):
             error = None
             result = None
 
             try:
-                # --- 1. PREPROSES GAMBAR UNTUK MODEL FINGERFLOW ---
-                # Update status: menyiapkan gambar
-                self.after(0, lambda: self._set_loading_text(
-                    "Sedang memproses: menyiapkan gambar untuk model..."
-                ))
+                # --- 1. FILE ASLI LANGSUNG DIPROSES IN-MEMORY OLEH db_manager ---
+                # (decode sekali, resize ke db_manager.MODEL_INPUT_MAX_SIDE, tanpa JPEG perantara)
+                model_input_path = self.filepath
 
+                # --- 2 & 3. JALANKAN EKSTRAKSI MINUTIAE (FINGERFLOW) ---
+                # (progres per tahap dikirim ke UI lewat listener job)
+                extraction = None
                 try:
-                    model_input_path = _prepare_image_for_model(self.filepath, target_max_side=512)
-                except Exception as e:
-                    print("Gagal menyiapkan gambar untuk model, gunakan gambar asli:", e)
-                    model_input_path = self.filepath
-
-                # --- 2. SIAPKAN CALLBACK UNTUK PROGRESS DARI FINGERFLOW ---
-                def progress_to_ui(msg: str):
-                    # dipanggil di thread worker → lempar ke main thread
-                    def _update():
-                        short = msg.replace("\n", " ").strip()
-                        if len(short) > 30:
-                            short = short[:30] + "..."
-                        self._set_loading_text(f"Sedang memproses: {short}")
-                    self.after(0, _update)
-
-                # --- 3. JALANKAN EKSTRAKSI MINUTIAE (FINGERFLOW) ---
-                # (run_minutiae_extraction di db_manager.py sudah dimodif dengan progress_callback)
-                try:
-                    path_mentah, path_ekstraksi = run_minutiae_extraction(
+                    extraction = run_minutiae_extraction(
                         model_input_path,
                         judul,
-                        progress_callback=progress_to_ui
+                        job=job
                     )
+                    path_mentah, path_ekstraksi = extraction.path_mentah, extraction.path_ekstraksi
+                except JobCancelled:
+                    return  # UI sudah dikembalikan oleh cancel_process
+                except db_manager.LowQualityError as e:
+                    error = ("Kualitas Gambar Rendah", f"{e}\nSilakan unggah gambar sidik jari yang lebih jelas.")
+                    path_mentah, path_ekstraksi = None, None
                 except Exception as e:
                     error = ("Error Ekstraksi", f"Gagal Ekstraksi! Cek konsol. Error: {e}")
                     path_mentah, path_ekstraksi = None, None
 
+                # Dibatalkan tepat setelah ekstraksi selesai → jangan simpan apa pun
+                if job.cancelled:
+                    for p in (path_mentah, path_ekstraksi):
+                        if p and os.path.exists(p):
+                            os.remove(p)
+                    return
+
                 # --- 4. SIMPAN KE DATABASE JIKA BERHASIL ---
                 if not error and path_mentah and path_ekstraksi:
                     # update status: simpan ke DB
@@ -578,30 +601,41 @@ class CariMinutiaePage(ctk.CTkFrame):
                         "Sedang memproses: menyimpan hasil ke database..."
                     ))
 
-                    user_id = self.controller.logged_in_user_id if hasattr(self.controller, 'logged_in_user_id') else 1 
-
-                    minutiae_count = db_manager.get_minutiae_count()
-                    conn = get_db_connection()
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                        INSERT INTO history (judul_kasus, nomor_lp, tanggal_kejadian, path_mentah, path_ekstraksi, user_id, minutiae_count)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (judul, nomor_lp, tanggal, path_mentah, path_ekstraksi, user_id, minutiae_count)) 
-
-                    last_id = cursor.lastrowid
-                    conn.commit()
-                    conn.close()
-                    
-                    # 🔁 Setelah tahu ID history → pindahkan & rename file
+                    minutiae_count = extraction.minutiae_count
+                    # Riwayat + template (+ kelas & titik core) + job 'done' dalam SATU
+                    # transaksi, lalu file dipindah ke nama berbasis ID; crash setelah
+                    # ini tidak membuat job diulang dan riwayatnya terduplikasi
+                    job_row = db_manager.get_extraction_job(durable_id) if durable_id is not None else None
+                    if job_row is not None:
+                        saved = db_manager.complete_extraction_job(job_row, _JOB_OWNER, extraction)
+                    else:
+                        # Antrean job tidak tersedia → simpan riwayat + template saja
+                        last_id = db_manager.save_history(
+                            judul, nomor_lp, tanggal, path_mentah, path_ekstraksi, user_id,
+                            minutiae_count, extraction.quality_score, extraction.template,
+                            (extraction.core_point, extraction.delta_point),
+                        )
+                        saved = None
+                        if last_id is not None:
+                            saved = (last_id,) + db_manager.move_and_rename_history_images(
+                                last_id, path_mentah, path_ekstraksi
+                            )
+                    if saved is None:
+                        raise RuntimeError("hasil ekstraksi gagal disimpan ke database")
+                    last_id, path_mentah, path_ekstraksi = saved
+                    outcome["history_id"] = last_id
+
+                    # Bandingkan dengan kasus-kasus sebelumnya (pencocokan 1:N)
+                    self.after(0, lambda: self._set_loading_text(
+                        "Sedang memproses: mencari kasus serupa di database..."
+                    ))
                     try:
-                        new_mentah, new_ekstraksi = db_manager.move_and_rename_history_images(
-                            last_id,
-                            path_mentah,
-                            path_ekstraksi
+                        candidates = db_manager.search_similar(
+                            extraction.template, extraction.core_point, exclude_ids=[last_id]
                         )
-                        path_mentah, path_ekstraksi = new_mentah, new_ekstraksi
                     except Exception as e:
-                        print(f"WARNING: gagal memindahkan file ke folder mentah/ekstraksi: {e}")
+                        print(f"WARNING: pencarian kasus serupa gagal: {e}")
+                        candidates = []
 
                     # Data untuk halaman hasil
                     result = {
@@ -613,26 +647,63 @@ class CariMinutiaePage(ctk.CTkFrame):
                         "path_mentah": path_mentah,
                         "path_ekstraksi": path_ekstraksi,
                         "minutiae_count": minutiae_count,
+                        "candidates": candidates,
                     }
 
                 elif not error:
                     # path_mentah atau path_ekstraksi kosong tapi nggak ada exception
-                    error = ("Error", "Gagal menyimpan file hasil ekstraksi.")
+                    error = ("Error", f"Gagal ekstraksi: {extraction.error or 'file hasil tidak tersimpan'}.")
 
             except Exception as e:
                 # fallback error tak terduga
                 error = ("Error Tak Terduga", str(e))
 
             # --- 5. BALIK KE MAIN THREAD UNTUK UPDATE UI & PINDAH HALAMAN ---
-            self.after(0, lambda: self._on_process_finished(result, error))
+            outcome["error"] = error[1] if error else None
+            self.after(0, lambda: self._on_process_finished(result, error, job))
 
 
         # Start thread worker (daemon supaya ikut mati kalau app ditutup)
         threading.Thread(target=worker, daemon=True).start()
 
-    def _on_process_finished(self, result, error):
+    def _start_durable_job(self, filepath, judul, nomor_lp, tanggal, user_id):
+        """Catat job 'running' milik GUI di extraction_jobs. Return: ID job atau None."""
+        try:
+            job_id = db_manager.enqueue_extraction_job(
+                filepath, judul, user_id, nomor_lp or None, tanggal or None, owner=_JOB_OWNER
+            )
+        except Exception as e:
+            print(f"WARNING: gagal mencatat job ekstraksi: {e}")
+            return None
+        _lease_keeper.add(job_id)
+        return job_id
+
+    def _finish_durable_job(self, job_id, outcome):
+        """
+        Lepas lease job GUI. Job yang berhasil sudah 'done' bersama riwayatnya
+        (complete_extraction_job); selain itu 'failed' (tanpa diulang otomatis).
+        """
+        if job_id is None:
+            return
+        _lease_keeper.discard(job_id)
+        if outcome["history_id"] is not None:
+            return
+        try:
+            # Error sudah ditampilkan ke user; mengulang diam-diam hanya membingungkan
+            db_manager.fail_extraction_job(job_id, _JOB_OWNER, outcome["error"] or "Gagal", retry=False)
+        except Exception as e:
+            print(f"WARNING: gagal memperbarui status job ekstraksi #{job_id}: {e}")
+
+    def _on_process_finished(self, result, error, job=None):
         """Dipanggil di MAIN THREAD setelah thread worker selesai."""
 
+        # 0) Hasil job yang sudah dibatalkan / digantikan job baru diabaikan
+        if job is not None and self.active_job is not job:
+            return
+        self.active_job = None
+        if self.loading_cancel_button is not None:
+            self.loading_cancel_button.configure(state="disabled")
+
         # 1) Kalau ada error → langsung hide overlay & tampilkan pesan
         if error is not None:
             try:
@@ -697,7 +768,8 @@ class CariMinutiaePage(ctk.CTkFrame):
                 'judul': judul,
                 'nomor_lp': nomor_lp,
                 'tanggal': tanggal,
-                'path_ekstraksi': path_ekstraksi
+                'path_ekstraksi': path_ekstraksi,
+                'candidates': result.get("candidates", []),
             }
 
             # 4. Bersihkan form input
@@ -771,6 +843,16 @@ class HasilEkstraksiPage(ctk.CTkFrame):
         self.image_holder = ctk.CTkLabel(image_frame, text="[Gambar Hasil Ekstraksi]", corner_radius=10, fg_color=self.controller.BACKGROUND_COLOR)
         self.image_holder.grid(row=1, column=0, sticky="nsew")
 
+        # Frame Kandidat Kasus Serupa (Bawah, hasil pencocokan 1:N)
+        candidate_frame = ctk.CTkFrame(self.result_card, fg_color="transparent")
+        candidate_frame.grid(row=1, column=0, columnspan=2, padx=30, pady=(0, 20), sticky="nsew")
+        candidate_frame.grid_columnconfigure(0, weight=1)
+
+        ctk.CTkLabel(candidate_frame, text="Kandidat Kasus Serupa:", font=self.controller.FONT_SUBJUDUL, text_color="#1f6aa5", anchor="w").grid(row=0, column=0, sticky="w", pady=(0, 10))
+        self.candidate_list = ctk.CTkScrollableFrame(candidate_frame, height=160, fg_color=self.controller.BACKGROUND_COLOR)
+        self.candidate_list.grid(row=1, column=0, sticky="nsew")
+        self.candidate_list.grid_columnconfigure(1, weight=1)
+
     def load_data(self, data):
         # Dipanggil oleh controller saat pindah halaman
         self.label_judul.configure(text=data['judul'])
@@ -789,4 +871,26 @@ class HasilEkstraksiPage(ctk.CTkFrame):
             self.image_holder.configure(text="", image=ctk_image)
             self.image_holder.image = ctk_image # Agar gambar tidak hilang
         except Exception as e:
-            self.image_holder.configure(text=f"Gagal memuat gambar:\n{e}", image=None)
\ No newline at end of file
+            self.image_holder.configure(text=f"Gagal memuat gambar:\n{e}", image=None)
+
+        self._show_candidates(data.get('candidates') or [])
+
+    def _show_candidates(self, candidates):
+        """Tabel peringkat kandidat dari db_manager.search_similar."""
+        for child in self.candidate_list.winfo_children():
+            child.destroy()
+
+        if not candidates:
+            ctk.CTkLabel(self.candidate_list, text="Tidak ada kasus serupa di database.", font=self.controller.FONT_UTAMA, anchor="w").grid(row=0, column=0, columnspan=4, sticky="w", padx=10, pady=5)
+            return
+
+        for col, header in enumerate(("#", "Judul Kasus (ID)", "Minutiae Cocok", "Skor")):
+            ctk.CTkLabel(self.candidate_list, text=header, font=ctk.CTkFont(family="Arial", size=13, weight="bold"), anchor="w").grid(row=0, column=col, sticky="w", padx=10, pady=(5, 2))
+
+        for rank, c in enumerate(candidates, start=1):
+            judul = f"{c['judul_kasus']} (#{c['history_id']})"
+            if c.get('nomor_lp'):
+                judul += f" - LP {c['nomor_lp']}"
+            values = (str(rank), judul, str(c['matched']), f"{c['score'] * 100:.1f}%")
+            for col, text in enumerate(values):
+                ctk.CTkLabel(self.candidate_list, text=text, font=self.controller.FONT_UTAMA, anchor="w").grid(row=rank, column=col, sticky="w", padx=10, pady=2)
\ No newline at end of file
@@ -0,0 +1,128 @@
+import argparse
+import glob
+import os
+import struct
+import sys
+import time
+
+import db_manager
+from core import iso_template
+
+# =========================================================================
+# --- EKSPOR / IMPOR TEMPLATE ISO 19794-2 & ANSI 378 ---
+# =========================================================================
+#
+# Ekspor rentang riwayat ke satu file (record FMR disambung) atau satu file
+# per riwayat:
+#   python template_io.py export galeri.fmr --format iso --from-id 1 --to-id 5000
+#   python template_io.py export keluar/ --per-file --format ansi
+#
+# Impor file FMR (satu atau banyak record per file) ke galeri:
+#   python template_io.py import "masuk/*.ist" --format iso --judul "Impor AFIS"
+#
+# Ekspor membaca database per kelompok dan menulis record satu per satu;
+# impor menulis per --commit-every record dalam satu transaksi.
+
+
+def _export(args):
+    user_id = None
+    if args.user:
+        user_id = db_manager.get_user_id_by_username(args.user)
+        if user_id is None:
+            print(f"ERROR: user '{args.user}' tidak ditemukan.")
+            return 2
+
+    ext = ".ist" if args.format == iso_template.FORMAT_ISO else ".ansi"
+    records = db_manager.iter_history_templates(args.from_id, args.to_id, user_id)
+    count, size, started = 0, 0, time.time()
+    if args.per_file:
+        os.makedirs(args.output, exist_ok=True)
+        for history_id, _, quality, tpl in records:
+            data = iso_template.encode_record(tpl, args.format, finger_quality=quality, resolution=args.resolution)
+            with open(os.path.join(args.output, f"{history_id}{ext}"), "wb") as f:
+                f.write(data)
+            count, size = count + 1, size + len(data)
+    else:
+        with open(args.output, "wb") as f:
+            for history_id, _, quality, tpl in records:
+                data = iso_template.encode_record(tpl, args.format, finger_quality=quality, resolution=args.resolution)
+                f.write(data)
+                count, size = count + 1, size + len(data)
+    print(f"{count} template ({size / 1024:.1f} KB) diekspor ke {args.output} dalam {time.time() - started:.1f} dtk.")
+    return 0
+
+
+def _import(args):
+    user_id = db_manager.get_user_id_by_username(args.user)
+    if user_id is None:
+        print(f"ERROR: user '{args.user}' tidak ditemukan.")
+        return 2
+
+    paths = []
+    for source in args.sources:
+        if os.path.isdir(source):
+            paths.extend(p for p in glob.glob(os.path.join(source, "*")) if os.path.isfile(p))
+        else:
+            paths.extend(glob.glob(source, recursive=True))
+    paths = sorted(set(paths))
+    if not paths:
+        print("Tidak ada file template yang ditemukan.")
+        return 1
+
+    pending, total, failed, started = [], 0, 0, time.time()
+    step = max(1, args.commit_every)
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        items = []
+        try:
+            with open(path, "rb") as f:
+                for r, views in enumerate(iso_template.iter_records(f, args.format)):
+                    for v, view in enumerate(views):
+                        suffix = f"#{r + 1}.{v + 1}" if r or v or len(views) > 1 else ""
+                        items.append((f"{args.judul or name}{suffix}", view.template, view.quality))
+        except (OSError, ValueError, struct.error) as e:
+            # File rusak dilewati seluruhnya (tidak ada record setengah jadi)
+            failed += 1
+            print(f"  GAGAL {os.path.basename(path)}: {e}")
+            continue
+        pending.extend(items)
+        if len(pending) >= step:
+            total += len(db_manager.import_templates(pending, user_id))
+            pending = []
+    if pending:
+        total += len(db_manager.import_templates(pending, user_id))
+    print(f"{total} template diimpor dari {len(paths) - failed} file ({failed} gagal) "
+          f"dalam {time.time() - started:.1f} dtk.")
+    return 0 if failed == 0 else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ekspor/impor template minutiae ISO 19794-2 / ANSI 378.")
+    sub = parser.add_subparsers(dest="command")
+    sub.required = True
+
+    exp = sub.add_parser("export", help="Ekspor template riwayat")
+    exp.add_argument("output", help="File keluaran (record disambung) atau folder dengan --per-file")
+    exp.add_argument("--format", choices=iso_template.FORMATS, default=iso_template.FORMAT_ISO)
+    exp.add_argument("--from-id", type=int, default=None, help="ID riwayat awal (inklusif)")
+    exp.add_argument("--to-id", type=int, default=None, help="ID riwayat akhir (inklusif)")
+    exp.add_argument("--user", default=None, help="Hanya riwayat milik username ini")
+    exp.add_argument("--per-file", action="store_true", help="Satu file per riwayat (<id>.ist / <id>.ansi)")
+    exp.add_argument("--resolution", type=int, default=None,
+                     help="Resolusi gambar acuan (piksel/cm) yang dicatat di header "
+                          "(default: ppi tiap template, atau 197 jika tidak diketahui)")
+
+    imp = sub.add_parser("import", help="Impor file template ke galeri")
+    imp.add_argument("sources", nargs="+", help="File, folder atau pola glob")
+    imp.add_argument("--format", choices=iso_template.FORMATS, default=iso_template.FORMAT_ISO)
+    imp.add_argument("--judul", default=None, help="Judul kasus (default: nama file)")
+    imp.add_argument("--user", default="admin", help="Username pemilik riwayat (default: admin)")
+    imp.add_argument("--commit-every", type=int, default=1000, help="Jumlah template per transaksi")
+
+    args = parser.parse_args(argv)
+    db_manager.init_db()
+    return _export(args) if args.command == "export" else _import(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+import argparse
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+
+import db_manager
+from core.jobs import ExtractionResult
+from core.watcher import DirectoryWatcher, StabilityTracker
+
+# =========================================================================
+# --- LAYANAN INGEST WATCH-FOLDER (OUTPUT SCANNER) ---
+# =========================================================================
+#
+#   python watch_folder.py D:\share\scanner --judul "Scan Otomatis" --workers 2
+#
+# Alur: DirectoryWatcher (inotify/polling) → StabilityTracker (tunggu file
+# selesai ditulis) → antrean terbatas → ExtractionEngine → save_history +
+# move_and_rename_history_images.
+#
+# Back-pressure: jika antrean penuh, thread pemantau berhenti memasukkan
+# file sampai ada ruang; event berikutnya tetap ditampung kernel (dan folder
+# dipindai ulang bila buffer-nya meluap). Jumlah job di worker dibatasi
+# 2 x jumlah worker.
+#
+# File yang sudah diproses dicatat di batch_progress (run "watch:<folder>")
+# dengan kunci path + mtime, jadi layanan yang dijalankan ulang hanya
+# memproses file baru/berubah, termasuk yang masuk saat layanan mati.
+
+IMAGE_EXTENSIONS = (".bmp", ".jpg", ".jpeg", ".png", ".tif", ".tiff")
+
+
+def _is_image(path):
+    name = os.path.basename(path)
+    # Abaikan file sementara/tersembunyi yang biasa dibuat saat penyalinan
+    if name.startswith((".", "~")) or name.endswith((".tmp", ".part")):
+        return False
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def _file_key(path):
+    try:
+        return f"{path}@{os.stat(path).st_mtime_ns}"
+    except OSError:
+        return None
+
+
+class WatchFolderService:
+    """Pantau satu folder dan ekstraksi setiap gambar baru secara otomatis."""
+
+    def __init__(
+        self,
+        watch_dir,
+        case_judul=None,
+        user_id=None,
+        max_workers=None,
+        intra_op_threads=2,
+        queue_size=16,
+        settle_seconds=2.0,
+        use_inotify=None,
+        min_quality=None,
+    ):
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.case_judul = case_judul
+        self.user_id = user_id
+        self.max_workers = max_workers
+        self.intra_op_threads = intra_op_threads
+        self.min_quality = min_quality
+        self.run_name = f"watch:{self.watch_dir}"
+
+        self._watcher = DirectoryWatcher(self.watch_dir, use_inotify=use_inotify)
+        self._tracker = StabilityTracker(settle_seconds)
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._stop = threading.Event()
+        self._db_lock = threading.Lock()
+        self._seen = set()  # kunci file yang sudah diantrekan/selesai
+        self._engine = None
+        self._in_flight = None
+        self._threads = []
+        self.stats = {"done": 0, "rejected": 0, "failed": 0}
+
+    # ---- siklus hidup ----
+    def start(self):
+        from extraction_engine import ExtractionEngine
+
+        self._seen = {
+            key for key, status in db_manager.get_batch_progress(self.run_name).items()
+            if status in ("done", "rejected")
+        }
+        self._engine = ExtractionEngine(max_workers=self.max_workers, intra_op_threads=self.intra_op_threads)
+        self._in_flight = threading.BoundedSemaphore(self._engine.max_workers * 2)
+        print(
+            f"[watch] Memantau {self.watch_dir} ({self._watcher.backend_name}), "
+            f"{self._engine.max_workers} worker, antrean {self._queue.maxsize}."
+        )
+        self._threads = [
+            threading.Thread(target=self._watch_loop, name="watch-folder", daemon=True),
+            threading.Thread(target=self._dispatch_loop, name="watch-dispatch", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def request_stop(self):
+        """Minta layanan berhenti (aman dipanggil dari signal handler)."""
+        self._stop.set()
+
+    def stop(self):
+        """Berhenti menerima file baru, tunggu job yang sedang di worker selesai."""
+        self._stop.set()
+        for t in self._threads:
+            t.join()
+        if self._engine is not None:
+            self._engine.shutdown(wait=True)
+        self._watcher.close()
+        print(
+            f"[watch] Berhenti. {self.stats['done']} berhasil, {self.stats['rejected']} ditolak, "
+            f"{self.stats['failed']} gagal. File di antrean diproses saat layanan dijalankan lagi."
+        )
+
+    def run_forever(self):
+        self.start()
+        try:
+            while not self._stop.is_set():
+                time.sleep(0.5)
+        finally:
+            self.stop()
+
+    # ---- thread pemantau (produsen) ----
+    def _consider(self, path):
+        if _is_image(path):
+            self._tracker.add(path)
+
+    def _enqueue(self, path):
+        key = _file_key(path)
+        if key is None or key in self._seen:
+            return
+        warned = False
+        while not self._stop.is_set():
+            try:
+                self._queue.put((path, key), timeout=0.5)
+                self._seen.add(key)
+                return
+            except queue.Full:
+                if not warned:
+                    print("[watch] Antrean penuh, menunggu worker (back-pressure)...")
+                    warned = True
+
+    def _watch_loop(self):
+        for path in self._watcher.existing_files():
+            self._consider(path)
+        while not self._stop.is_set():
+            for path in self._watcher.poll(timeout=0.5):
+                self._consider(path)
+            for path in self._tracker.ready():
+                self._enqueue(path)
+
+    # ---- thread pengirim (konsumen) ----
+    def _dispatch_loop(self):
+        while not self._stop.is_set():
+            try:
+                path, key = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # Batasi job di worker; antrean di atas menahan produsen
+            while not self._in_flight.acquire(timeout=0.5):
+                if self._stop.is_set():
+                    self._seen.discard(key)
+                    return
+            judul = self.case_judul or os.path.splitext(os.path.basename(path))[0]
+            future = self._engine.submit(path, judul, self.min_quality)
+            future.add_done_callback(lambda f, p=path, k=key, j=judul: self._on_done(p, k, j, f))
+
+    def _on_done(self, path, key, judul, future):
+        try:
+            try:
+                r = future.result()
+            except Exception as e:
+                r = ExtractionResult(path, error=f"Worker gagal: {e}")
+            with self._db_lock:
+                self._register(path, key, judul, r)
+        finally:
+            self._in_flight.release()
+
+    def _register(self, path, key, judul, r):
+        name = os.path.basename(path)
+        threshold = db_manager.QUALITY_MIN_SCORE if self.min_quality is None else self.min_quality
+        if r.ok:
+            history_id = db_manager.save_history(
+                judul, None, None, r.path_mentah, r.path_ekstraksi, self.user_id,
+                r.minutiae_count, r.quality_score, r.template, (r.core_point, r.delta_point),
+            )
+            if history_id is None:
+                status, error = "failed", "Gagal menyimpan riwayat"
+            else:
+                db_manager.move_and_rename_history_images(history_id, r.path_mentah, r.path_ekstraksi)
+                status, error = "done", None
+                print(f"[watch] OK      {name} → riwayat #{history_id} ({r.minutiae_count} minutiae)")
+        elif (
+            db_manager.QUALITY_GATE_ENABLED
+            and r.quality_score is not None
+            and r.quality_score < threshold
+        ):
+            status, error = "rejected", r.error
+            print(f"[watch] DITOLAK {name}: {error}")
+        else:
+            status, error = "failed", r.error
+            print(f"[watch] GAGAL   {name}: {error}")
+
+        if status == "failed":
+            self._seen.discard(key)  # dicoba lagi saat layanan dijalankan ulang / file berubah
+        self.stats[status] += 1
+        db_manager.record_batch_status(self.run_name, [(key, status, error)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest otomatis gambar sidik jari dari folder output scanner.")
+    parser.add_argument("folder", help="Folder yang dipantau")
+    parser.add_argument("--judul", default=None, help="Judul kasus (default: nama file)")
+    parser.add_argument("--user", default="admin", help="Username pemilik riwayat (default: admin)")
+    parser.add_argument("--workers", type=int, default=None, help="Jumlah proses worker (default: otomatis)")
+    parser.add_argument("--threads", type=int, default=2, help="Thread TensorFlow per worker")
+    parser.add_argument("--queue-size", type=int, default=16, help="Kapasitas antrean sebelum back-pressure")
+    parser.add_argument("--settle", type=float, default=2.0,
+                        help="Detik tanpa perubahan sebelum file dianggap selesai ditulis")
+    parser.add_argument("--polling", action="store_true",
+                        help="Paksa polling (mis. untuk share jaringan tanpa event inotify)")
+    parser.add_argument("--min-quality", type=float, default=None,
+                        help=f"Ambang skor kualitas (default: {db_manager.QUALITY_MIN_SCORE})")
+    args = parser.parse_args(argv)
+
+    db_manager.init_db()
+    user_id = db_manager.get_user_id_by_username(args.user)
+    if user_id is None:
+        print(f"ERROR: user '{args.user}' tidak ditemukan.")
+        return 2
+
+    service = WatchFolderService(
+        args.folder,
+        case_judul=args.judul,
+        user_id=user_id,
+        max_workers=args.workers,
+        intra_op_threads=args.threads,
+        queue_size=args.queue_size,
+        settle_seconds=args.settle,
+        use_inotify=False if args.polling else None,
+        min_quality=args.min_quality,
+    )
+
+    def _on_signal(signum, frame):
+        service.request_stop()
+
+    signal.signal(signal.SIGINT, _on_signal)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, _on_signal)
+
+    service.run_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())